@@ -16,6 +16,10 @@ from sklearn.metrics import (
 )
 
 import joblib
+from model_registry import write_manifest
+from compact_artifact import export_artifact
+from word_table import save_word_table
+from feedback_store import record_errors
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -98,6 +102,8 @@ vectorizer_path = f"models_tree/vectorizer_{model_uid}.joblib"
 
 joblib.dump(model, model_path)
 joblib.dump(vectorizer, vectorizer_path)
+export_artifact("models_tree", model_uid, vectorizer, model)  # compact artifact (ไม่มี pickle) สำหรับ app.py
+save_word_table("models_tree", model_uid, model, X_train_vec, y_train)  # sentiment ของแต่ละคำตาม vocabulary ของโมเดลนี้
 
 print(f"✅ Model saved: {model_path}")
 print(f"✅ Vectorizer saved: {vectorizer_path}")
@@ -109,6 +115,10 @@ y_pred = model.predict(X_test_vec)
 
 acc = accuracy_score(y_test, y_pred)
 f1_macro = f1_score(y_test, y_pred, average="macro")
+
+# manifest ชี้ไปที่โมเดลนี้ → app.py จะโหลด UID นี้ตอนเริ่ม / ตอน /admin/reload
+write_manifest("models_tree", model_uid, accuracy=acc, f1_macro=f1_macro)
+
 cm = confusion_matrix(y_test, y_pred)
 
 print("\n=== EVALUATION RESULTS ===")
@@ -172,6 +182,8 @@ errors_df.head(10).to_csv(
     index=False,
     encoding="utf-8"
 )
+# misclassification ทั้งหมด (ไม่ใช่แค่ 10 ตัวอย่าง) → SQLite ที่ app ค้นได้ผ่าน /errors/query
+record_errors(os.getenv("FEEDBACK_DB_PATH", "data/feedback.db"), "rf", model_uid, errors_df["text"], errors_df["true_label"], errors_df["pred_label"])
 
 print("✅ Saved misclassified examples")
 
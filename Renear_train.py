@@ -14,6 +14,10 @@ from sklearn.metrics import (
     f1_score,
 )
 import joblib
+from model_registry import write_manifest
+from compact_artifact import export_artifact
+from word_table import save_word_table
+from feedback_store import record_errors
 from sklearn.svm import LinearSVC
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -72,6 +76,8 @@ vectorizer_path = f"models_linear/vectorizer_{model_uid}.joblib"
 
 joblib.dump(model, model_path)
 joblib.dump(vectorizer, vectorizer_path)
+export_artifact("models_linear", model_uid, vectorizer, model)  # compact artifact (ไม่มี pickle) สำหรับ app.py
+save_word_table("models_linear", model_uid, model, X_train_vec, y_train)  # sentiment ของแต่ละคำตาม vocabulary ของโมเดลนี้
 
 print(f"Model saved as: {model_path}")
 print(f"Vectorizer saved as: {vectorizer_path}")
@@ -82,6 +88,10 @@ y_pred = model.predict(X_test_vec)
 
 acc = accuracy_score(y_test, y_pred)
 f1_macro = f1_score(y_test, y_pred, average="macro")
+
+# manifest ชี้ไปที่โมเดลนี้ → app.py จะโหลด UID นี้ตอนเริ่ม / ตอน /admin/reload
+write_manifest("models_linear", model_uid, accuracy=acc, f1_macro=f1_macro)
+
 cm = confusion_matrix(y_test, y_pred)
 
 print("\n=== EVALUATION RESULTS ===")
@@ -133,6 +143,10 @@ errors_df = df.loc[test_indices].copy()
 errors_df["true_label"] = y_test.values
 errors_df["pred_label"] = y_pred
 
+# misclassification ทั้งหมด → SQLite ที่ app ค้นได้ผ่าน /errors/query
+wrong = errors_df[errors_df["true_label"] != errors_df["pred_label"]]
+record_errors(os.getenv("FEEDBACK_DB_PATH", "data/feedback.db"), "linear", model_uid, wrong["text"], wrong["true_label"], wrong["pred_label"])
+
 print("\n=== 10 MISCLASSIFIED EXAMPLES ===")
 for idx, (_, row) in enumerate(errors_df.head(10).iterrows()):
     print(f"{idx+1}. Text: {row['text']}")
@@ -0,0 +1,151 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+
+class ModelSaturated(Exception):
+    """โมเดลรับงานเพิ่มไม่ได้ (คิวเต็ม หรือรอเกิน deadline)"""
+
+    def __init__(self, model_key, reason, retry_after):
+        super().__init__(f"Model '{model_key}' is saturated ({reason})")
+        self.model_key = model_key
+        self.reason = reason            # "queue_full" / "wait_timeout"
+        self.retry_after = retry_after  # วินาที (int)
+
+    @property
+    def status_code(self):
+        return 429 if self.reason == "queue_full" else 503
+
+
+class ModelGate:
+    """จำกัดจำนวนงานที่รันพร้อมกันของโมเดลหนึ่ง พร้อมคิวรอที่มีขนาดและ deadline จำกัด"""
+
+    def __init__(self, model_key, max_concurrency, max_queue=16, max_wait_ms=500):
+        self.model_key = model_key
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.service_ms_ewma = 0.0
+        self.max_wait_ms_seen = 0.0
+
+    def retry_after(self):
+        """ประมาณเวลาที่คิวจะว่าง จากเวลาทำงานเฉลี่ย × งานที่ค้าง / concurrency (อย่างน้อย 1 วินาที)"""
+        backlog = self.waiting + self.running + 1
+        seconds = self.service_ms_ewma / 1000 * backlog / self.max_concurrency
+        return max(1, math.ceil(seconds))
+
+    async def acquire(self):
+        """คืนเวลาที่รอคิว (ms) หรือ raise ModelSaturated"""
+        start = time.perf_counter()
+        if not self._sem.locked():
+            await self._sem.acquire()  # มีช่องว่าง → ได้ทันที ไม่ต้องเข้าคิว
+        else:
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise ModelSaturated(self.model_key, "queue_full", self.retry_after())
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), timeout=self.max_wait or None)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise ModelSaturated(self.model_key, "wait_timeout", self.retry_after())
+            finally:
+                self.waiting -= 1
+
+        self.running += 1
+        self.admitted += 1
+        wait_ms = (time.perf_counter() - start) * 1000
+        self.max_wait_ms_seen = max(self.max_wait_ms_seen, wait_ms)
+        return wait_ms
+
+    def release(self, service_ms=None):
+        self.running -= 1
+        self._sem.release()
+        if service_ms is None:
+            return
+        alpha = 0.2
+        if self.service_ms_ewma == 0:
+            self.service_ms_ewma = service_ms
+        else:
+            self.service_ms_ewma = alpha * service_ms + (1 - alpha) * self.service_ms_ewma
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "running": self.running,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "service_ms_ewma": round(self.service_ms_ewma, 2),
+            "max_queue_wait_ms": round(self.max_wait_ms_seen, 2),
+        }
+
+
+class AdmissionController:
+    """เก็บ ModelGate ต่อโมเดล — โมเดลที่ไม่ได้กำหนด limit ผ่านได้ทันที"""
+
+    def __init__(self, limits, max_queue=16, max_wait_ms=500):
+        self.gates = {
+            key: ModelGate(key, limit, max_queue=max_queue, max_wait_ms=max_wait_ms)
+            for key, limit in limits.items()
+        }
+
+    @asynccontextmanager
+    async def admit(self, keys):
+        """เข้าคิวทุกโมเดลใน keys (เรียงตามชื่อเพื่อกัน deadlock) → yield {key: queue_wait_ms}"""
+        acquired = []
+        waits = {key: 0.0 for key in keys}
+        try:
+            for key in sorted(set(keys)):
+                gate = self.gates.get(key)
+                if gate is not None:
+                    waits[key] = await gate.acquire()
+                    acquired.append(gate)
+        except BaseException:
+            # ModelSaturated, CancelledError (client หลุดระหว่างรอ) ฯลฯ → คืน permit ที่ได้มาแล้วทั้งหมด
+            for gate in acquired:
+                gate.release()
+            raise
+
+        start = time.perf_counter()
+        try:
+            yield waits
+        finally:
+            service_ms = (time.perf_counter() - start) * 1000
+            for gate in acquired:
+                gate.release(service_ms)
+
+    def stats(self):
+        return {key: gate.stats() for key, gate in self.gates.items()}
+
+
+def parse_limits(spec):
+    """'rf=2,et=2,lgbm=4' → {'rf': 2, 'et': 2, 'lgbm': 4}"""
+    limits = {}
+    for part in spec.split(","):
+        if "=" in part:
+            key, value = part.split("=", 1)
+            limits[key.strip()] = int(value)
+    return limits
+
+
+def parse_float_map(spec):
+    """'NEGATIVE=0.8,NEUTRAL=0.9' → {'NEGATIVE': 0.8, 'NEUTRAL': 0.9}"""
+    values = {}
+    for part in spec.split(","):
+        if "=" in part:
+            key, value = part.split("=", 1)
+            values[key.strip()] = float(value)
+    return values
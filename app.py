@@ -1,5 +1,5 @@
-from fastapi import FastAPI, Request, Body, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, Body, HTTPException, BackgroundTasks
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
@@ -9,13 +9,43 @@ import numpy as np
 import pandas as pd
 from pathlib import Path
 import json
+import csv
+import io
 from datetime import datetime
 import asyncio
+import os
+import hashlib
+import gc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from microbatch import MicroBatcher
+from linear_engine import LinearEngine, top_k_features
+from forest_engine import CompiledForest, is_compilable_forest
+from lgbm_engine import LGBMEngine
+from prediction_cache import PredictionCache
+from executors import InferencePool
+from threadpoolctl import threadpool_limits
+from admission import AdmissionController, ModelSaturated, parse_limits, parse_float_map
+from traffic import TrafficPolicy, ShadowLog
+from model_registry import discover_latest
+from compact_artifact import ArtifactError, CompactArtifact
+from compaction import compact_classifier, compact_vectorizer, max_score_diff, resident_nbytes, restore
+from word_table import build_word_table, load_word_table, word_sentiments
+from feedback_sink import FanOut, FeedbackQueueFull, FeedbackWriter
+from feedback_store import FeedbackStore
+from segmented_log import SegmentedLog
+from error_index import ErrorIndex
+from feedback_stats import FeedbackStats
+from near_duplicates import NearDuplicateIndex
+import compact_artifact
 
 # ======================
 # Setup FastAPI
 # ======================
 app = FastAPI()
+STARTUP_STARTED = time.perf_counter()
 
 BASE_DIR = Path(__file__).resolve().parent
 TEMPLATES_DIR = BASE_DIR / "templates"
@@ -39,99 +69,173 @@ MODELS_NB_DIR      = BASE_DIR / "models_nb"
 MODELS_LGBM_DIR    = BASE_DIR / "models_lgbm"
 MODELS_ET_DIR      = BASE_DIR / "models_et"
 
-# ===== Model A: Logistic Regression (default) =====
-VECTORIZER_A_PATH = MODELS_REGRESS_DIR / "vectorizer_20260210_173038_59628ab2.joblib"
-MODEL_A_PATH      = MODELS_REGRESS_DIR / "sentiment_model_20260210_173038_59628ab2.joblib"
-
-for p in [VECTORIZER_A_PATH, MODEL_A_PATH]:
-    if not p.exists():
-        raise FileNotFoundError(f"❌ ไม่พบไฟล์ Baseline A: {p}")
-
-vectorizer_a = joblib.load(VECTORIZER_A_PATH)
-classifier_a = joblib.load(MODEL_A_PATH)
-
-# ===== Helper: Load model + vectorizer pair =====
-def load_model_pair(vec_path, model_path, name):
-    if vec_path.exists() and model_path.exists():
-        vec = joblib.load(vec_path)
-        model = joblib.load(model_path)
-        return vec, model, True
-    else:
-        print(f"⚠️ ไม่พบโมเดล: {name}")
-        return None, None, False
+# ===== ทะเบียนโมเดล: โหลด UID ล่าสุดของแต่ละโฟลเดอร์ (ดู model_registry.discover_latest) =====
+MODEL_A_KEY = "sentiment_lr"
+MODEL_A_CONFIG = {
+    "dir": MODELS_REGRESS_DIR,
+    "name": MODEL_A_KEY,
+    "version": "TF-IDF + Logistic Regression (Linear, Probabilistic)",
+}
 
-# Define all models — ✅ อัปเดตชื่อไฟล์ให้ตรงกับ timestamp 2026-02-10
 model_configs = {
     "linear": {
-        "vec": MODELS_LINEAR_DIR / "vectorizer_20260210_173236_e42de6e6.joblib",
-        "model": MODELS_LINEAR_DIR / "sentiment_model_20260210_173236_e42de6e6.joblib",
+        "dir": MODELS_LINEAR_DIR,
         "name": "Linear SVM",
         "version": "TF-IDF + Linear SVM (Max-Margin)"
     },
     "rf": {
-        "vec": MODELS_RF_DIR / "vectorizer_20260210_173545_2c0769a7.joblib",
-        "model": MODELS_RF_DIR / "sentiment_model_20260210_173545_2c0769a7.joblib",
+        "dir": MODELS_RF_DIR,
         "name": "Random Forest",
         "version": "TF-IDF + Random Forest"
     },
     "nb": {
-        "vec": MODELS_NB_DIR / "vectorizer_20260210_173444_1c96eeb5.joblib",
-        "model": MODELS_NB_DIR / "sentiment_model_20260210_173444_1c96eeb5.joblib",
+        "dir": MODELS_NB_DIR,
         "name": "Naive Bayes",
         "version": "TF-IDF + Multinomial Naive Bayes"
     },
     "lgbm": {
-        "vec": MODELS_LGBM_DIR / "vectorizer_20260210_173417_6ae59428.joblib",
-        "model": MODELS_LGBM_DIR / "sentiment_model_20260210_173417_6ae59428.joblib",
+        "dir": MODELS_LGBM_DIR,
         "name": "LightGBM",
         "version": "TF-IDF + LightGBM"
     },
     "et": {
-        "vec": MODELS_ET_DIR / "vectorizer_20260210_173329_02c8dcc4.joblib",
-        "model": MODELS_ET_DIR / "sentiment_model_20260210_173329_02c8dcc4.joblib",
+        "dir": MODELS_ET_DIR,
         "name": "Extra Trees",
         "version": "TF-IDF + Extra Trees Classifier"
     }
 }
 
-# Load all optional models
-loaded_models = {}
-for key, cfg in model_configs.items():
-    vec, model, ok = load_model_pair(cfg["vec"], cfg["model"], cfg["name"])
-    if ok:
-        loaded_models[key] = {
-            "vectorizer": vec,
-            "classifier": model,
-            "name": cfg["name"],
-            "version": cfg["version"]
-        }
+def registry_configs():
+    return {MODEL_A_KEY: MODEL_A_CONFIG, **model_configs}
 
-# ======================
-# Global word sentiment (Model A only)
-# ======================
-def get_global_word_sentiment():
-    coefs = classifier_a.coef_
-    classes = classifier_a.classes_
-    feature_names = vectorizer_a.get_feature_names_out()
+# ===== Helper: Shared vectorizers =====
+# ทุกสคริปต์เทรนใช้ TfidfVectorizer ตั้งค่าเดียวกันบน split เดียวกัน
+# → fingerprint (params + vocabulary + idf) แล้วใช้ instance เดียวร่วมกัน
+VECTORIZER_POOL = {}
+FEATURE_NAMES = {}  # id(vectorizer) → feature names (คำนวณครั้งเดียวตอนโหลด)
 
-    idx_to_sentiment = {}
-    for i, cls in enumerate(classes):
-        c = str(cls).lower()
-        if c in ["positive", "pos", "ดี"]:
-            idx_to_sentiment[i] = "positive"
-        elif c in ["negative", "neg", "แย่", "ห่วย"]:
-            idx_to_sentiment[i] = "negative"
-        else:
-            idx_to_sentiment[i] = "neutral"
+# ===== Memory compaction =====
+# เก็บ idf / coef / feature_log_prob เป็น float32 (forest: leaf_proba float32, node index int32) — ปิดได้ด้วย MODEL_COMPACT=0
+# vocabulary ไม่ต้องแตะ: vectorizer ที่เหมือนกันใช้ instance เดียวใน VECTORIZER_POOL อยู่แล้ว
+MODEL_COMPACT        = os.getenv("MODEL_COMPACT", "1") == "1"
+MODEL_COMPACT_VERIFY = os.getenv("MODEL_COMPACT_VERIFY", "0") == "1"  # เทียบผลก่อน/หลัง compact ตอนโหลด
+COMPACT_ATOL = 1e-4
+VECTORIZER_MEMORY = {}  # fingerprint → {"original_bytes", "compact_bytes"}
+
+def vectorizer_fingerprint(vec):
+    # รูปแบบ canonical เดียวกับ compact artifact → vectorizer จาก joblib และ compact แชร์กันได้
+    try:
+        return compact_artifact.vectorizer_fingerprint(vec)
+    except ArtifactError:
+        pass  # vectorizer ที่ export ไม่ได้ (callable tokenizer ฯลฯ)
+    h = hashlib.sha1()
+    params = sorted((k, repr(v)) for k, v in vec.get_params().items())
+    h.update(repr(params).encode("utf-8"))
+    for word, idx in sorted(vec.vocabulary_.items()):
+        h.update(f"{word}\t{idx}\n".encode("utf-8"))
+    h.update(np.ascontiguousarray(vec.idf_).tobytes())
+    return h.hexdigest()[:16]
 
-    word_sentiment = {}
-    for i, word in enumerate(feature_names):
-        class_idx = int(np.argmax(coefs[:, i]))
-        word_sentiment[word] = idx_to_sentiment.get(class_idx, "neutral")
+def share_vectorizer(vec, fp=None):
+    """คืน (vectorizer ที่ใช้ร่วมกัน, fingerprint)"""
+    if fp is None:
+        fp = vectorizer_fingerprint(vec)
+    if MODEL_COMPACT and fp not in VECTORIZER_POOL:
+        compact_pooled_vectorizer(vec, fp)
+    shared = VECTORIZER_POOL.setdefault(fp, vec)
+    if id(shared) not in FEATURE_NAMES:
+        FEATURE_NAMES[id(shared)] = shared.get_feature_names_out()
+    return shared, fp
 
-    return word_sentiment
+def get_feature_names(vec):
+    names = FEATURE_NAMES.get(id(vec))
+    if names is None:
+        names = FEATURE_NAMES[id(vec)] = vec.get_feature_names_out()
+    return names
 
-GLOBAL_WORD_SENTIMENT = get_global_word_sentiment()
+def prune_vectorizer_pool(entries):
+    """ทิ้ง vectorizer ที่ไม่มี entry ไหนใช้แล้ว (หลังสลับโมเดลชุดใหม่)"""
+    in_use = {mdl["vectorizer_fp"] for mdl in entries}
+    for fp in list(VECTORIZER_POOL):
+        if fp not in in_use:
+            FEATURE_NAMES.pop(id(VECTORIZER_POOL.pop(fp)), None)
+            VECTORIZER_MEMORY.pop(fp, None)
+
+def compact_pooled_vectorizer(vec, fp):
+    """idf เป็น float32 (ตรวจ parity ก่อนใช้ถ้า MODEL_COMPACT_VERIFY=1)"""
+    texts = load_verify_texts() if MODEL_COMPACT_VERIFY else []
+    expected = vec.transform(texts) if texts else None
+    originals, before, after = compact_vectorizer(vec)
+    if expected is not None and originals:
+        diff = abs(vec.transform(texts) - expected).max()
+        if diff > COMPACT_ATOL:
+            restore(vec, originals)
+            print(f"⚠️ compact vectorizer {fp} ไม่ผ่าน parity (diff {diff:.2e}) — ใช้ค่าเดิม")
+            return
+    VECTORIZER_MEMORY[fp] = {"original_bytes": before, "compact_bytes": after}
+
+def classifier_scores(X, classifier):
+    scores = classifier.predict_proba(X) if hasattr(classifier, "predict_proba") else classifier.decision_function(X)
+    return classifier.predict(X), scores
+
+def compact_entry_classifier(key, vec, clf):
+    """แปลง array ของ classifier เป็น float32 / int32 → {"original_bytes", "compact_bytes"}"""
+    texts = load_verify_texts() if MODEL_COMPACT_VERIFY else []
+    X = vec.transform(texts) if texts else None
+    expected = classifier_scores(X, clf) if X is not None else None
+    originals, before, after = compact_classifier(clf)
+    if expected is not None and originals:
+        diff = max_score_diff(expected, classifier_scores(X, clf))
+        if diff > COMPACT_ATOL:
+            restore(clf, originals)
+            print(f"⚠️ compact {key} ไม่ผ่าน parity (diff {diff:.2e}) — ใช้ค่าเดิม")
+            return {"original_bytes": before, "compact_bytes": before}
+        print(f"✅ compact parity OK: {key} ({len(texts)} texts, max diff {diff:.2e})")
+    return {"original_bytes": before, "compact_bytes": after}
+
+def memory_report(mdl):
+    """หน่วยความจำที่โมเดลถือจริง (classifier รวม forest เดิมที่โหลดไว้เป็น fallback + fast path + ตารางคำ)
+
+    ไม่รวม vectorizer ที่แชร์กัน (นับครั้งเดียวใน memory.vectorizers ของ /model/info)
+    saved_bytes = ที่ compact ประหยัดได้ หักด้วย forest เดิมที่ถือเพิ่ม → ติดลบได้ถ้า fallback ใหญ่กว่าที่ประหยัด
+    """
+    vec = mdl["vectorizer"]
+    classifier = mdl["classifier"]
+    private, mapped = resident_nbytes(classifier, mdl["fast"], mdl["lgbm"], mdl["word_sentiment"], exclude=(vec,))
+    fallback = getattr(classifier, "fallback", None)
+    fallback_bytes = sum(resident_nbytes(fallback, exclude=(vec,))) if fallback is not None else 0
+    compaction = mdl.get("memory")
+    saved = compaction["original_bytes"] - compaction["compact_bytes"] if compaction else 0
+    return {
+        "resident_bytes": private,
+        "mapped_bytes": mapped,
+        "fallback_bytes": fallback_bytes,
+        "compaction": compaction,
+        "saved_bytes": saved - fallback_bytes,
+    }
+
+def vectorizer_memory_report(fp):
+    vec = VECTORIZER_POOL[fp]
+    private, mapped = resident_nbytes(vec, FEATURE_NAMES.get(id(vec)))
+    return {"resident_bytes": private, "mapped_bytes": mapped, "compaction": VECTORIZER_MEMORY.get(fp)}
+
+# ===== ข้อความตัวอย่างสำหรับตรวจ parity ของ fast path กับ sklearn =====
+VERIFY_SAMPLES = 200
+
+def load_verify_texts(limit=VERIFY_SAMPLES):
+    sample_path = DATA_DIR / "1.synthetic_wisesight_like_thai_sentiment_5000.csv"
+    if not sample_path.exists():
+        return []
+    return pd.read_csv(sample_path)["text"].astype(str).tolist()[:limit]
+
+# ======================
+# Word sentiment: ตารางต่อโมเดล เรียงตาม column ของ vectorizer (ดู word_table.py)
+# ======================
+def lookup_sentiments(word_sentiment, indices):
+    """sentiment ของ feature index ที่เลือก — lookup array ครั้งเดียว"""
+    if word_sentiment is None:
+        return ["neutral"] * len(indices)
+    return word_sentiment[np.asarray(indices, dtype=np.int64)].tolist()
 
 # ======================
 # Label mapping helper
@@ -163,52 +267,823 @@ def normalize_label(label):
 # ======================
 # Helper: Important words (Baseline models)
 # ======================
-def get_important_words(text: str, vectorizer, classifier, top_k: int = 5):
+def get_important_words(text: str, vectorizer, classifier, top_k: int = 5, word_sentiment=None):
     X = vectorizer.transform([text])
-    feature_names = vectorizer.get_feature_names_out()
+    return get_important_words_from_row(X, vectorizer, classifier, top_k=top_k, word_sentiment=word_sentiment)
+
+def get_important_words_from_row(X, vectorizer, classifier, top_k: int = 5, class_idx=None, word_sentiment=None):
+    """หาคำสำคัญจากแถว TF-IDF ที่ transform แล้ว (1 แถว) — ใช้ร่วมกับ batch ได้
+
+    คำนวณเฉพาะ feature ที่ไม่เป็นศูนย์ในแถว CSR (O(nnz)) ไม่แปลงเป็น dense
+    """
+    row = X.tocsr()
+    indices, values = row.indices, row.data
+    feature_names = get_feature_names(vectorizer)
 
     # 🌳 Tree-based models: RF, LightGBM, Extra Trees
     if hasattr(classifier, "feature_importances_"):
-        imp = classifier.feature_importances_
-        present = X.toarray()[0]
-        contributions = present * imp
-        top_indices = np.argsort(contributions)[::-1][:top_k]
-        words = [feature_names[i] for i in top_indices if contributions[i] > 0]
-        sents = [GLOBAL_WORD_SENTIMENT.get(w, "neutral") for w in words]
-        return words[:top_k], sents[:top_k]
+        contributions = values * classifier.feature_importances_[indices]
+        keep = contributions > 0
+        indices, contributions = indices[keep], contributions[keep]
+        top = top_k_features(indices, contributions, top_k)
+        return [feature_names[j] for j in top], lookup_sentiments(word_sentiment, top)
 
     # 📈 Linear models: LogisticRegression, LinearSVC, Naive Bayes
     elif hasattr(classifier, "coef_"):
-        if hasattr(classifier, "predict_proba"):
-            probs = classifier.predict_proba(X)[0]
-            class_idx = int(np.argmax(probs))
-            if classifier.coef_.shape[0] > 1:
-                coef = classifier.coef_[class_idx]
-            else:
-                coef = classifier.coef_[0]
+        if classifier.coef_.shape[0] == 1:
+            coef = classifier.coef_[0]
         else:
-            if classifier.coef_.shape[0] == 1:
-                coef = classifier.coef_[0]
-            else:
-                decision = classifier.decision_function(X)
-                class_idx = int(np.argmax(decision))
-                coef = classifier.coef_[class_idx]
-
-        contributions = X.toarray()[0] * coef
-        top_indices = np.argsort(np.abs(contributions))[::-1][:top_k]
-        words, sentiments = [], []
-        for i in top_indices:
-            if contributions[i] == 0:
-                continue
-            word = feature_names[i]
-            words.append(word)
-            sentiments.append(GLOBAL_WORD_SENTIMENT.get(word, "neutral"))
-        return words, sentiments
+            if class_idx is None:
+                if hasattr(classifier, "predict_proba"):
+                    class_idx = int(np.argmax(classifier.predict_proba(X)[0]))
+                else:
+                    class_idx = int(np.argmax(classifier.decision_function(X)))
+            coef = classifier.coef_[class_idx]
+
+        contributions = values * coef[indices]
+        keep = contributions != 0
+        indices, contributions = indices[keep], contributions[keep]
+        top = top_k_features(indices, np.abs(contributions), top_k)
+        return [feature_names[j] for j in top], lookup_sentiments(word_sentiment, top)
 
     # ❓ Fallback
     else:
         return [], []
 
+# ======================
+# Helper: Batch scoring (1 transform + 1 predict ต่อโมเดล)
+# ======================
+MAX_BATCH_TEXTS = 5000
+
+def model_entry(key):
+    """entry ของโมเดล (รวม Model A) หรือ None
+
+    อ่านครั้งเดียวต่อ request แล้วใช้ entry นั้นตลอด → ถ้ามีการ hot reload ระหว่างทาง
+    จะไม่ได้ vectorizer ของชุดใหม่ปนกับ classifier ของชุดเก่า
+    """
+    return model_a if key == MODEL_A_KEY else loaded_models.get(key)
+
+def get_model_entry(key):
+    """คืน (vectorizer, classifier, name, version, vectorizer_fp) ของ key ที่ระบุ หรือ None"""
+    mdl = model_entry(key)
+    if mdl is None:
+        return None
+    return mdl["vectorizer"], mdl["classifier"], mdl["name"], mdl["version"], mdl["vectorizer_fp"]
+
+def score_matrix(X, classifier):
+    """ทำนายทั้ง batch ในครั้งเดียว → (labels, confidences, class_indices)"""
+    classes = classifier.classes_
+    if hasattr(classifier, "predict_proba"):
+        probs = classifier.predict_proba(X)
+        class_idx = np.argmax(probs, axis=1)
+        confidences = probs[np.arange(len(class_idx)), class_idx]
+    elif hasattr(classifier, "decision_function"):
+        score = classifier.decision_function(X)
+        if score.ndim == 1:
+            class_idx = (score > 0).astype(int)
+            first = score
+        else:
+            class_idx = np.argmax(score, axis=1)
+            first = score[:, 0]
+        confidences = 1 / (1 + np.exp(-np.abs(first)))
+    else:
+        preds = classifier.predict(X)
+        class_idx = np.searchsorted(classes, preds)
+        confidences = np.full(len(preds), 0.95)  # fallback
+
+    labels = [normalize_label(classes[i]) for i in class_idx]
+    return labels, confidences, class_idx
+
+def predict_batch_with_model(texts, vectorizer, classifier, with_words=True, top_k=5, X=None, word_sentiment=None):
+    if X is None:
+        X = vectorizer.transform(texts)
+    labels, confidences, class_idx = score_matrix(X, classifier)
+    items = []
+    for i, label in enumerate(labels):
+        item = {"label": label, "confidence": round(float(confidences[i]), 2)}
+        if with_words:
+            words, sents = get_important_words_from_row(
+                X[i], vectorizer, classifier, top_k=top_k, class_idx=int(class_idx[i]),
+                word_sentiment=word_sentiment,
+            )
+            item["important_words"] = words
+            item["word_sentiments"] = sents
+        items.append(item)
+    return items
+
+def predict_batch_entry(mdl, texts, with_words=True, top_k=5, X=None):
+    return predict_batch_with_model(
+        texts, mdl["vectorizer"], mdl["classifier"], with_words=with_words, top_k=top_k, X=X,
+        word_sentiment=mdl["word_sentiment"],
+    )
+
+# ======================
+# Fast path: โมเดลเชิงเส้นแบบ compile เป็น float32 array (LR / LinearSVC / NB)
+# ======================
+FAST_LINEAR_ENABLED = os.getenv("FAST_LINEAR", "1") == "1"
+FAST_LINEAR_VERIFY  = os.getenv("FAST_LINEAR_VERIFY", "0") == "1"
+
+def predict_fast(mdl, text, features=None, top_k: int = 5):
+    """ทำนายด้วย LinearEngine ของ entry → (label, confidence, words, sentiments, features)
+
+    features = (indices, weights) จาก featurize() ส่งต่อให้โมเดลที่ใช้ vectorizer เดียวกันได้
+    """
+    engine = mdl["fast"]
+    if features is None:
+        features = engine.featurize(text)
+    idx, w = features
+    class_idx, confidence, _ = engine.predict_features(idx, w)
+    feature_names = get_feature_names(mdl["vectorizer"])
+    top = engine.important_indices(idx, w, class_idx, top_k)
+    words = [feature_names[j] for j in top]
+    sents = lookup_sentiments(mdl["word_sentiment"], top)
+    return normalize_label(engine.classes[class_idx]), confidence, words, sents, features
+
+# ======================
+# LightGBM: เรียก booster ครั้งเดียว (pred_contrib) ได้ทั้ง label, prob และคำสำคัญรายข้อความ
+# ======================
+LGBM_NUM_THREADS = int(os.getenv("LGBM_NUM_THREADS", "1"))
+
+def predict_lgbm_rows(mdl, X, with_words=True, top_k: int = 5):
+    engine = mdl["lgbm"]
+    feature_names = get_feature_names(mdl["vectorizer"])
+    class_idx, probs, top_features = engine.predict(X, top_k=top_k)
+
+    items = []
+    for i, c in enumerate(class_idx):
+        item = {
+            "label": normalize_label(engine.classes[c]),
+            "confidence": round(float(probs[i, c]), 2),
+        }
+        if with_words:
+            item["important_words"] = [feature_names[j] for j in top_features[i]]
+            item["word_sentiments"] = lookup_sentiments(mdl["word_sentiment"], top_features[i])
+        items.append(item)
+    return items
+
+# ======================
+# Single-text prediction (ใช้ fast path / LightGBM engine / sklearn ตามที่มี)
+# ======================
+def predict_item(key, text, shared=None):
+    """ทำนายข้อความเดียว → {label, confidence, important_words, word_sentiments}
+
+    shared: dict ที่เก็บ feature ที่ featurize แล้วตาม vectorizer_fp เพื่อใช้ซ้ำข้ามโมเดล
+    """
+    return predict_entry(model_entry(key), text, shared)
+
+def predict_entry(mdl, text, shared=None):
+    if shared is None:
+        shared = {}
+    vec, clf, fp = mdl["vectorizer"], mdl["classifier"], mdl["vectorizer_fp"]
+
+    if mdl["fast"] is not None:
+        pred, prob, words, sents, shared[("fast", fp)] = predict_fast(
+            mdl, text, features=shared.get(("fast", fp))
+        )
+        return {
+            "label": pred,
+            "confidence": round(prob, 2),
+            "important_words": words,
+            "word_sentiments": sents,
+        }
+
+    # vectorizer เดียวกัน → ใช้แถว TF-IDF เดิมซ้ำ ไม่ต้อง transform ใหม่
+    X = shared.get(("X", fp))
+    if X is None:
+        X = shared[("X", fp)] = vec.transform([text])
+
+    if mdl["lgbm"] is not None:
+        return predict_lgbm_rows(mdl, X)[0]
+
+    pred = normalize_label(clf.predict(X)[0])
+
+    # Confidence logic
+    if hasattr(clf, "predict_proba"):
+        prob = float(np.max(clf.predict_proba(X)[0]))
+    elif hasattr(clf, "decision_function"):
+        score = clf.decision_function(X)
+        prob = float(1 / (1 + np.exp(-abs(score.ravel()[0]))))
+    else:
+        prob = 0.95  # fallback
+
+    words, sents = get_important_words_from_row(X, vec, clf, word_sentiment=mdl["word_sentiment"])
+    return {
+        "label": pred,
+        "confidence": round(prob, 2),
+        "important_words": words,
+        "word_sentiments": sents,
+    }
+
+# ======================
+# Model registry: โหลด artifact + compile engine ที่ใช้ได้ เป็น entry เดียวต่อโมเดล
+# ======================
+# ===== Compile RF / Extra Trees เป็น node array ชุดเดียว (ใช้แทน predict/predict_proba) =====
+FOREST_COMPILE_ENABLED = os.getenv("FOREST_COMPILE", "1") == "1"
+FOREST_VERIFY          = os.getenv("FOREST_VERIFY", "0") == "1"
+FOREST_FALLBACK_ROWS   = int(os.getenv("FOREST_FALLBACK_ROWS", "0"))  # batch ตั้งแต่กี่แถวส่งให้ sklearn (0 = ไม่ใช้)
+
+WARMUP_TEXTS = ["สินค้าดีมาก ประทับใจ", "แย่มาก ผิดหวัง", "ก็โอเคนะ ส่งช้านิดหน่อย"]
+
+# eager = โหลดทุกโมเดลตอน import (เดิม) / lazy = โหลดโมเดลเสริมเมื่อมี request แรก
+# background = เริ่มรับ request ด้วย Model A แล้วโหลดโมเดลเสริมใน task เบื้องหลัง
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "eager")
+# map array ใน artifact (coef_, feature_log_prob_ ฯลฯ) จากไฟล์แบบ read-only แทนการ copy เข้า heap
+# → หลาย process ที่โหลดไฟล์เดียวกันใช้ page ของ OS ร่วมกัน (ใช้ได้กับไฟล์ joblib ที่ไม่บีบอัด)
+MODEL_MMAP = os.getenv("MODEL_MMAP", "0") == "1"
+# auto = ใช้ compact_{uid}/ (ไม่มี pickle) ถ้ามี ไม่เช่นนั้น joblib / joblib = ใช้ joblib เสมอ
+MODEL_ARTIFACT_FORMAT = os.getenv("MODEL_ARTIFACT_FORMAT", "auto")
+ARTIFACT_VERIFY = os.getenv("ARTIFACT_VERIFY", "1") == "1"  # ตรวจ sha256 ของทุก array ตอนโหลด
+
+def load_artifacts(key, found, load_ms):
+    """โหลด (vectorizer, fingerprint, classifier, format) — compact ก่อน แล้ว fallback เป็น joblib"""
+    if found["compact"] is not None and MODEL_ARTIFACT_FORMAT != "joblib":
+        t = time.perf_counter()
+        try:
+            art = CompactArtifact(found["compact"], mmap=MODEL_MMAP, verify=ARTIFACT_VERIFY)
+            # vectorizer ที่มีใน pool แล้วไม่ต้องสร้าง vocabulary dict ใหม่
+            fp = art.vectorizer_fingerprint()
+            vec = VECTORIZER_POOL.get(fp)
+            if vec is None:
+                vec, fp = share_vectorizer(art.build_vectorizer(), fp)
+            clf = art.build_classifier()
+            load_ms[found["compact"].name] = (time.perf_counter() - t) * 1000
+            return vec, fp, clf, "compact"
+        except ArtifactError as e:
+            if found["model"] is None:
+                raise
+            print(f"⚠️ {key}: ใช้ compact artifact ไม่ได้ ({e}) — โหลด joblib แทน")
+
+    if found["model"] is None:
+        raise ArtifactError(f"{key}: มีเฉพาะ compact artifact แต่ตั้ง MODEL_ARTIFACT_FORMAT=joblib")
+    mmap_mode = "r" if MODEL_MMAP else None
+    t = time.perf_counter()
+    vec, fp = share_vectorizer(joblib.load(found["vectorizer"], mmap_mode=mmap_mode))
+    load_ms[found["vectorizer"].name] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    clf = joblib.load(found["model"], mmap_mode=mmap_mode)
+    load_ms[found["model"].name] = (time.perf_counter() - t) * 1000
+    return vec, fp, clf, "joblib"
+
+def build_model_entry(key, cfg, found):
+    """โหลด vectorizer + model ของ UID ที่หาเจอ แล้ว compile fast path / forest / LightGBM → entry
+
+    load_ms เก็บเวลาที่ใช้ต่อ artifact และต่อขั้นตอน (รายงานใน /admin/reload)
+    """
+    load_ms = {}
+    vec, fp, clf, fmt = load_artifacts(key, found, load_ms)
+
+    t = time.perf_counter()
+    entry = {
+        "vectorizer": vec,
+        "vectorizer_fp": fp,
+        "uid": found["uid"],
+        "classifier": clf,
+        "name": cfg["name"],
+        "version": cfg["version"],
+        "model_path": found["compact"] if fmt == "compact" else found["model"],
+        "source": found["source"],
+        "format": fmt,
+        "compiled": isinstance(clf, CompiledForest),  # compact artifact เก็บ forest แบบ compile แล้ว
+        "fast": None,
+        "lgbm": None,
+    }
+
+    if FOREST_COMPILE_ENABLED and is_compilable_forest(clf):
+        compiled = CompiledForest.compile(clf)
+        if FOREST_VERIFY:
+            verify_texts = load_verify_texts()
+            if verify_texts:
+                compiled.verify(vec.transform(verify_texts), clf)
+                print(f"✅ compiled forest parity OK: {key} ({len(verify_texts)} texts)")
+        entry["classifier"] = compiled
+        entry["compiled"] = True
+
+    if MODEL_COMPACT:
+        entry["memory"] = compact_entry_classifier(key, vec, entry["classifier"])
+
+    if entry["compiled"] and FOREST_FALLBACK_ROWS > 0 and found["model"] is not None:
+        # ไม่เก็บ clf ไว้ — โหลด forest เดิมจาก joblib ครั้งแรกที่มี batch ใหญ่ถึง (ไม่ต้องถือสองชุดถ้าไม่มี batch ใหญ่)
+        entry["classifier"].fallback_loader = partial(joblib.load, found["model"], mmap_mode="r" if MODEL_MMAP else None)
+        entry["classifier"].fallback_rows = FOREST_FALLBACK_ROWS
+
+    if FAST_LINEAR_ENABLED:
+        engine = LinearEngine.compile(vec, clf)
+        if engine is not None and FAST_LINEAR_VERIFY:
+            verify_texts = load_verify_texts()
+            if verify_texts:
+                engine.verify(verify_texts, vec, clf)
+                print(f"✅ fast path parity OK: {key} ({len(verify_texts)} texts)")
+        entry["fast"] = engine
+
+    entry["lgbm"] = LGBMEngine.compile(clf, num_threads=LGBM_NUM_THREADS)
+
+    entry["word_sentiment"], entry["word_table"] = load_word_sentiment(key, vec, entry["classifier"], found)
+    load_ms["compile"] = (time.perf_counter() - t) * 1000
+
+    entry["load_ms"] = load_ms
+    return entry
+
+def load_word_sentiment(key, vec, clf, found):
+    """ตาราง sentiment ของคำตาม column ของ vectorizer → (array, ที่มา)
+
+    ใช้ word_sentiment_{uid}.npz ที่สคริปต์เทรนบันทึกไว้ ถ้าไม่มี (โมเดลที่เทรนก่อนมีตาราง)
+    โมเดลเชิงเส้นคำนวณจาก coef_ / feature_log_prob_ ได้ทันที ส่วนโมเดล tree ยืมของ Model A ตามคำ
+    """
+    n_features = len(vec.vocabulary_)
+    if found.get("word_table") is not None:
+        try:
+            return load_word_table(found["word_table"], n_features)[0], "file"
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ {key}: ใช้ {found['word_table'].name} ไม่ได้ ({e})")
+    try:
+        return word_sentiments(build_word_table(clf)[0]), "computed"
+    except ValueError:
+        pass
+    if key == MODEL_A_KEY:
+        return None, "none"
+    donor = model_a
+    if donor["vectorizer"] is vec:
+        return donor["word_sentiment"], MODEL_A_KEY
+    names = get_feature_names(vec)
+    donor_vocab = donor["vectorizer"].vocabulary_
+    cols = np.fromiter((donor_vocab.get(w, -1) for w in names), dtype=np.int64, count=len(names))
+    table = np.full(n_features, "neutral", dtype=object)
+    table[cols >= 0] = donor["word_sentiment"][cols[cols >= 0]]
+    return table, MODEL_A_KEY
+
+def warm_entry(mdl):
+    """ทำนายข้อความตัวอย่างก่อนสลับเข้าใช้งาน (lazy init ของ sklearn / LightGBM / cache ของ CPU)"""
+    t = time.perf_counter()
+    for text in WARMUP_TEXTS:
+        predict_entry(mdl, text)
+    mdl["load_ms"]["warmup"] = (time.perf_counter() - t) * 1000
+
+def log_load_timing(key, mdl):
+    parts = " | ".join(f"{name} {ms:.1f} ms" for name, ms in mdl["load_ms"].items())
+    print(f"⏱️ โหลด {key} ({mdl['uid']}): {parts}")
+
+found_a = discover_latest(MODEL_A_CONFIG["dir"])
+if found_a is None:
+    raise FileNotFoundError(f"❌ ไม่พบไฟล์ Baseline A ใน {MODEL_A_CONFIG['dir']}")
+model_a = build_model_entry(MODEL_A_KEY, MODEL_A_CONFIG, found_a)
+log_load_timing(MODEL_A_KEY, model_a)
+
+# Load all optional models (โหมด lazy / background เก็บไว้ใน pending_models ก่อน)
+loaded_models = {}
+pending_models = {}  # key → (cfg, found) ที่หา artifact เจอแล้วแต่ยังไม่โหลด
+for key, cfg in model_configs.items():
+    found = discover_latest(cfg["dir"])
+    if found is None:
+        print(f"⚠️ ไม่พบโมเดล: {cfg['name']}")
+        continue
+    if MODEL_LOAD_MODE == "eager":
+        try:
+            loaded_models[key] = build_model_entry(key, cfg, found)
+        except ArtifactError as e:
+            print(f"⚠️ โหลดโมเดล {cfg['name']} ไม่ได้: {e}")
+            continue
+        log_load_timing(key, loaded_models[key])
+    else:
+        pending_models[key] = (cfg, found)
+
+def known_model_keys():
+    """โมเดลเสริมที่ใช้ได้ (โหลดแล้ว หรือรอโหลดแบบ lazy) ตามลำดับใน model_configs"""
+    return [k for k in model_configs if k in loaded_models or k in pending_models]
+
+print(f"⏱️ import + โหลดโมเดล {(time.perf_counter() - STARTUP_STARTED) * 1000:.0f} ms "
+      f"(mode={MODEL_LOAD_MODE}, loaded={[MODEL_A_KEY, *loaded_models]}, pending={list(pending_models)})")
+
+# ======================
+# Prediction cache (LRU) — คีย์ (ข้อความ normalize แล้ว, model key, artifact UID)
+# ======================
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("PREDICTION_CACHE_ENTRIES", "10000")),
+    max_bytes=int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_S", "0")),
+)
+
+def model_uid(key):
+    return model_entry(key)["uid"]
+
+def predict_items(keys, text, shared=None):
+    """ทำนายหลายโมเดลใน call เดียว (featurize ร่วมกัน) → [(item, latency_ms)]"""
+    if shared is None:
+        shared = {}
+    out = []
+    for key in keys:
+        start = time.time()
+        item = predict_item(key, text, shared)
+        out.append((item, (time.time() - start) * 1000))
+    return out
+
+# ======================
+# Inference thread pools: แยกตามกลุ่มโมเดล (linear เร็ว / tree ช้า) ออกจาก threadpool ของ I/O
+# ======================
+INFERENCE_THREADS_LINEAR = int(os.getenv("INFERENCE_THREADS_LINEAR", "4"))
+INFERENCE_THREADS_TREE   = int(os.getenv("INFERENCE_THREADS_TREE", "2"))
+# จำกัด thread ของ BLAS/OpenMP ต่อ request — ขนานกันที่ระดับ pool แทน เพื่อไม่ให้ oversubscribe core
+INFERENCE_BLAS_THREADS   = int(os.getenv("INFERENCE_BLAS_THREADS", "1"))
+
+if INFERENCE_BLAS_THREADS > 0:
+    threadpool_limits(limits=INFERENCE_BLAS_THREADS)
+
+inference_pools = {
+    "linear": InferencePool("linear", INFERENCE_THREADS_LINEAR),
+    "tree": InferencePool("tree", INFERENCE_THREADS_TREE),
+}
+
+def model_family(key):
+    """'tree' สำหรับ RF / Extra Trees / LightGBM, 'linear' สำหรับที่เหลือ"""
+    mdl = model_entry(key)
+    if mdl["lgbm"] is not None:
+        return "tree"
+    return "tree" if hasattr(mdl["classifier"], "feature_importances_") else "linear"
+
+def family_of(keys):
+    return "tree" if any(model_family(k) == "tree" for k in keys) else "linear"
+
+# ======================
+# Process pool (opt-in): fork worker หลังโหลดโมเดลแล้ว → แชร์หน่วยความจำโมเดลแบบ copy-on-write
+# ======================
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", "0"))
+process_pool = None
+
+def start_process_pool():
+    global process_pool
+    if INFERENCE_PROCESSES <= 0 or process_pool is not None:
+        return
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print("⚠️ ระบบนี้ไม่รองรับ fork — ใช้ threadpool แทน process pool")
+        return
+
+    # ย้าย object ที่โหลดแล้วไป permanent generation เพื่อไม่ให้ GC ใน worker
+    # เขียนทับ page ของโมเดล (ลดการ copy จาก copy-on-write)
+    gc.collect()
+    gc.freeze()
+    process_pool = ProcessPoolExecutor(
+        max_workers=INFERENCE_PROCESSES,
+        mp_context=multiprocessing.get_context("fork"),
+    )
+    # fork ทุก worker ตอนนี้เลย (ก่อนมี request) แทนการ fork ตอนเจองานแรก
+    for f in [process_pool.submit(os.getpid) for _ in range(INFERENCE_PROCESSES)]:
+        f.result()
+
+def stop_process_pool():
+    global process_pool
+    if process_pool is not None:
+        process_pool.shutdown(wait=True, cancel_futures=True)
+        process_pool = None
+
+def restart_process_pool():
+    """fork worker ชุดใหม่หลังสลับโมเดล (worker เดิมถือสำเนาโมเดลเก่า) — งานที่ค้างใน pool เดิมทำต่อจนเสร็จ"""
+    global process_pool
+    old = process_pool
+    if old is None:
+        return
+    process_pool = None
+    start_process_pool()
+    old.shutdown(wait=True)
+
+async def run_inference(family, fn, *args):
+    """รันงานทำนาย (CPU-bound) ใน process pool ถ้าเปิดไว้ ไม่เช่นนั้นใช้ inference pool ของกลุ่มโมเดล"""
+    if process_pool is not None:
+        return await asyncio.get_running_loop().run_in_executor(process_pool, fn, *args)
+    return await inference_pools[family].run(fn, *args)
+
+# ======================
+# Admission control: จำกัดงานพร้อมกันต่อโมเดลที่ช้า + คิวรอที่มี deadline
+# ======================
+admission = AdmissionController(
+    parse_limits(os.getenv("ADMISSION_LIMITS", "rf=2,et=2,lgbm=4")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "16")),
+    max_wait_ms=float(os.getenv("ADMISSION_MAX_WAIT_MS", "500")),
+)
+# /predict-ab: ถ้า Model B เต็ม ให้ตอบด้วย Model A แทน 429/503 (override ต่อ request ด้วย fallback_to_a)
+ADMISSION_DEGRADE_TO_A = os.getenv("ADMISSION_DEGRADE_TO_A", "0") == "1"
+
+@app.exception_handler(ModelSaturated)
+async def model_saturated_handler(request: Request, exc: ModelSaturated):
+    return JSONResponse(
+        {"error": str(exc), "model": exc.model_key, "reason": exc.reason},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+async def predict_items_async(keys, text, shared=None):
+    """เหมือน predict_items แต่เช็ค cache ใน process หลักก่อน และผ่าน admission control
+
+    คืน [(item, latency_ms, cached, queue_wait_ms)] — raise ModelSaturated ถ้าโมเดลเต็ม
+    """
+    await ensure_loaded(keys)
+    results = {}
+    missing = []
+    for key in keys:
+        start = time.time()
+        cache_key = prediction_cache.make_key(text, key, model_uid(key))
+        item = prediction_cache.get(cache_key)
+        if item is not None:
+            results[key] = (item, (time.time() - start) * 1000, True, 0.0)
+        else:
+            missing.append((key, cache_key))
+
+    if missing:
+        missing_keys = [k for k, _ in missing]
+        async with admission.admit(missing_keys) as waits:
+            computed = await run_inference(
+                family_of(missing_keys), predict_items, missing_keys, text, shared
+            )
+        for (key, cache_key), (item, latency) in zip(missing, computed):
+            prediction_cache.put(cache_key, item)
+            results[key] = (item, latency, False, waits[key])
+
+    return [results[key] for key in keys]
+
+# ======================
+# Micro-batching (opt-in): รวม /predict ที่เข้ามาพร้อมกันเป็น batch เดียวต่อโมเดล
+# ======================
+MICROBATCH_ENABLED   = os.getenv("MICROBATCH_ENABLED", "0") == "1"
+MICROBATCH_WINDOW_MS = float(os.getenv("MICROBATCH_WINDOW_MS", "3"))
+MICROBATCH_MAX_SIZE  = int(os.getenv("MICROBATCH_MAX_SIZE", "32"))
+
+microbatchers = {}
+
+def predict_texts_entry(mdl, texts):
+    """ทำนายหลายข้อความด้วย engine เดียวกับ predict_entry → ผลเหมือนทำทีละข้อความ (ใช้ cache key เดียวกันได้)
+
+    LightGBM อธิบายด้วย pred_contrib รายข้อความ ไม่ใช่ feature_importances_ รวมของ sklearn
+    """
+    if mdl["lgbm"] is not None:
+        return predict_lgbm_rows(mdl, mdl["vectorizer"].transform(texts))
+    return predict_batch_entry(mdl, texts)
+
+def get_microbatcher(key):
+    if key not in microbatchers:
+        # อ่าน entry ตอนรันแต่ละ batch → ใช้โมเดลชุดใหม่ทันทีหลัง hot reload
+        microbatchers[key] = MicroBatcher(
+            lambda texts: predict_texts_entry(model_entry(key), texts),
+            max_batch_size=MICROBATCH_MAX_SIZE,
+            max_wait_ms=MICROBATCH_WINDOW_MS,
+            name=key,
+            executor=inference_pools[model_family(key)].executor,
+        )
+    return microbatchers[key]
+
+# ======================
+# Hot reload: โหลด artifact ใหม่เบื้องหลัง → warm → สลับเข้าแทนที่โดยไม่หยุดรับ request
+# ======================
+MODEL_RELOAD_INTERVAL_S = float(os.getenv("MODEL_RELOAD_INTERVAL_S", "0"))  # 0 = reload ผ่าน /admin/reload เท่านั้น
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+reload_lock = asyncio.Lock()
+last_reload = None
+
+def load_and_warm(key, cfg, found):
+    entry = build_model_entry(key, cfg, found)
+    warm_entry(entry)
+    return entry
+
+def install_entry(key, entry):
+    """สลับ entry ด้วยการ assign ครั้งเดียว — request ที่ถือ entry เดิมอยู่ทำต่อจนจบด้วยชุดเดิม"""
+    global model_a
+    if key == MODEL_A_KEY:
+        model_a = entry
+    else:
+        loaded_models[key] = entry
+        pending_models.pop(key, None)
+    prediction_cache.invalidate_model(key)
+
+async def reload_models(keys=None, force=False):
+    """หา UID ล่าสุดของแต่ละโมเดล โหลดตัวที่เปลี่ยน (หรือทุกตัวถ้า force) แล้วสลับเข้าใช้งาน"""
+    global last_reload
+    configs = registry_configs()
+    loop = asyncio.get_running_loop()
+    async with reload_lock:
+        report = {}
+        for key in keys or configs:
+            cfg = configs[key]
+            current = model_entry(key)
+            found = discover_latest(cfg["dir"])
+            if found is None:
+                report[key] = {"status": "not_found"}
+                continue
+            if current is None and key != MODEL_A_KEY and MODEL_LOAD_MODE != "eager":
+                # ยังไม่เคยถูกใช้ → แค่ชี้ไปที่ UID ใหม่ แล้วโหลดตอนมี request แรกตามเดิม
+                pending_models[key] = (cfg, found)
+                report[key] = {"status": "pending", "uid": found["uid"]}
+                continue
+            if current is not None and current["uid"] == found["uid"] and not force:
+                report[key] = {"status": "unchanged", "uid": found["uid"]}
+                continue
+
+            start = time.perf_counter()
+            try:
+                entry = await loop.run_in_executor(None, load_and_warm, key, cfg, found)
+            except Exception as e:
+                print(f"[{datetime.now()}] ❌ reload {key} ({found['uid']}) error: {e}")
+                report[key] = {"status": "failed", "uid": found["uid"], "error": str(e)}
+                continue
+            install_entry(key, entry)
+            report[key] = {
+                "status": "swapped",
+                "from_uid": current["uid"] if current is not None else None,
+                "uid": entry["uid"],
+                "source": entry["source"],
+                "load_ms": {k: round(v, 2) for k, v in entry["load_ms"].items()},
+                "total_ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+
+        if any(r["status"] == "swapped" for r in report.values()):
+            prune_vectorizer_pool([model_a, *loaded_models.values()])
+            await loop.run_in_executor(None, restart_process_pool)
+            print(f"[{datetime.now()}] 🔄 สลับโมเดลใหม่: "
+                  f"{[k for k, r in report.items() if r['status'] == 'swapped']}")
+
+        last_reload = {"at": datetime.utcnow().isoformat(), "models": report}
+        return last_reload
+
+async def poll_model_dirs():
+    while True:
+        await asyncio.sleep(MODEL_RELOAD_INTERVAL_S)
+        try:
+            await reload_models()
+        except Exception as e:
+            print(f"[{datetime.now()}] ❌ poll model dirs error: {e}")
+
+# ======================
+# Lazy loading: โหลดโมเดลเสริมเมื่อมี request แรก (MODEL_LOAD_MODE=lazy) หรือใน task เบื้องหลัง (background)
+# ======================
+loading_tasks = {}  # key → asyncio.Task ที่กำลังโหลด (request ที่ขอโมเดลเดียวกันรอ task เดียวกัน)
+load_errors = {}    # key → ข้อความ error ของการโหลดครั้งล่าสุด
+warmup_task = None
+
+async def _load_pending(key):
+    loop = asyncio.get_running_loop()
+    async with reload_lock:  # ไม่ให้ชนกับ /admin/reload
+        if key not in pending_models:
+            return
+        cfg, found = pending_models[key]
+        try:
+            entry = await loop.run_in_executor(None, load_and_warm, key, cfg, found)
+        except Exception as e:
+            load_errors[key] = str(e)
+            print(f"[{datetime.now()}] ❌ lazy load {key} ({found['uid']}) error: {e}")
+            raise
+        load_errors.pop(key, None)
+        install_entry(key, entry)
+        log_load_timing(key, entry)
+        # worker ที่ fork ไว้แล้วไม่มีโมเดลนี้ → fork ชุดใหม่
+        await loop.run_in_executor(None, restart_process_pool)
+
+async def load_pending(key):
+    task = loading_tasks.get(key)
+    if task is None:
+        task = loading_tasks[key] = asyncio.get_running_loop().create_task(_load_pending(key))
+        task.add_done_callback(lambda _: loading_tasks.pop(key, None))
+    await asyncio.shield(task)
+
+async def ensure_loaded(keys):
+    """เรียกก่อนใช้ model_entry() ใน endpoint — โหลดโมเดลที่ยังค้างใน pending_models ให้เสร็จก่อน"""
+    for key in dict.fromkeys(keys):
+        if key in pending_models:
+            try:
+                await load_pending(key)
+            except Exception as e:
+                raise HTTPException(status_code=503, detail=f"Model '{key}' failed to load: {e}")
+
+async def warm_pending_models():
+    start = time.perf_counter()
+    for key in list(pending_models):
+        try:
+            await load_pending(key)
+        except Exception:
+            pass  # บันทึกใน load_errors แล้ว — โหลดใหม่ได้เมื่อมี request
+    print(f"⏱️ background warm-up เสร็จใน {(time.perf_counter() - start) * 1000:.0f} ms")
+
+def model_status(key):
+    if model_entry(key) is not None:
+        return "ready"
+    if key in loading_tasks:
+        return "loading"
+    if key in load_errors:
+        return "failed"
+    return "not_loaded"
+
+def warming():
+    return bool(loading_tasks) or (warmup_task is not None and not warmup_task.done())
+
+# ======================
+# Cascade: โมเดลถูกตอบก่อน ถ้ามั่นใจไม่พอค่อยส่งต่อให้โมเดลแพง (หรือ ensemble)
+# ======================
+CASCADE_CHEAP_MODEL      = os.getenv("CASCADE_CHEAP_MODEL", MODEL_A_KEY)
+CASCADE_EXPENSIVE_MODELS = [k for k in os.getenv("CASCADE_EXPENSIVE_MODELS", "lgbm").split(",") if k]
+# ค่า confidence ขั้นต่ำต่อ label ที่โมเดลถูกตอบได้เลย (ได้จาก cascade_sweep.py)
+CASCADE_THRESHOLDS = {
+    "NEGATIVE": 0.8,
+    "NEUTRAL": 0.8,
+    "POSITIVE": 0.8,
+    **{k.upper(): float(v) for k, v in parse_float_map(os.getenv("CASCADE_THRESHOLDS", "")).items()},
+}
+
+def featurize_shared(keys, text):
+    """featurize ข้อความครั้งเดียวต่อ vectorizer สำหรับทุกโมเดลใน keys (รูปแบบเดียวกับ shared ของ predict_item)"""
+    shared = {}
+    for key in keys:
+        mdl = model_entry(key)
+        fp = mdl["vectorizer_fp"]
+        if mdl["fast"] is not None:
+            if ("fast", fp) not in shared:
+                shared[("fast", fp)] = mdl["fast"].featurize(text)
+        elif ("X", fp) not in shared:
+            shared[("X", fp)] = mdl["vectorizer"].transform([text])
+    return shared
+
+ENSEMBLE_WEIGHTS = parse_float_map(os.getenv("ENSEMBLE_WEIGHTS", ""))
+
+def consensus(items, weights=None):
+    """รวมผลหลายโมเดลแบบ weighted vote (น้ำหนัก × confidence) → (label, share, votes)"""
+    votes = {}
+    for key, item in items.items():
+        w = (weights or {}).get(key, 1.0) * item["confidence"]
+        votes[item["label"]] = votes.get(item["label"], 0.0) + w
+    total = sum(votes.values()) or 1.0
+    label = max(votes, key=votes.get)
+    return label, votes[label] / total, {k: round(v, 4) for k, v in votes.items()}
+
+# ======================
+# Traffic policy: แบ่ง /predict ตามน้ำหนัก + shadow mode (รันโมเดล candidate หลังตอบผู้ใช้แล้ว)
+# ======================
+# เช่น TRAFFIC_WEIGHTS="sentiment_lr=90,lgbm=10" — ว่าง = Model A ตอบทั้งหมด (พฤติกรรมเดิม)
+traffic_policy = TrafficPolicy(
+    {
+        k: v for k, v in parse_float_map(os.getenv("TRAFFIC_WEIGHTS", "")).items()
+        if k == MODEL_A_KEY or k in known_model_keys()
+    },
+    default_key=MODEL_A_KEY,
+)
+# เช่น SHADOW_MODELS="lgbm" — ทุก request ของ /predict จะถูกส่งให้โมเดลเหล่านี้ทำนายเงียบๆ หลัง response
+SHADOW_MODELS = [
+    k for k in os.getenv("SHADOW_MODELS", "").split(",")
+    if k == MODEL_A_KEY or k in known_model_keys()
+]
+SHADOW_MAX_INFLIGHT = int(os.getenv("SHADOW_MAX_INFLIGHT", "64"))
+SHADOW_LOG_PATH = DATA_DIR / "shadow_log.jsonl"  # log ไฟล์เดียวแบบเก่า — ถูกย้ายเข้า segment ตอนเริ่ม
+
+# ผลเทียบ shadow เขียนเป็น batch ลง segment ใน SHADOW_LOG_DIR (ค่าว่าง = ไม่เขียนไฟล์ เก็บแค่สถิติใน memory)
+# ตัดไฟล์ใหม่เมื่อครบ SHADOW_SEGMENT_MB / SHADOW_SEGMENT_HOURS และเก็บ segment ที่ปิดแล้วไม่เกิน SHADOW_RETENTION_SEGMENTS
+SHADOW_LOG_DIR = os.getenv("SHADOW_LOG_DIR", str(DATA_DIR / "shadow_log"))
+shadow_segments = (
+    SegmentedLog(
+        Path(SHADOW_LOG_DIR),
+        segment_bytes=float(os.getenv("SHADOW_SEGMENT_MB", "8")) * 1024 * 1024,
+        segment_seconds=float(os.getenv("SHADOW_SEGMENT_HOURS", "24")) * 3600,
+        max_segments=int(os.getenv("SHADOW_RETENTION_SEGMENTS", "7")),
+        max_age_seconds=float(os.getenv("SHADOW_RETENTION_DAYS", "0")) * 86400,
+        compress=os.getenv("SHADOW_LOG_COMPRESS", "0") == "1",
+    )
+    if SHADOW_LOG_DIR else None
+)
+if shadow_segments is not None:
+    try:
+        if shadow_segments.adopt(SHADOW_LOG_PATH):
+            print(f"📦 ย้าย {SHADOW_LOG_PATH.name} เข้า {shadow_segments.dir} เป็น segment แล้ว")
+    except OSError as e:
+        print(f"⚠️ ย้าย {SHADOW_LOG_PATH.name} เข้า segment ไม่ได้: {e}")
+
+# log ของ shadow เป็นข้อมูลวิเคราะห์ ไม่ต้อง fsync — คิวเต็มจะทิ้งบรรทัดและนับใน log_dropped
+shadow_writer = (
+    FeedbackWriter(
+        shadow_segments,
+        max_queue=int(os.getenv("SHADOW_LOG_QUEUE_MAX", "10000")),
+        flush_interval_ms=float(os.getenv("SHADOW_LOG_FLUSH_MS", "1000")),
+        fsync="never",
+    )
+    if shadow_segments is not None else None
+)
+shadow_log = ShadowLog(writer=shadow_writer)
+shadow_inflight = 0
+
+async def run_shadow(primary, primary_item, primary_ms, text):
+    """ทำนายด้วยโมเดล shadow แล้วบันทึกผลเทียบ — ข้ามถ้างานค้างเกิน SHADOW_MAX_INFLIGHT หรือโมเดลเต็ม"""
+    global shadow_inflight
+    shadow_log.observe(primary, primary_ms)
+    for shadow in SHADOW_MODELS:
+        if shadow == primary:
+            continue
+        if shadow_inflight >= SHADOW_MAX_INFLIGHT:
+            shadow_log.drop(shadow)
+            continue
+        shadow_inflight += 1
+        try:
+            [(item, latency, _, _)] = await predict_items_async([shadow], text)
+            shadow_log.record(primary, primary_item, primary_ms, shadow, item, latency)
+        except Exception as e:
+            shadow_log.drop(shadow)
+            if not isinstance(e, ModelSaturated):
+                print(f"[{datetime.now()}] ❌ shadow {shadow} error: {e}")
+        finally:
+            shadow_inflight -= 1
+
 # ======================
 # Routes
 # ======================
@@ -221,181 +1096,544 @@ def home(request: Request):
 def health():
     return {
         "status": "ok",
+        "state": "warming" if warming() else "ready",
         "baseline_a": True,
-        "available_models": list(loaded_models.keys()),  # ไม่มี bert
+        "available_models": known_model_keys(),  # ไม่มี bert
+        "model_load_mode": MODEL_LOAD_MODE,
+        "models": {k: model_status(k) for k in [MODEL_A_KEY, *known_model_keys()]},
+        "fast_path_models": [
+            k for k in [MODEL_A_KEY, *loaded_models] if model_entry(k)["fast"] is not None
+        ],
+        "prediction_cache": prediction_cache.stats(),
+        "inference_processes": INFERENCE_PROCESSES if process_pool is not None else 0,
+        "inference_pools": {name: pool.stats() for name, pool in inference_pools.items()},
+        "admission": admission.stats(),
+        "traffic": {**traffic_policy.stats(), "shadow_models": SHADOW_MODELS},
+        "blas_threads_per_request": INFERENCE_BLAS_THREADS,
+        "lgbm_num_threads": LGBM_NUM_THREADS,
+        "microbatch": {
+            "enabled": MICROBATCH_ENABLED,
+            "models": {k: b.stats() for k, b in microbatchers.items()},
+        },
+        "feedback_writer": feedback_writer.stats(),
+        "feedback_log": feedback_log.stats(),
+        "error_index": error_index.stats(),
+        "feedback_store": feedback_store.stats() if feedback_store is not None else None,
+    }
+
+@app.get("/shadow/stats")
+def shadow_stats():
+    return {
+        "traffic": traffic_policy.stats(),
+        "shadow_models": SHADOW_MODELS,
+        "shadow_inflight": shadow_inflight,
+        **shadow_log.stats(),
+        "log_writer": shadow_writer.stats() if shadow_writer is not None else None,
+        "log": shadow_segments.stats() if shadow_segments is not None else None,
     }
 
 @app.get("/model/info")
 def model_info():
+    mdl_a = model_a
     info = {
         "model_a": {
             "name": "sentiment_lr",
             "version": "TF-IDF + Logistic Regression (Linear, Probabilistic)",
-            "file": MODEL_A_PATH.name,
+            "file": mdl_a["model_path"].name,
+            "uid": mdl_a["uid"],
+            "source": mdl_a["source"],
+            "format": mdl_a["format"],
+            "load_ms": {k: round(v, 2) for k, v in mdl_a["load_ms"].items()},
+            "memory": memory_report(mdl_a),
+            "word_table": mdl_a["word_table"],
         }
     }
     for key, mdl in loaded_models.items():
         info[key] = {
             "name": mdl["name"],
             "version": mdl["version"],
+            "file": mdl["model_path"].name,
+            "uid": mdl["uid"],
+            "source": mdl["source"],
+            "format": mdl["format"],
+            "vectorizer_fp": mdl["vectorizer_fp"],
+            "compiled": mdl["compiled"],
+            "shares_vectorizer_with_a": mdl["vectorizer_fp"] == mdl_a["vectorizer_fp"],
+            "load_ms": {k: round(v, 2) for k, v in mdl["load_ms"].items()},
+            "memory": memory_report(mdl),
+            "word_table": mdl["word_table"],
+            "status": "ready",
         }
+    for key, (cfg, found) in pending_models.items():
+        info[key] = {
+            "name": cfg["name"],
+            "version": cfg["version"],
+            "file": (found["compact"] or found["model"]).name,
+            "uid": found["uid"],
+            "source": found["source"],
+            "status": model_status(key),
+        }
+    info["model_a"]["vectorizer_fp"] = mdl_a["vectorizer_fp"]
+    info["unique_vectorizers"] = len(VECTORIZER_POOL)
+    entries = [mdl_a, *loaded_models.values()]
+    vectorizers = {
+        fp: vectorizer_memory_report(fp)
+        for fp in sorted({mdl["vectorizer_fp"] for mdl in entries}) if fp in VECTORIZER_POOL
+    }
+    reports = [info["model_a"]["memory"], *(info[key]["memory"] for key in loaded_models)]
+    info["memory"] = {
+        "compact": MODEL_COMPACT,
+        "vectorizers": vectorizers,  # fingerprint → bytes (vectorizer ที่แชร์กันนับครั้งเดียว)
+        "resident_bytes": sum(v["resident_bytes"] for v in vectorizers.values()) + sum(r["resident_bytes"] for r in reports),
+        "saved_bytes": sum(v["compaction"]["original_bytes"] - v["compaction"]["compact_bytes"]
+                           for v in vectorizers.values() if v["compaction"])
+        + sum(r["saved_bytes"] for r in reports),
+    }
+    info["last_reload"] = last_reload
     return info
 
-@app.get("/errors", response_class=HTMLResponse)
-def show_errors(request: Request):
-    all_errors = []
-    seen = set()
+@app.post("/admin/reload")
+async def admin_reload(
+    request: Request,
+    models: list[str] | None = Body(None, embed=True),
+    force: bool = Body(False, embed=True),
+):
+    if ADMIN_TOKEN and request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    unknown = [k for k in models or [] if k not in registry_configs()]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown models: {unknown}. Available: {list(registry_configs())}"
+        )
+    return await reload_models(models, force)
 
-    try:
-        errors_path = DATA_DIR / "error_examples.csv"
-        if errors_path.exists():
-            df_static = pd.read_csv(errors_path)
-            for _, row in df_static.iterrows():
-                text = str(row.get("text", "")).strip()
-                true_label = str(row.get("true_label", "?"))
-                pred_label = str(row.get("pred_label", "?"))
-                key = f"{text}|{true_label}|{pred_label}"
-                if key not in seen:
-                    seen.add(key)
-                    all_errors.append({
-                        "text": text,
-                        "true_label": true_label,
-                        "pred_label": pred_label,
-                        "source": "train_misclassified",
-                    })
-    except Exception as e:
-        print(f"Error loading static errors: {e}")
+ERRORS_PER_PAGE = 20
 
+def error_csv_model(path):
+    """error_examples.csv = โมเดล A, error_examples_tree.csv = rf, error_examples_<key>.csv = <key>"""
+    suffix = path.stem[len("error_examples"):].lstrip("_")
+    if not suffix:
+        return MODEL_A_KEY
+    return "rf" if suffix == "tree" else suffix
+
+def refresh_error_csvs():
+    # stat ไฟล์ละครั้ง — โหลดใหม่เฉพาะ CSV ที่เพิ่งถูกสร้าง / เขียนทับ (เช่นหลังเทรนใหม่)
+    for path in sorted(DATA_DIR.glob("error_examples*.csv")):
+        try:
+            error_index.refresh_csv(path, error_csv_model(path))
+        except Exception as e:
+            print(f"Error loading static errors ({path.name}): {e}")
+
+def load_error_index():
+    refresh_error_csvs()
     try:
-        feedback_path = DATA_DIR / "feedback_log.jsonl"
-        if feedback_path.exists():
-            with open(feedback_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-            for line in reversed(lines):
-                if line.strip():
-                    try:
-                        fb = json.loads(line)
-                        if fb.get("feedback") == "incorrect":
-                            text = str(fb.get("text", "")).strip()
-                            model = fb.get("model", "")
-                            key = f"{text}|{model}"
-                            if key not in seen:
-                                seen.add(key)
-                                all_errors.append({
-                                    "text": text,
-                                    "true_label": str(fb.get("true_label", "UNKNOWN")),
-                                    "pred_label": str(fb.get("predicted_label", "?")),
-                                    "source": "user_feedback",
-                                    "model": model,
-                                    "timestamp": fb.get("timestamp", ""),
-                                })
-                    except Exception as ex:
-                        print(f"Invalid feedback line: {ex}")
-                        continue
+        loaded = error_index.load_feedback(feedback_log.iter_records(), feedback_model_key)
+        print(f"📋 error index: {len(error_index)} รายการ (feedback incorrect {loaded})")
     except Exception as e:
         print(f"Error loading feedback: {e}")
 
-    all_errors.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    errors_to_show = all_errors[:20]
+@app.get("/errors", response_class=HTMLResponse)
+def show_errors(request: Request, page: int = 1, model: str | None = None, source: str | None = None):
+    refresh_error_csvs()
+    page = max(1, page)
+    errors_to_show, total = error_index.page(model=model, source=source, page=page, per_page=ERRORS_PER_PAGE)
+    pages = max(1, -(-total // ERRORS_PER_PAGE))
 
     return templates.TemplateResponse(
-        "errors.html", {"request": request, "errors": errors_to_show}
+        "errors.html",
+        {
+            "request": request,
+            "errors": errors_to_show,
+            "page": page,
+            "pages": pages,
+            "total": total,
+            "model": model or "",
+            "source": source or "",
+            "models": error_index.models(),
+            "accuracy": feedback_stats.snapshot(),
+        },
     )
 
+@app.get("/errors/query")
+def query_errors(
+    model: str | None = None,
+    uid: str | None = None,
+    true_label: str | None = None,
+    pred_label: str | None = None,
+    limit: int = 100,
+    offset: int = 0,
+):
+    # misclassification ทั้งหมดที่สคริปต์เทรนบันทึกไว้ (ไม่ใช่แค่ 10 ตัวอย่างใน error_examples_*.csv)
+    rows = require_feedback_store().query_errors(
+        model=model, uid=uid, true_label=true_label, pred_label=pred_label,
+        limit=min(limit, 1000), offset=offset,
+    )
+    return {"count": len(rows), "offset": offset, "errors": rows}
+
 # ======================
 # Predict Endpoints
 # ======================
 
 @app.post("/predict")
-def predict(text: str = Body(..., embed=True)):
-    start = time.time()
-    X = vectorizer_a.transform([text])
-    pred_raw = classifier_a.predict(X)[0]
-    pred = normalize_label(pred_raw)
-    prob = float(np.max(classifier_a.predict_proba(X)[0]))
-    latency = (time.time() - start) * 1000
-    words, sents = get_important_words(text, vectorizer_a, classifier_a)
+async def predict(background_tasks: BackgroundTasks, text: str = Body(..., embed=True)):
+    key = traffic_policy.choose(text)
+    if MICROBATCH_ENABLED:
+        await ensure_loaded([key])
+        start = time.time()
+        cache_key = prediction_cache.make_key(text, key, model_uid(key))
+        item = prediction_cache.get(cache_key)
+        cached = item is not None
+        queue_wait = 0.0
+        if not cached:
+            # ผ่าน admission เหมือน path ปกติ → limit ต่อโมเดลและ 429/503 + Retry-After ยังมีผล
+            async with admission.admit([key]) as waits:
+                item = await get_microbatcher(key).submit(text)
+            queue_wait = waits[key]
+            prediction_cache.put(cache_key, item)
+        latency = (time.time() - start) * 1000
+    else:
+        [(item, latency, cached, queue_wait)] = await predict_items_async([key], text)
 
+    if SHADOW_MODELS:
+        # รันหลังส่ง response แล้ว → ผู้ใช้ไม่ต้องรอโมเดล shadow
+        background_tasks.add_task(run_shadow, key, item, latency, text)
+
+    _, _, name, version, _ = get_model_entry(key)
     return {
-        "label": pred,
-        "confidence": round(prob, 2),
+        "label": item["label"],
+        "confidence": item["confidence"],
         "latency_ms": round(latency, 2),
-        "model": "sentiment_lr",
-        "version": "TF-IDF + Logistic Regression (Linear, Probabilistic)",
-        "important_words": words,
-        "word_sentiments": sents,
+        "model": name,
+        "version": version,
+        "important_words": item["important_words"],
+        "word_sentiments": item["word_sentiments"],
+        "cached": cached,
+        "queue_wait_ms": round(queue_wait, 2),
     }
 
 @app.post("/predict-ab")
-def predict_ab(
+async def predict_ab(
     text: str = Body(..., embed=True),
-    model_b_type: str = Body("linear", embed=True)
+    model_b_type: str = Body("linear", embed=True),
+    fallback_to_a: bool = Body(ADMISSION_DEGRADE_TO_A, embed=True),
 ):
-    # ===== Model A =====
-    start_a = time.time()
-    Xa = vectorizer_a.transform([text])
-    pred_a_raw = classifier_a.predict(Xa)[0]
-    pred_a = normalize_label(pred_a_raw)
-    prob_a = float(np.max(classifier_a.predict_proba(Xa)[0]))
-    latency_a = (time.time() - start_a) * 1000
-    words_a, sents_a = get_important_words(text, vectorizer_a, classifier_a)
+    if model_b_type not in known_model_keys():
+        available = known_model_keys()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model B type '{model_b_type}' not available. Available: {available}"
+        )
+
+    # A และ B ทำนายใน call เดียว → แถว TF-IDF แชร์กันได้เมื่อใช้ vectorizer เดียวกัน
+    degraded = None
+    try:
+        (item_a, latency_a, cached_a, wait_a), (item_b, latency_b, cached_b, wait_b) = (
+            await predict_items_async([MODEL_A_KEY, model_b_type], text)
+        )
+    except ModelSaturated as exc:
+        if not fallback_to_a or exc.model_key == MODEL_A_KEY:
+            raise
+        # Model B เต็ม → ตอบด้วย Model A อย่างเดียว
+        degraded = {"model_b_type": model_b_type, "reason": exc.reason, "retry_after_s": exc.retry_after}
+        [(item_a, latency_a, cached_a, wait_a)] = await predict_items_async([MODEL_A_KEY], text)
 
     result = {
         "model_a": {
-            "label": pred_a,
-            "confidence": round(prob_a, 2),
+            "label": item_a["label"],
+            "confidence": item_a["confidence"],
             "latency_ms": round(latency_a, 2),
+            "queue_wait_ms": round(wait_a, 2),
             "model_name": "sentiment_lr",
             "version": "TF-IDF + Logistic Regression",
-            "important_words": words_a,
-            "word_sentiments": sents_a,
+            "important_words": item_a["important_words"],
+            "word_sentiments": item_a["word_sentiments"],
+            "cached": cached_a,
         },
-        "model_b": None
+        "model_b": None,
     }
 
-    # ===== Model B =====
-    if model_b_type in loaded_models:
-        mdl = loaded_models[model_b_type]
-        start_b = time.time()
-        Xb = mdl["vectorizer"].transform([text])
-        pred_b_raw = mdl["classifier"].predict(Xb)[0]
-        pred_b = normalize_label(pred_b_raw)
-
-        # Confidence logic
-        if hasattr(mdl["classifier"], "predict_proba"):
-            prob_b = float(np.max(mdl["classifier"].predict_proba(Xb)[0]))
-        elif hasattr(mdl["classifier"], "decision_function"):
-            score = mdl["classifier"].decision_function(Xb)
-            prob_b = float(1 / (1 + np.exp(-abs(score.ravel()[0]))))
-        else:
-            prob_b = 0.95  # fallback
+    if degraded is not None:
+        result["degraded"] = degraded
+        return result
 
-        latency_b = (time.time() - start_b) * 1000
-        words_b, sents_b = get_important_words(text, mdl["vectorizer"], mdl["classifier"])
+    mdl = loaded_models[model_b_type]
+    result["model_b"] = {
+        "label": item_b["label"],
+        "confidence": item_b["confidence"],
+        "latency_ms": round(latency_b, 2),
+        "queue_wait_ms": round(wait_b, 2),
+        "model_name": mdl["name"],
+        "version": mdl["version"],
+        "important_words": item_b["important_words"],
+        "word_sentiments": item_b["word_sentiments"],
+        "cached": cached_b,
+    }
 
-        result["model_b"] = {
-            "label": pred_b,
-            "confidence": round(prob_b, 2),
-            "latency_ms": round(latency_b, 2),
-            "model_name": mdl["name"],
-            "version": mdl["version"],
-            "important_words": words_b,
-            "word_sentiments": sents_b,
+    return result
+
+def score_batch(texts, model_keys, include_words=True):
+    result = {"count": len(texts), "models": {}}
+    features = {}  # vectorizer_fp → sparse matrix (transform ครั้งเดียวต่อ vectorizer)
+    for key in dict.fromkeys(model_keys):
+        mdl = model_entry(key)
+        vec, name, version, fp = mdl["vectorizer"], mdl["name"], mdl["version"], mdl["vectorizer_fp"]
+        start = time.time()
+        if fp not in features:
+            features[fp] = vec.transform(texts)
+        if mdl["lgbm"] is not None:
+            predictions = predict_lgbm_rows(mdl, features[fp], with_words=include_words)
+        else:
+            predictions = predict_batch_entry(mdl, texts, with_words=include_words, X=features[fp])
+        latency = (time.time() - start) * 1000
+        result["models"][key] = {
+            "model_name": name,
+            "version": version,
+            "latency_ms": round(latency, 2),
+            "predictions": predictions,
         }
+    return result
 
-    else:
-        available = list(loaded_models.keys())
+@app.post("/predict/batch")
+async def predict_batch(
+    texts: list[str] = Body(..., embed=True),
+    models: list[str] | None = Body(None, embed=True),
+    include_words: bool = Body(True, embed=True),
+):
+    if not texts:
+        raise HTTPException(status_code=400, detail="texts must not be empty")
+    if len(texts) > MAX_BATCH_TEXTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many texts: {len(texts)} (max {MAX_BATCH_TEXTS})"
+        )
+
+    model_keys = models or [MODEL_A_KEY]
+    available = [MODEL_A_KEY] + known_model_keys()
+    unknown = [k for k in model_keys if k not in available]
+    if unknown:
         raise HTTPException(
             status_code=400,
-            detail=f"Model B type '{model_b_type}' not available. Available: {available}"
+            detail=f"Unknown models: {unknown}. Available: {available}"
         )
+    await ensure_loaded(model_keys)
+
+    async with admission.admit(model_keys):
+        return await run_inference(family_of(model_keys), score_batch, texts, model_keys, include_words)
 
+@app.post("/predict/cascade")
+async def predict_cascade(text: str = Body(..., embed=True)):
+    start = time.time()
+    stages = []
+
+    # ===== Stage 1: โมเดลถูก =====
+    [(item, latency, cached, wait)] = await predict_items_async([CASCADE_CHEAP_MODEL], text)
+    stages.append({
+        "model": CASCADE_CHEAP_MODEL,
+        "label": item["label"],
+        "confidence": item["confidence"],
+        "latency_ms": round(latency, 2),
+        "queue_wait_ms": round(wait, 2),
+        "cached": cached,
+    })
+    threshold = CASCADE_THRESHOLDS.get(item["label"], 1.0)
+    result = {
+        "label": item["label"],
+        "confidence": item["confidence"],
+        "stage": "cheap",
+        "answered_by": [CASCADE_CHEAP_MODEL],
+        "threshold": threshold,
+        "important_words": item["important_words"],
+        "word_sentiments": item["word_sentiments"],
+    }
+
+    # ===== Stage 2: มั่นใจไม่พอ → โมเดลแพง / ensemble =====
+    expensive = [k for k in CASCADE_EXPENSIVE_MODELS if k in known_model_keys()]
+    if item["confidence"] < threshold and expensive:
+        try:
+            outputs = await predict_items_async(expensive, text)
+        except ModelSaturated as exc:
+            result["degraded"] = {"model": exc.model_key, "reason": exc.reason, "retry_after_s": exc.retry_after}
+        else:
+            items = {}
+            for key, (item_e, latency_e, cached_e, wait_e) in zip(expensive, outputs):
+                items[key] = item_e
+                stages.append({
+                    "model": key,
+                    "label": item_e["label"],
+                    "confidence": item_e["confidence"],
+                    "latency_ms": round(latency_e, 2),
+                    "queue_wait_ms": round(wait_e, 2),
+                    "cached": cached_e,
+                })
+            if len(items) == 1:
+                label, confidence = item_e["label"], item_e["confidence"]
+                words, sents = item_e["important_words"], item_e["word_sentiments"]
+            else:
+                label, confidence, _ = consensus(items)
+                best = max((i for i in items.values() if i["label"] == label), key=lambda i: i["confidence"])
+                words, sents = best["important_words"], best["word_sentiments"]
+            result.update({
+                "label": label,
+                "confidence": round(confidence, 2),
+                "stage": "expensive",
+                "answered_by": expensive,
+                "important_words": words,
+                "word_sentiments": sents,
+            })
+
+    result["stages"] = stages
+    result["latency_ms"] = round((time.time() - start) * 1000, 2)
     return result
 
+@app.post("/predict/all")
+async def predict_all(text: str = Body(..., embed=True)):
+    start = time.time()
+    models, skipped, items = {}, {}, {}
+    keys = [MODEL_A_KEY] + known_model_keys()
+    loads = await asyncio.gather(*[ensure_loaded([key]) for key in keys], return_exceptions=True)
+    for key, err in zip(keys, loads):
+        if err is not None:
+            skipped[key] = {"reason": "load_failed", "error": load_errors.get(key, str(err))}
+    keys = [key for key in keys if key not in skipped]
+    shared = featurize_shared(keys, text)
+
+    # ทุกโมเดลรันพร้อมกัน (linear / tree อยู่คนละ pool) → latency รวม ≈ โมเดลที่ช้าที่สุด
+    outputs = await asyncio.gather(
+        *[predict_items_async([key], text, shared) for key in keys],
+        return_exceptions=True,
+    )
+
+    for key, out in zip(keys, outputs):
+        if isinstance(out, ModelSaturated):
+            skipped[key] = {"reason": out.reason, "retry_after_s": out.retry_after}
+            continue
+        if isinstance(out, BaseException):
+            raise out
+        [(item, latency, cached, wait)] = out
+        _, _, name, version, _ = get_model_entry(key)
+        items[key] = item
+        models[key] = {
+            "label": item["label"],
+            "confidence": item["confidence"],
+            "latency_ms": round(latency, 2),
+            "queue_wait_ms": round(wait, 2),
+            "model_name": name,
+            "version": version,
+            "important_words": item["important_words"],
+            "word_sentiments": item["word_sentiments"],
+            "cached": cached,
+        }
+
+    label, share, votes = consensus(items, ENSEMBLE_WEIGHTS)
+    counts = {}
+    for item in items.values():
+        counts[item["label"]] = counts.get(item["label"], 0) + 1
+
+    return {
+        "consensus": {
+            "label": label,
+            "confidence": round(share, 2),
+            "weighted_votes": votes,
+            "majority_label": max(counts, key=counts.get),
+            "label_counts": counts,
+        },
+        "models": models,
+        "skipped": skipped,
+        "latency_ms": round((time.time() - start) * 1000, 2),
+    }
+
 # ======================
 # Feedback Logging
 # ======================
-FEEDBACK_LOG_PATH = DATA_DIR / "feedback_log.jsonl"
+FEEDBACK_LOG_PATH = DATA_DIR / "feedback_log.jsonl"  # log ไฟล์เดียวแบบเก่า — ถูกย้ายเข้า segment ตอนเริ่ม
+
+# feedback แบ่งเป็น segment: ตัดไฟล์ใหม่เมื่อครบ FEEDBACK_SEGMENT_MB หรือ FEEDBACK_SEGMENT_HOURS
+# เก็บ segment ที่ปิดแล้วไม่เกิน FEEDBACK_RETENTION_SEGMENTS (และไม่เก่ากว่า FEEDBACK_RETENTION_DAYS ถ้ากำหนด)
+feedback_log = SegmentedLog(
+    Path(os.getenv("FEEDBACK_LOG_DIR", str(DATA_DIR / "feedback"))),
+    segment_bytes=float(os.getenv("FEEDBACK_SEGMENT_MB", "8")) * 1024 * 1024,
+    segment_seconds=float(os.getenv("FEEDBACK_SEGMENT_HOURS", "24")) * 3600,
+    max_segments=int(os.getenv("FEEDBACK_RETENTION_SEGMENTS", "30")),
+    max_age_seconds=float(os.getenv("FEEDBACK_RETENTION_DAYS", "0")) * 86400,
+    compress=os.getenv("FEEDBACK_COMPRESS", "0") == "1",
+)
+try:
+    if feedback_log.adopt(FEEDBACK_LOG_PATH):
+        print(f"📦 ย้าย {FEEDBACK_LOG_PATH.name} เข้า {feedback_log.dir} เป็น segment แล้ว")
+except OSError as e:
+    print(f"⚠️ ย้าย {FEEDBACK_LOG_PATH.name} เข้า segment ไม่ได้: {e}")
+
+# SQLite (WAL) สำหรับค้น feedback / misclassification ตาม model, label, ประเภท, เวลา — FEEDBACK_DB_PATH ว่าง = ปิด
+FEEDBACK_DB_PATH = os.getenv("FEEDBACK_DB_PATH", str(DATA_DIR / "feedback.db"))
+feedback_store = (
+    FeedbackStore(
+        FEEDBACK_DB_PATH,
+        busy_timeout_ms=int(os.getenv("FEEDBACK_DB_BUSY_TIMEOUT_MS", "5000")),
+        synchronous=os.getenv("FEEDBACK_DB_SYNCHRONOUS", "NORMAL").upper(),
+    )
+    if FEEDBACK_DB_PATH else None
+)
+
+# error ที่หน้า /errors แสดง: โหลดครั้งเดียวตอนเริ่มแล้วอัปเดตทีละรายการ (เก็บไม่เกิน ERROR_INDEX_MAX รายการล่าสุด)
+# ข้อความที่เกือบซ้ำ (ต่างแค่ emoji / ช่องว่าง / สระลากยาว) นับเป็นรายการเดียว — NEAR_DUP_THRESHOLD=0 = เทียบตรงตัวเท่านั้น
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+NEAR_DUP_NUM_PERM = int(os.getenv("NEAR_DUP_NUM_PERM", "64"))
+ERROR_INDEX_MAX = int(os.getenv("ERROR_INDEX_MAX", "5000"))
+
+def near_duplicate_index(max_items):
+    if NEAR_DUP_THRESHOLD <= 0:
+        return None
+    return NearDuplicateIndex(threshold=NEAR_DUP_THRESHOLD, num_perm=NEAR_DUP_NUM_PERM, max_items=max_items)
+
+error_index = ErrorIndex(max_entries=ERROR_INDEX_MAX, near_duplicates=near_duplicate_index(ERROR_INDEX_MAX))
+
+# ความแม่นยำตาม feedback ต่อโมเดล: นับใหม่จาก feedback ที่บันทึกไว้ครั้งเดียวตอนเริ่ม แล้วนับต่อทีละรายการ
+# window = FEEDBACK_STATS_WINDOW รายการล่าสุดของแต่ละโมเดล
+feedback_stats = FeedbackStats(window=int(os.getenv("FEEDBACK_STATS_WINDOW", "200")))
+
+def feedback_model_key(fb):
+    """หน้าเว็บส่ง model เป็น model_a / model_b และ model_name เป็น "<ชื่อ> • <version>" → key ในทะเบียนโมเดล"""
+    name = str(fb.get("model_name") or "").split(" • ")[0].strip()
+    configs = registry_configs()
+    for key in (name, fb.get("model")):
+        if key in configs:
+            return key
+    for key, config in configs.items():
+        if name and config["name"] == name:
+            return key
+    return name or str(fb.get("model") or "unknown")
+
+def normalize_feedback_store():
+    # แถวที่บันทึกก่อนแปลง model เป็น key ในทะเบียน → แปลงครั้งเดียว ให้ /feedback/query?model=<key> เจอด้วย
+    if feedback_store is None:
+        return
+    try:
+        n = feedback_store.normalize_models(feedback_model_key)
+        if n:
+            print(f"🗄️ feedback store: แปลง model เป็น key ในทะเบียน {n} แถว")
+    except Exception as e:
+        print(f"Error normalizing feedback store: {e}")
+
+def load_feedback_stats():
+    # SQLite มีประวัติทั้งหมด ส่วน segmented log มีเท่าที่ retention เก็บไว้
+    records = feedback_store.iter_feedback() if feedback_store is not None else feedback_log.iter_records(newest_first=False)
+    try:
+        n = feedback_stats.rebuild(records, feedback_model_key)
+        print(f"📊 feedback stats: นับจาก {n} รายการ")
+    except Exception as e:
+        print(f"Error loading feedback stats: {e}")
+
+# feedback เข้าคิวในหน่วยความจำ แล้วเขียนลงไฟล์เป็น batch ทุก FEEDBACK_FLUSH_MS (หรือครบ FEEDBACK_BATCH_MAX)
+# FEEDBACK_FSYNC: batch = fsync ทุก batch / interval = อย่างมากทุก FEEDBACK_FSYNC_INTERVAL_S / never
+feedback_writer = FeedbackWriter(
+    FanOut(feedback_log, feedback_store) if feedback_store is not None else feedback_log,
+    max_queue=int(os.getenv("FEEDBACK_QUEUE_MAX", "10000")),
+    flush_interval_ms=float(os.getenv("FEEDBACK_FLUSH_MS", "200")),
+    max_batch=int(os.getenv("FEEDBACK_BATCH_MAX", "512")),
+    fsync=os.getenv("FEEDBACK_FSYNC", "interval"),
+    fsync_interval_s=float(os.getenv("FEEDBACK_FSYNC_INTERVAL_S", "1")),
+)
 
 @app.post("/feedback")
 async def log_feedback(request: Request):
@@ -407,33 +1645,138 @@ async def log_feedback(request: Request):
 
         if "timestamp" not in data:
             data["timestamp"] = datetime.utcnow().isoformat()
+        # บันทึกเป็น key ในทะเบียนโมเดล (ค้น / กรองตามโมเดลได้ตรงกันทุกที่) เก็บช่องบนหน้าเว็บไว้ใน model_slot
+        data["model_slot"] = data["model"]
+        data["model"] = model_key = feedback_model_key(data)
 
-        with open(FEEDBACK_LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+        feedback_writer.submit(json.dumps(data, ensure_ascii=False))
+        error_index.add_feedback(data, model_key)
+        feedback_stats.record(model_key, data)
 
         return {"status": "success", "message": "Feedback recorded"}
+    except FeedbackQueueFull as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
     except Exception as e:
         print(f"Feedback error: {e}")
         return JSONResponse({"error": "Failed to log feedback"}, status_code=500)
 
+@app.get("/feedback/stats")
+def feedback_accuracy():
+    return {"window": feedback_stats.window, "models": feedback_stats.snapshot()}
+
+FEEDBACK_EXPORT_DEDUP_MAX = int(os.getenv("FEEDBACK_EXPORT_DEDUP_MAX", "20000"))
+TRAINING_LABELS = {"pos": "Positive", "neg": "Negative", "neu": "Neutral"}
+
+def training_label(fb):
+    """label สำหรับเทรนใหม่: incorrect → label ที่ผู้ใช้เลือก, correct → label ที่โมเดลทำนาย (ในรูปเดียวกับชุดเทรน)"""
+    value = fb.get("true_label") if fb.get("feedback") == "incorrect" else fb.get("predicted_label")
+    value = str(value or "").lower()
+    for prefix, label in TRAINING_LABELS.items():
+        if prefix in value:
+            return label
+    return None
+
+@app.get("/feedback/export")
+def export_feedback(model: str | None = None):
+    # CSV (text, sentiment) แบบเดียวกับชุดเทรน ใหม่ → เก่า — ข้อความที่เกือบซ้ำกับที่ส่งออกไปแล้ว (โมเดลและ label เดียวกัน) ถูกข้าม
+    # หน่วยความจำของตัวกันซ้ำจำกัดที่ FEEDBACK_EXPORT_DEDUP_MAX รายการล่าสุด
+    def rows():
+        dedup = near_duplicate_index(FEEDBACK_EXPORT_DEDUP_MAX)
+        seen = set() if dedup is None else None
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["text", "sentiment", "model", "timestamp"])
+        for i, fb in enumerate(feedback_log.iter_records()):
+            key = feedback_model_key(fb)
+            label = training_label(fb)
+            text = str(fb.get("text", "")).strip()
+            if label is None or not text or (model and key != model):
+                continue
+            scope = f"{key}|{label}"
+            if dedup is not None:
+                if dedup.add(i, scope, text) is not None:
+                    dedup.remove(i)
+                    continue
+            elif (scope, text) in seen:
+                continue
+            else:
+                seen.add((scope, text))
+            writer.writerow([text, label, key, fb.get("timestamp", "")])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="feedback_export.csv"'},
+    )
+
+def require_feedback_store():
+    if feedback_store is None:
+        raise HTTPException(status_code=404, detail="Feedback store is disabled (FEEDBACK_DB_PATH is empty)")
+    return feedback_store
+
+@app.get("/feedback/query")
+def query_feedback(
+    model: str | None = None,
+    feedback: str | None = None,
+    true_label: str | None = None,
+    predicted_label: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    limit: int = 100,
+    offset: int = 0,
+):
+    # เช่น /feedback/query?model=lgbm&feedback=incorrect&since=2026-02-09 (ใช้ index ไม่สแกนไฟล์) — model = key ในทะเบียนโมเดล
+    rows = require_feedback_store().query_feedback(
+        model=model, feedback=feedback, true_label=true_label, predicted_label=predicted_label,
+        since=since, until=until, limit=min(limit, 1000), offset=offset,
+    )
+    return {"count": len(rows), "offset": offset, "feedback": rows}
+
 # ======================
 # Background Task
 # ======================
-async def rotate_feedback_periodically(max_lines=100):
+async def maintain_feedback_log_periodically(interval_s=60):
+    # ตัด segment ตามเวลา / ลบ segment หมดอายุ แม้ช่วงที่ไม่มี feedback เข้ามา (ต้นทุนคงที่ ไม่อ่านไฟล์)
     while True:
-        await asyncio.sleep(600)
+        await asyncio.sleep(interval_s)
         try:
-            if FEEDBACK_LOG_PATH.exists():
-                with open(FEEDBACK_LOG_PATH, "r", encoding="utf-8") as f:
-                    lines = f.readlines()
-                if len(lines) > max_lines:
-                    recent_lines = lines[-max_lines:]
-                    with open(FEEDBACK_LOG_PATH, "w", encoding="utf-8") as f:
-                        f.writelines(recent_lines)
-                    print(f"[{datetime.now()}] 🔄 ลดขนาด feedback เหลือ {max_lines} รายการ")
+            await asyncio.get_running_loop().run_in_executor(None, feedback_log.maintain)
         except Exception as e:
-            print(f"[{datetime.now()}] ❌ rotate feedback error: {e}")
+            print(f"[{datetime.now()}] ❌ maintain feedback log error: {e}")
+        if shadow_segments is not None:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, shadow_segments.maintain)
+            except Exception as e:
+                print(f"[{datetime.now()}] ❌ maintain shadow log error: {e}")
 
 @app.on_event("startup")
 async def start_background_tasks():
-    asyncio.create_task(rotate_feedback_periodically())
\ No newline at end of file
+    global warmup_task
+    start_process_pool()
+    if MODEL_LOAD_MODE == "background" and pending_models:
+        warmup_task = asyncio.create_task(warm_pending_models())
+    feedback_writer.start()
+    if shadow_writer is not None:
+        shadow_writer.start()
+    await asyncio.get_running_loop().run_in_executor(None, load_error_index)
+    await asyncio.get_running_loop().run_in_executor(None, normalize_feedback_store)
+    await asyncio.get_running_loop().run_in_executor(None, load_feedback_stats)
+    # uvicorn เริ่มรับ request หลัง startup handler จบ → จับเวลาหลังโหลด error index / feedback stats
+    print(f"⏱️ พร้อมรับ request ใน {(time.perf_counter() - STARTUP_STARTED) * 1000:.0f} ms")
+    asyncio.create_task(maintain_feedback_log_periodically())
+    if MODEL_RELOAD_INTERVAL_S > 0:
+        asyncio.create_task(poll_model_dirs())
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await feedback_writer.stop()  # เขียน feedback ที่ค้างในคิวให้ครบก่อนปิด
+    if shadow_writer is not None:
+        await shadow_writer.stop()
+    for batcher in microbatchers.values():
+        await batcher.stop()
+    stop_process_pool()
+    for pool in inference_pools.values():
+        pool.shutdown()
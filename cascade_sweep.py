@@ -0,0 +1,129 @@
+# cascade_sweep.py
+# Sweep confidence threshold ของ cascade (โมเดลถูก → โมเดลแพง) บน test split เดียวกับสคริปต์เทรน
+# แล้วพิมพ์ trade-off ระหว่าง accuracy กับ latency เฉลี่ย
+#
+#   python cascade_sweep.py --cheap models_regress --expensive models_lgbm
+import argparse
+import re
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from compact_artifact import CompactArtifact
+from model_registry import discover_latest
+
+
+# === 1. Preprocessing (เหมือนสคริปต์เทรน) ===
+def preprocess(text):
+    text = str(text).strip()
+    text = re.sub(r"\s+", " ", text)
+    return text
+
+
+def latest_artifacts(models_dir):
+    """คืน (vectorizer, model, uid) ของ UID เดียวกับที่ app.py โหลด (manifest หรือ UID ล่าสุด)"""
+    found = discover_latest(models_dir)
+    if found is None:
+        raise FileNotFoundError(f"❌ ไม่พบโมเดลใน {models_dir}")
+    if found["model"] is None:
+        art = CompactArtifact(found["compact"])
+        return art.build_vectorizer(), art.build_classifier(), found["uid"]
+    return joblib.load(found["vectorizer"]), joblib.load(found["model"]), found["uid"]
+
+
+def confidences(vectorizer, model, texts):
+    """คืน (pred labels, confidence) ทั้งชุด — confidence ใช้ logic เดียวกับ app.py"""
+    X = vectorizer.transform(texts)
+    if hasattr(model, "predict_proba"):
+        probs = model.predict_proba(X)
+        idx = probs.argmax(axis=1)
+        return model.classes_[idx], probs[np.arange(len(idx)), idx]
+    score = model.decision_function(X)
+    first = score if score.ndim == 1 else score[:, 0]
+    return model.predict(X), 1 / (1 + np.exp(-np.abs(first)))
+
+
+def single_text_latency_ms(vectorizer, model, texts, n=200):
+    """latency เฉลี่ยต่อข้อความเมื่อเรียกทีละข้อความ (แบบ /predict)"""
+    sample = list(texts[:n])
+    start = time.perf_counter()
+    for text in sample:
+        X = vectorizer.transform([text])
+        model.predict(X)
+        if hasattr(model, "predict_proba"):
+            model.predict_proba(X)
+    return (time.perf_counter() - start) * 1000 / len(sample)
+
+
+parser = argparse.ArgumentParser(description="Sweep cascade confidence thresholds")
+parser.add_argument("--cheap", default="models_regress", help="โฟลเดอร์โมเดลถูก")
+parser.add_argument("--expensive", default="models_lgbm", help="โฟลเดอร์โมเดลแพง")
+parser.add_argument("--data", default="data/1.synthetic_wisesight_like_thai_sentiment_5000.csv")
+parser.add_argument("--target-accuracy", type=float, default=None,
+                    help="accuracy ต่อ class ที่ต้องการสำหรับ threshold แนะนำ (default = accuracy ของโมเดลแพง)")
+args = parser.parse_args()
+
+# === 2. Load data + split เดียวกับสคริปต์เทรน ===
+df = pd.read_csv(args.data)
+df = df.rename(columns={"sentiment": "label"})
+df["text"] = df["text"].apply(preprocess)
+
+X_train, X_test, y_train, y_test = train_test_split(
+    df["text"], df["label"], test_size=0.2, random_state=42, stratify=df["label"]
+)
+y_true = y_test.values
+
+# === 3. Score ทั้งสองโมเดล ===
+cheap_vec, cheap_model, cheap_uid = latest_artifacts(args.cheap)
+exp_vec, exp_model, exp_uid = latest_artifacts(args.expensive)
+
+cheap_pred, cheap_conf = confidences(cheap_vec, cheap_model, X_test)
+exp_pred, _ = confidences(exp_vec, exp_model, X_test)
+
+cheap_ms = single_text_latency_ms(cheap_vec, cheap_model, X_test)
+exp_ms = single_text_latency_ms(exp_vec, exp_model, X_test)
+
+cheap_acc = float(np.mean(cheap_pred == y_true))
+exp_acc = float(np.mean(exp_pred == y_true))
+
+print(f"Cheap:     {args.cheap} ({cheap_uid})  acc={cheap_acc:.4f}  {cheap_ms:.2f} ms/text")
+print(f"Expensive: {args.expensive} ({exp_uid})  acc={exp_acc:.4f}  {exp_ms:.2f} ms/text")
+
+# === 4. Uniform threshold sweep ===
+print("\n=== THRESHOLD SWEEP (ทุก class ใช้ threshold เดียวกัน) ===")
+print(f"{'threshold':>9}  {'escalated':>9}  {'accuracy':>8}  {'mean_ms':>8}")
+for t in np.round(np.arange(0.40, 1.0001, 0.05), 2):
+    escalate = cheap_conf < t
+    final = np.where(escalate, exp_pred, cheap_pred)
+    acc = float(np.mean(final == y_true))
+    mean_ms = cheap_ms + escalate.mean() * exp_ms
+    print(f"{t:>9.2f}  {escalate.mean():>9.1%}  {acc:>8.4f}  {mean_ms:>8.2f}")
+
+# === 5. Per-class threshold แนะนำ ===
+# threshold ต่ำสุดต่อ label ที่โมเดลถูกตอบเองแล้วยังได้ accuracy ≥ target
+target = args.target_accuracy if args.target_accuracy is not None else exp_acc
+grid = np.round(np.arange(0.40, 1.0001, 0.01), 2)
+suggested = {}
+for label in np.unique(cheap_pred):
+    mask = cheap_pred == label
+    chosen = 1.0
+    for t in grid:
+        accept = mask & (cheap_conf >= t)
+        if accept.sum() == 0:
+            break
+        if np.mean(cheap_pred[accept] == y_true[accept]) >= target:
+            chosen = float(t)
+            break
+    suggested[str(label).upper()] = chosen
+
+escalate = np.array([cheap_conf[i] < suggested[str(p).upper()] for i, p in enumerate(cheap_pred)])
+final = np.where(escalate, exp_pred, cheap_pred)
+print(f"\n=== PER-CLASS THRESHOLDS (target accuracy {target:.4f}) ===")
+for label, t in suggested.items():
+    print(f"{label:>10}: {t:.2f}")
+print(f"escalated={escalate.mean():.1%}  accuracy={np.mean(final == y_true):.4f}  "
+      f"mean_ms={cheap_ms + escalate.mean() * exp_ms:.2f}")
+print("\nCASCADE_THRESHOLDS=\"" + ",".join(f"{k}={v:.2f}" for k, v in suggested.items()) + "\"")
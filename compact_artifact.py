@@ -0,0 +1,354 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_NAME = "thai-sentiment-compact"
+FORMAT_VERSION = 2  # 2: เก็บ hyperparameter ของ classifier (model.params)
+MANIFEST_NAME = "artifact.json"
+VERIFY_ROWS = 256       # จำนวนแถวสุ่มที่ใช้เทียบผลทำนายกับ estimator ต้นทางตอน export
+VERIFY_ATOL = 1e-9
+
+
+class ArtifactError(ValueError):
+    """artifact เสีย / checksum ไม่ตรง / version ไม่รองรับ → ให้ผู้เรียก fallback ไปใช้ joblib"""
+
+
+def compact_dir(models_dir, uid):
+    return Path(models_dir) / f"compact_{uid}"
+
+
+# ======================
+# Vectorizer: params + vocabulary เรียงตามตัวอักษร (blob เดียว) + idf
+# ======================
+VECTORIZER_PARAMS = (
+    "analyzer", "binary", "decode_error", "dtype", "encoding", "input", "lowercase",
+    "max_df", "max_features", "min_df", "ngram_range", "norm", "smooth_idf",
+    "strip_accents", "sublinear_tf", "token_pattern", "use_idf",
+)
+
+
+def vectorizer_params(vec):
+    """params ของ TfidfVectorizer ในรูป JSON ได้ — vectorizer ที่ใช้ callable (tokenizer ฯลฯ) export ไม่ได้"""
+    params = vec.get_params()
+    for name in ("preprocessor", "tokenizer", "stop_words", "vocabulary"):
+        if params.get(name) is not None:
+            raise ArtifactError(f"vectorizer ใช้ {name} แบบกำหนดเอง — export เป็น compact artifact ไม่ได้")
+    if not isinstance(params["analyzer"], str):
+        raise ArtifactError("vectorizer ใช้ analyzer แบบ callable — export เป็น compact artifact ไม่ได้")
+    out = {name: params[name] for name in VECTORIZER_PARAMS}
+    out["dtype"] = np.dtype(out["dtype"]).name
+    out["ngram_range"] = list(out["ngram_range"])
+    return out
+
+
+def vocabulary_arrays(vocabulary):
+    """dict คำ → column เป็น (blob uint8 ของคำเรียงตามตัวอักษรคั่นด้วย \\n, column int32 ของแต่ละคำ)"""
+    terms = sorted(vocabulary)
+    if any("\n" in t for t in terms):
+        raise ArtifactError("vocabulary มีคำที่มี newline — export เป็น compact artifact ไม่ได้")
+    blob = np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8)
+    index = np.fromiter((vocabulary[t] for t in terms), dtype=np.int32, count=len(terms))
+    return blob, index
+
+
+def fingerprint(params, blob, index, idf):
+    """fingerprint ของ vectorizer จากรูปแบบ canonical เดียวกัน ไม่ว่าโหลดมาจาก joblib หรือ compact"""
+    h = hashlib.sha1()
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    h.update(np.ascontiguousarray(blob, dtype=np.uint8).tobytes())
+    h.update(np.ascontiguousarray(index, dtype=np.int32).tobytes())
+    h.update(np.ascontiguousarray(idf, dtype=np.float64).tobytes())
+    return h.hexdigest()[:16]
+
+
+def vectorizer_fingerprint(vec):
+    blob, index = vocabulary_arrays(vec.vocabulary_)
+    return fingerprint(vectorizer_params(vec), blob, index, vec.idf_)
+
+
+def build_vectorizer(params, blob, index, idf):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    params = dict(params, dtype=np.dtype(params["dtype"]).type, ngram_range=tuple(params["ngram_range"]))
+    vec = TfidfVectorizer(**params)
+    terms = bytes(blob).decode("utf-8").split("\n") if len(blob) else []
+    vec.vocabulary_ = dict(zip(terms, np.asarray(index).tolist()))
+    vec.idf_ = np.asarray(idf, dtype=np.float64)
+    return vec
+
+
+# ======================
+# Classifier: array ของแต่ละชนิดโมเดล (ไม่มี pickle) + hyperparameter ของ sklearn
+# ======================
+def classifier_params(model):
+    """get_params() ส่วนที่เป็นค่า scalar (solver, C, penalty, fit_intercept, ...) — เก็บใน artifact.json
+
+    ค่าที่ไม่ใช่ scalar (class_weight แบบ dict, class_prior) ใช้เฉพาะตอน fit จึงไม่เก็บ
+    """
+    if not hasattr(model, "get_params"):
+        return {}
+    return {
+        name: value for name, value in model.get_params(deep=False).items()
+        if isinstance(value, (str, bool, int, float, type(None)))
+    }
+
+
+def restore_params(model, params):
+    valid = model.get_params(deep=False)
+    unknown = sorted(set(params) - set(valid))
+    if unknown:
+        # artifact มาจาก sklearn คนละรุ่น → สร้าง estimator ให้เหมือนเดิมไม่ได้ ให้ fallback ไป joblib
+        raise ArtifactError(f"{type(model).__name__} ไม่รู้จัก params {unknown} (sklearn คนละรุ่น?)")
+    model.set_params(**params)
+    return model
+
+
+def classifier_arrays(model):
+    """คืน (kind, arrays, extra) ของ classifier ที่ export ได้"""
+    from forest_engine import CompiledForest, is_compilable_forest
+
+    name = type(model).__name__
+    if name in ("LogisticRegression", "LinearSVC"):
+        kind = "logistic_regression" if name == "LogisticRegression" else "linear_svc"
+        return kind, {"coef": model.coef_, "intercept": model.intercept_}, {}
+    if name == "MultinomialNB":
+        arrays = {
+            "feature_log_prob": model.feature_log_prob_,
+            "class_log_prior": model.class_log_prior_,
+        }
+        return "multinomial_nb", arrays, {}
+    if is_compilable_forest(model) or isinstance(model, CompiledForest):
+        forest = model if isinstance(model, CompiledForest) else CompiledForest.compile(model)
+        arrays = {
+            "left": forest.left,
+            "right": forest.right,
+            "feature": forest.feature,
+            "threshold": forest.threshold,
+            "leaf_proba": forest.leaf_proba,
+            "roots": forest.roots,
+            "feature_importances": forest.feature_importances_,
+        }
+        return "forest", arrays, {"n_features": int(forest.n_features_in_)}
+    if name == "LGBMClassifier":
+        # model text ของ LightGBM (ไม่ใช่ pickle) — โหลดกลับด้วย Booster(model_str=...)
+        text = model.booster_.model_to_string()
+        return "lgbm", {"booster": np.frombuffer(text.encode("utf-8"), dtype=np.uint8)}, {}
+    raise ArtifactError(f"ยังไม่รองรับ classifier ชนิด {name}")
+
+
+def build_classifier(kind, classes, arrays, extra):
+    classes = np.asarray(classes)
+    params = extra.get("params", {})
+    if kind in ("logistic_regression", "linear_svc"):
+        if kind == "logistic_regression":
+            from sklearn.linear_model import LogisticRegression
+            model = restore_params(LogisticRegression(), params)
+        else:
+            from sklearn.svm import LinearSVC
+            model = restore_params(LinearSVC(), params)
+        model.coef_ = arrays["coef"]
+        model.intercept_ = arrays["intercept"]
+    elif kind == "multinomial_nb":
+        from sklearn.naive_bayes import MultinomialNB
+        model = restore_params(MultinomialNB(), params)
+        model.feature_log_prob_ = arrays["feature_log_prob"]
+        model.class_log_prior_ = arrays["class_log_prior"]
+    elif kind == "forest":
+        from forest_engine import CompiledForest
+        return CompiledForest(
+            arrays["left"], arrays["right"], arrays["feature"], arrays["threshold"],
+            arrays["leaf_proba"], arrays["roots"], classes,
+            arrays["feature_importances"], extra["n_features"],
+        )
+    elif kind == "lgbm":
+        from lgbm_engine import BoosterClassifier
+        return BoosterClassifier.from_string(bytes(arrays["booster"]).decode("utf-8"), classes)
+    else:
+        raise ArtifactError(f"ไม่รู้จัก classifier kind: {kind}")
+    model.classes_ = classes
+    model.n_features_in_ = arrays[next(iter(arrays))].shape[-1]
+    return model
+
+
+# ======================
+# ตรวจ artifact ที่เขียนแล้วกับ estimator ต้นทาง
+# ======================
+def classifier_scores(model, X):
+    scores = model.predict_proba(X) if hasattr(model, "predict_proba") else model.decision_function(X)
+    return model.predict(X), np.asarray(scores, dtype=np.float64)
+
+
+def probe_rows(n_features, n_rows=VERIFY_ROWS, seed=0):
+    """แถวสุ่มแบบ TF-IDF (sparse, ค่าบวก, L2 = 1) — ไม่ต้องพึ่งข้อมูลจริงตอน export"""
+    from scipy import sparse
+    from sklearn.preprocessing import normalize
+
+    rng = np.random.RandomState(seed)
+    density = min(1.0, 20 / max(n_features, 1))
+    X = sparse.random(n_rows, n_features, density=density, format="csr", random_state=rng, dtype=np.float64)
+    return normalize(X)
+
+
+def verify_export(path, vectorizer, model, atol=VERIFY_ATOL):
+    """เปิด artifact ที่เพิ่งเขียนแล้วเทียบกับของเดิม — vectorizer ต้องเหมือนทุกค่า, predict ต้องตรง,
+    predict_proba (หรือ decision_function) ต่างไม่เกิน atol ไม่เช่นนั้น raise ArtifactError
+    """
+    art = CompactArtifact(path)
+    built = art.build_vectorizer()
+    if (
+        vectorizer_params(built) != vectorizer_params(vectorizer)
+        or built.vocabulary_ != vectorizer.vocabulary_
+        or not np.array_equal(built.idf_, vectorizer.idf_)
+    ):
+        raise ArtifactError(f"vectorizer ใน {path} ไม่ตรงกับต้นทาง")
+
+    X = probe_rows(len(vectorizer.vocabulary_))
+    expected_labels, expected = classifier_scores(model, X)
+    labels, scores = classifier_scores(art.build_classifier(), X)
+    diff = float(np.abs(scores - expected).max()) if expected.size else 0.0
+    if not np.array_equal(labels, expected_labels) or diff > atol:
+        raise ArtifactError(f"classifier ใน {path} ทำนายไม่ตรงกับต้นทาง (max diff {diff:.2e})")
+    return diff
+
+
+# ======================
+# อ่าน / เขียน
+# ======================
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def export_artifact(models_dir, uid, vectorizer, model):
+    """เขียน compact_{uid}/ (artifact.json + ไฟล์ .npy ต่อ array) ข้างไฟล์ joblib เดิม
+
+    เขียนลงโฟลเดอร์ชั่วคราวก่อน ตรวจผลทำนายกับ model ต้นทาง (verify_export) แล้วค่อย rename
+    → app ไม่เห็น artifact ที่เขียนไม่ครบหรือทำนายไม่ตรงกับ joblib
+    """
+    blob, index = vocabulary_arrays(vectorizer.vocabulary_)
+    kind, model_arrays, extra = classifier_arrays(model)
+    arrays = {
+        "vocab_blob": blob,
+        "vocab_index": index,
+        "idf": np.asarray(vectorizer.idf_, dtype=np.float64),
+        **{f"model.{name}": np.ascontiguousarray(a) for name, a in model_arrays.items()},
+    }
+
+    target = compact_dir(models_dir, uid)
+    tmp = target.with_name(target.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    entries = {}
+    for name, array in arrays.items():
+        filename = f"{name}.npy"
+        np.save(tmp / filename, array, allow_pickle=False)
+        entries[name] = {
+            "file": filename,
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "sha256": _sha256(tmp / filename),
+        }
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "uid": uid,
+        "vectorizer": {"params": vectorizer_params(vectorizer)},
+        "model": {
+            "kind": kind,
+            "class": type(model).__name__,
+            "classes": np.asarray(model.classes_).tolist(),
+            "params": classifier_params(model),
+            **extra,
+        },
+        "arrays": entries,
+    }
+    with open(tmp / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    try:
+        verify_export(tmp, vectorizer, model)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return target
+
+
+class CompactArtifact:
+    """artifact ที่เปิดแล้ว — array ถูกตรวจ checksum และ (ถ้าเลือก) map จากไฟล์แบบ read-only"""
+
+    def __init__(self, path, mmap=False, verify=True):
+        self.path = Path(path)
+        try:
+            with open(self.path / MANIFEST_NAME, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ArtifactError(f"อ่าน {self.path / MANIFEST_NAME} ไม่ได้: {e}")
+        if self.manifest.get("format") != FORMAT_NAME:
+            raise ArtifactError(f"ไม่ใช่ compact artifact: {self.path}")
+        if self.manifest.get("version") != FORMAT_VERSION:
+            raise ArtifactError(
+                f"compact artifact version {self.manifest.get('version')} ไม่รองรับ (รองรับ {FORMAT_VERSION})"
+            )
+
+        self.arrays = {}
+        for name, meta in self.manifest["arrays"].items():
+            file_path = self.path / meta["file"]
+            if verify and _sha256(file_path) != meta["sha256"]:
+                raise ArtifactError(f"checksum ไม่ตรง: {file_path}")
+            array = np.load(file_path, mmap_mode="r" if mmap else None, allow_pickle=False)
+            if array.dtype.str != meta["dtype"] or list(array.shape) != meta["shape"]:
+                raise ArtifactError(f"dtype/shape ไม่ตรงกับ manifest: {file_path}")
+            self.arrays[name] = array
+
+    @property
+    def uid(self):
+        return self.manifest["uid"]
+
+    def vectorizer_fingerprint(self):
+        a = self.arrays
+        return fingerprint(self.manifest["vectorizer"]["params"], a["vocab_blob"], a["vocab_index"], a["idf"])
+
+    def build_vectorizer(self):
+        a = self.arrays
+        return build_vectorizer(self.manifest["vectorizer"]["params"], a["vocab_blob"], a["vocab_index"], a["idf"])
+
+    def build_classifier(self):
+        model = self.manifest["model"]
+        prefix = "model."
+        arrays = {k[len(prefix):]: v for k, v in self.arrays.items() if k.startswith(prefix)}
+        extra = {k: v for k, v in model.items() if k not in ("kind", "class", "classes")}
+        return build_classifier(model["kind"], model["classes"], arrays, extra)
+
+
+if __name__ == "__main__":
+    # แปลง artifact joblib ที่มีอยู่แล้ว (UID ล่าสุดของแต่ละโฟลเดอร์) เป็น compact artifact
+    #   python compact_artifact.py models_regress models_linear models_nb models_lgbm
+    import argparse
+
+    import joblib
+
+    from model_registry import discover_latest
+
+    parser = argparse.ArgumentParser(description="Export joblib artifacts to compact format")
+    parser.add_argument("models_dirs", nargs="+", help="โฟลเดอร์โมเดล เช่น models_regress")
+    args = parser.parse_args()
+
+    for models_dir in args.models_dirs:
+        found = discover_latest(models_dir)
+        if found is None or found["model"] is None:
+            print(f"⚠️ ไม่พบไฟล์ joblib ใน {models_dir}")
+            continue
+        path = export_artifact(models_dir, found["uid"], joblib.load(found["vectorizer"]), joblib.load(found["model"]))
+        print(f"✅ {path}")
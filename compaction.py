@@ -0,0 +1,143 @@
+import mmap
+import sys
+
+import numpy as np
+
+
+# ======================
+# float32 / int32 แทน float64 / int64
+# ======================
+def is_mapped(array):
+    """array ที่ map จากไฟล์ (MODEL_MMAP) ใช้ page ของ OS ร่วมกันอยู่แล้ว — copy เป็น float32 จะกลายเป็น private memory"""
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def _array_root(array):
+    """array ที่เป็นเจ้าของหน่วยความจำจริง (view หลายตัวของ array เดียวนับครั้งเดียว)"""
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def resident_nbytes(*objs, exclude=()):
+    """bytes ที่ objs ถือโดยประมาณ → (private, mapped)
+
+    เดินตาม attribute / dict / list แล้วรวม array ของ numpy (view ของ array เดียวกันนับครั้งเดียว) กับขนาด
+    container / string ของ Python — tree ของ sklearn (Cython) นับจาก node array ใน __getstate__
+    ไม่รวมหน่วยความจำฝั่ง C ของ LightGBM booster / object ใน exclude และทุกอย่างที่ exclude อ้างถึง (เช่น vectorizer ที่แชร์กัน)
+    array ที่ map จากไฟล์ (MODEL_MMAP) แยกเป็น mapped เพราะใช้ page ร่วมกันระหว่าง process
+    """
+    seen = {}  # id → object (ถือ reference ไว้ กัน id ของ array ชั่วคราวจาก __getstate__ ถูกใช้ซ้ำระหว่างเดิน)
+    totals = [0, 0]
+
+    def walk(obj, count):
+        stack = [obj]
+        while stack:
+            obj = stack.pop()
+            if obj is None or isinstance(obj, (bool, type)) or callable(obj) and not hasattr(obj, "__dict__"):
+                continue
+            if isinstance(obj, np.ndarray):
+                obj = _array_root(obj)
+            if id(obj) in seen:
+                continue
+            seen[id(obj)] = obj
+            if isinstance(obj, np.ndarray):
+                if count:
+                    totals[is_mapped(obj)] += obj.nbytes
+                if obj.dtype == object:
+                    stack.extend(obj.ravel().tolist())
+                continue
+            if count and not isinstance(obj, (mmap.mmap, np.generic)):
+                totals[0] += sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                stack.extend(obj.keys())
+                stack.extend(obj.values())
+            elif isinstance(obj, (list, tuple, set, frozenset)):
+                stack.extend(obj)
+            elif type(obj).__name__ == "Tree" and hasattr(obj, "__getstate__"):
+                stack.extend(obj.__getstate__().values())
+            elif hasattr(obj, "__dict__") and not isinstance(obj, type(sys)):
+                stack.extend(vars(obj).values())
+
+    for obj in exclude:
+        walk(obj, count=False)
+    for obj in objs:
+        walk(obj, count=True)
+    return totals[0], totals[1]
+
+
+# attribute ที่ใช้ตอนทำนายของแต่ละชนิด classifier → dtype ที่เก็บ
+# threshold ของ forest คงเป็น float64 (ค่ากึ่งกลางระหว่าง float32 สองค่า ปัดเป็น float32 แล้วอาจเปลี่ยนทางแยก)
+CLASSIFIER_ARRAYS = {
+    "LogisticRegression": {"coef_": np.float32, "intercept_": np.float32},
+    "LinearSVC": {"coef_": np.float32, "intercept_": np.float32},
+    "MultinomialNB": {"feature_log_prob_": np.float32, "class_log_prior_": np.float32},
+    "CompiledForest": {
+        "left": np.int32,
+        "right": np.int32,
+        "feature": np.int32,
+        "roots": np.int32,
+        "leaf_proba": np.float32,
+    },
+}
+
+
+def compact_arrays(obj, spec):
+    """แปลง attribute ตาม spec → (ค่าเดิมที่ถูกแทน, bytes ก่อน, bytes หลัง)"""
+    originals, before, after = {}, 0, 0
+    for attr, dtype in spec.items():
+        array = getattr(obj, attr, None)
+        if not isinstance(array, np.ndarray):
+            continue
+        before += array.nbytes
+        if array.dtype == dtype or is_mapped(array):
+            after += array.nbytes
+            continue
+        if np.issubdtype(dtype, np.integer) and array.size and array.max() > np.iinfo(dtype).max:
+            after += array.nbytes
+            continue
+        compact = np.ascontiguousarray(array, dtype=dtype)
+        originals[attr] = array
+        setattr(obj, attr, compact)
+        after += compact.nbytes
+    return originals, before, after
+
+
+def restore(obj, originals):
+    for attr, array in originals.items():
+        setattr(obj, attr, array)
+
+
+def compact_classifier(clf):
+    """→ (ค่าเดิม, bytes ก่อน, bytes หลัง) — classifier ที่ไม่รู้จัก (เช่น LightGBM) ไม่ถูกแตะ"""
+    spec = CLASSIFIER_ARRAYS.get(type(clf).__name__)
+    if spec is None:
+        return {}, 0, 0
+    return compact_arrays(clf, spec)
+
+
+def compact_vectorizer(vec):
+    """เก็บ idf_ เป็น float32 → (ค่าเดิม, bytes ก่อน, bytes หลัง)
+
+    vocabulary_ คงเป็น dict เดิม: vectorizer ที่เหมือนกันใช้ instance เดียวร่วมกันอยู่แล้ว (VECTORIZER_POOL)
+    จึงไม่มีอะไรให้แชร์เพิ่ม และ dict เป็น lookup ที่เร็วที่สุดของ transform
+    """
+    idf = getattr(vec, "idf_", None) if getattr(vec, "use_idf", False) else None
+    if idf is None or idf.dtype == np.float32 or is_mapped(idf):
+        return {}, 0, 0
+    vec.idf_ = np.ascontiguousarray(idf, dtype=np.float32)
+    return {"idf_": idf}, idf.nbytes, vec.idf_.nbytes
+
+
+def max_score_diff(before, after):
+    """(label, score) ก่อน / หลัง compact → max |diff| หรือ inf ถ้า label ต่างกัน"""
+    (labels_a, scores_a), (labels_b, scores_b) = before, after
+    if not np.array_equal(labels_a, labels_b):
+        return float("inf")
+    if np.size(scores_a) == 0:
+        return 0.0
+    return float(np.max(np.abs(np.asarray(scores_a, dtype=np.float64) - scores_b)))
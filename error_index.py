@@ -0,0 +1,157 @@
+import csv
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+TRAIN_SOURCE = "train_misclassified"
+FEEDBACK_SOURCE = "user_feedback"
+
+
+class ErrorIndex:
+    """รายการ error สำหรับหน้า /errors ใหม่ → เก่า ขนาดไม่เกิน max_entries (เก่าสุดถูกทิ้ง)
+
+    โหลดครั้งเดียวตอนเริ่ม แล้วอัปเดตทีละรายการเมื่อมี feedback "incorrect" หรือมีไฟล์ error CSV ใหม่ / เปลี่ยน
+    → เปิดหน้าไม่ต้องอ่าน log หรือ CSV ซ้ำ เวลาต่อหน้าขึ้นกับ max_entries ไม่ใช่ขนาด log
+
+    key ของ OrderedDict คือ key กันซ้ำ (train: โมเดล|label จริง|label ที่ทำนาย|ข้อความ, feedback: โมเดล|ข้อความ)
+    รายการซ้ำ (ตรงกันทุกตัว หรือเกือบซ้ำถ้ามี near_duplicates) ถูกแทนด้วยตัวล่าสุดและย้ายขึ้นหน้าสุด
+    พร้อมนับจำนวนที่ซ้ำไว้ใน "duplicates" — ท้ายสุดของ dict = ใหม่สุด
+    """
+
+    def __init__(self, max_entries=5000, near_duplicates=None):
+        self.max_entries = max(1, int(max_entries))
+        self.near = near_duplicates  # NearDuplicateIndex (ถ้ามี) → ข้อความที่ต่างกันนิดหน่อยนับเป็นรายการเดียวกัน
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._files = {}  # path → mtime_ns ของ CSV ที่โหลดแล้ว
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _put(self, key, scope, entry):
+        """scope = key ที่ไม่รวมข้อความ — เทียบเกือบซ้ำเฉพาะใน scope เดียวกัน (โมเดล / label เดียวกัน)"""
+        old = self._entries.pop(key, None)
+        if self.near is not None:
+            dup = self.near.add(key, scope, entry["text"])
+            if dup is not None and dup != key:
+                old = self._entries.pop(dup, None) or old
+                self.near.remove(dup)
+        if old is not None:
+            entry["duplicates"] = old.get("duplicates", 0) + 1
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            if self.near is not None:
+                self.near.remove(evicted)
+
+    def _drop(self, key):
+        del self._entries[key]
+        if self.near is not None:
+            self.near.remove(key)
+
+    def add(self, key, scope, entry):
+        with self._lock:
+            self._put(key, scope, entry)
+
+    def add_feedback(self, fb, model=None):
+        """record ของ /feedback → เพิ่มเฉพาะ feedback == "incorrect" (คืน True ถ้าเพิ่ม)
+
+        model = key ในทะเบียนโมเดล (ไม่ระบุ = ใช้ fb["model"]) — record เก่าใน log เก็บช่องบนหน้าเว็บ (model_a / model_b)
+        """
+        if fb.get("feedback") != "incorrect":
+            return False
+        text = str(fb.get("text", "")).strip()
+        if model is None:
+            model = fb.get("model", "")
+        scope = f"{FEEDBACK_SOURCE}|{model}"
+        self.add(f"{scope}|{text}", scope, {
+            "text": text,
+            "true_label": str(fb.get("true_label", "UNKNOWN")),
+            "pred_label": str(fb.get("predicted_label", "?")),
+            "source": FEEDBACK_SOURCE,
+            "model": model,
+            "timestamp": fb.get("timestamp", ""),
+        })
+        return True
+
+    def load_feedback(self, records_newest_first, key_fn=None):
+        """ใส่ feedback จาก log ตอนเริ่ม — อ่านจากใหม่ → เก่าแค่พอเต็ม index แล้วหยุด (ไม่อ่าน log ทั้งหมด)
+
+        key_fn(fb) → key ในทะเบียนโมเดล (เหมือนที่ใช้กับ add_feedback ตอน /feedback)
+        """
+        recent = []
+        for fb in records_newest_first:
+            if fb.get("feedback") == "incorrect":
+                recent.append(fb)
+                if len(recent) >= self.max_entries:
+                    break
+        for fb in reversed(recent):
+            self.add_feedback(fb, key_fn(fb) if key_fn is not None else None)
+        return len(recent)
+
+    def refresh_csv(self, path, model):
+        """โหลด CSV (text, true_label, pred_label) ถ้าเป็นไฟล์ใหม่หรือแก้ไขตั้งแต่ครั้งก่อน — ไม่เปลี่ยน → stat ครั้งเดียว"""
+        path = Path(path)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+        if self._files.get(path) == mtime:
+            return 0
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        timestamp = datetime.fromtimestamp(mtime / 1e9).isoformat(timespec="seconds")
+        with self._lock:
+            if path in self._files:  # ไฟล์ถูกเขียนใหม่ → เอาแถวชุดเดิมของไฟล์นี้ออกก่อน
+                for key in [k for k, e in self._entries.items() if e.get("file") == path.name]:
+                    self._drop(key)
+            self._files[path] = mtime
+            for row in rows:
+                text = str(row.get("text", "")).strip()
+                true_label = str(row.get("true_label", "?"))
+                pred_label = str(row.get("pred_label", "?"))
+                scope = f"{TRAIN_SOURCE}|{model}|{true_label}|{pred_label}"
+                self._put(f"{scope}|{text}", scope, {
+                    "text": text,
+                    "true_label": true_label,
+                    "pred_label": pred_label,
+                    "source": TRAIN_SOURCE,
+                    "model": model,
+                    "timestamp": timestamp,
+                    "file": path.name,
+                })
+        return len(rows)
+
+    def page(self, model=None, source=None, page=1, per_page=20):
+        """→ (รายการของหน้านี้, จำนวนที่ตรง filter ทั้งหมด) ใหม่ → เก่า"""
+        start = (max(1, int(page)) - 1) * per_page
+        items, total = [], 0
+        with self._lock:
+            for entry in reversed(self._entries.values()):
+                if model and entry.get("model") != model:
+                    continue
+                if source and entry["source"] != source:
+                    continue
+                if start <= total < start + per_page:
+                    items.append(entry)
+                total += 1
+        return items, total
+
+    def models(self):
+        with self._lock:
+            return sorted({e["model"] for e in self._entries.values() if e.get("model")})
+
+    def stats(self):
+        with self._lock:
+            by_source = {}
+            for entry in self._entries.values():
+                by_source[entry["source"]] = by_source.get(entry["source"], 0) + 1
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "by_source": by_source,
+                "csv_files": len(self._files),
+                "near_duplicates": self.near.stats() if self.near is not None else None,
+            }
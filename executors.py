@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class InferencePool:
+    """ThreadPoolExecutor ขนาดจำกัดสำหรับงานทำนายของโมเดลกลุ่มหนึ่ง (linear / tree)
+
+    แยกจาก threadpool ปกติของ Starlette เพื่อไม่ให้ request ที่ช้าแย่ง thread ของ /health, /feedback
+    และนับจำนวนงานที่รอคิว / กำลังรัน เพื่อรายงานใน /health
+    """
+
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=f"infer-{name}"
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _wrap(self, fn, args):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            result = fn(*args)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+        return result
+
+    async def run(self, fn, *args):
+        with self._lock:
+            self.queued += 1
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._wrap, fn, args)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "threads": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
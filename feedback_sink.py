@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+
+_STOP = object()  # ใส่ท้ายคิวตอน stop → writer เขียนทุกอย่างก่อนหน้าแล้วจบ
+
+
+class FeedbackQueueFull(Exception):
+    """คิว feedback เต็ม (writer ตามไม่ทัน) → ให้ client ส่งใหม่ภายหลัง"""
+
+
+class FanOut:
+    """ส่ง batch เดียวกันไปหลายปลายทาง (เช่น segmented log + SQLite) — ปลายทางหนึ่งพังไม่ทำให้ปลายทางอื่นไม่ได้เขียน"""
+
+    def __init__(self, *targets):
+        self.targets = targets
+
+    def _each(self, method, *args):
+        errors = []
+        for target in self.targets:
+            try:
+                getattr(target, method)(*args)
+            except Exception as e:
+                errors.append(f"{type(target).__name__}: {e}")
+        if errors:
+            raise OSError("; ".join(errors))
+
+    def write_lines(self, lines):
+        self._each("write_lines", lines)
+
+    def sync(self):
+        self._each("sync")
+
+    def close(self):
+        self._each("close")
+
+
+class FeedbackWriter:
+    """รับ feedback เข้าคิวในหน่วยความจำ (จำกัดขนาด) แล้วให้ task เบื้องหลังเขียนเป็น batch (group commit)
+
+    target: ปลายทางที่มี write_lines(lines), sync(), close() — งาน I/O รันใน executor ไม่บล็อก event loop
+    fsync: "batch" = fsync ทุก batch / "interval" = fsync อย่างมากทุก fsync_interval_s / "never" = ปล่อยให้ OS
+    """
+
+    FSYNC_POLICIES = ("batch", "interval", "never")
+
+    def __init__(self, target, max_queue=10000, flush_interval_ms=200, max_batch=512,
+                 fsync="interval", fsync_interval_s=1.0):
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f"fsync policy ต้องเป็นหนึ่งใน {self.FSYNC_POLICIES}")
+        self.target = target
+        self.max_queue = max(1, int(max_queue))
+        self.flush_interval = max(0.0, float(flush_interval_ms)) / 1000
+        self.max_batch = max(1, int(max_batch))
+        self.fsync = fsync
+        self.fsync_interval = float(fsync_interval_s)
+
+        self._queue = None
+        self._task = None
+        self._closing = False
+        self._last_sync = 0.0
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(self, line):
+        """เข้าคิวทันที (ไม่รอเขียน) — คิวเต็ม → FeedbackQueueFull
+
+        ถ้า writer ยังไม่ start (เช่นรันโดยไม่มี startup event) จะเขียนลงปลายทางตรงๆ
+        """
+        if not self.running:
+            self._write([line])
+            self.accepted += 1
+            return
+        if self._closing:
+            self.rejected += 1
+            raise FeedbackQueueFull("feedback writer is shutting down")
+        try:
+            self._queue.put_nowait(line)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise FeedbackQueueFull(f"feedback queue full ({self.max_queue})")
+        self.accepted += 1
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _write(self, lines):
+        start = time.perf_counter()
+        self.target.write_lines(lines)
+        now = time.monotonic()
+        if self.fsync == "batch" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval):
+            self.target.sync()
+            self._last_sync = now
+        self.written += len(lines)
+        self.batches += 1
+        self.last_batch_size = len(lines)
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    async def _flush(self, lines):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+        except Exception as e:
+            self.failed_batches += 1
+            print(f"❌ เขียน feedback {len(lines)} รายการไม่สำเร็จ: {e}")
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            stop = batch[-1] is _STOP
+            lines = batch[:-1] if stop else batch
+            if lines:
+                await self._flush(lines)
+            if stop:
+                return
+
+    async def stop(self):
+        """เขียนทุกรายการที่ค้างในคิว + fsync แล้วปิดปลายทาง (ไม่ cancel กลาง batch)"""
+        if self.running:
+            self._closing = True
+            await self._queue.put(_STOP)
+            await self._task
+        self._task = None
+        if self.fsync != "never":
+            self.target.sync()
+        self.target.close()
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "fsync": self.fsync,
+        }
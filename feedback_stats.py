@@ -0,0 +1,94 @@
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class ModelFeedback:
+    """ตัวนับของโมเดลเดียว — ทุกการอัปเดตเป็น O(1)"""
+
+    __slots__ = ("correct", "incorrect", "confusion", "window", "window_incorrect", "last_at")
+
+    def __init__(self, window):
+        self.correct = 0
+        self.incorrect = 0
+        self.confusion = {}  # (label ที่ทำนาย, label จริงจากผู้ใช้) → จำนวน
+        self.window = deque(maxlen=window)  # 1 = incorrect, 0 = correct ของ feedback ล่าสุด
+        self.window_incorrect = 0
+        self.last_at = None
+
+    def add(self, incorrect, predicted, true_label, at):
+        if len(self.window) == self.window.maxlen:
+            self.window_incorrect -= self.window[0]  # ตัวที่กำลังหลุดจาก window
+        self.window.append(int(incorrect))
+        self.window_incorrect += int(incorrect)
+        if incorrect:
+            self.incorrect += 1
+            if true_label:
+                pair = (predicted, true_label)
+                self.confusion[pair] = self.confusion.get(pair, 0) + 1
+        else:
+            self.correct += 1
+        self.last_at = at
+
+    def snapshot(self):
+        total = self.correct + self.incorrect
+        size = len(self.window)
+        confusion = {}
+        for (predicted, true_label), n in self.confusion.items():
+            confusion.setdefault(predicted, {})[true_label] = n
+        return {
+            "total": total,
+            "correct": self.correct,
+            "incorrect": self.incorrect,
+            "accuracy": round(self.correct / total, 4) if total else None,
+            "window": {
+                "size": size,
+                "incorrect": self.window_incorrect,
+                "accuracy": round(1 - self.window_incorrect / size, 4) if size else None,
+            },
+            "confusion": confusion,  # {label ที่ทำนาย: {label จริง: จำนวน}} เฉพาะ feedback "incorrect"
+            "last_feedback": self.last_at,
+        }
+
+
+class FeedbackStats:
+    """ความแม่นยำตาม feedback ผู้ใช้ต่อโมเดล (ทั้งหมด + window ของ feedback ล่าสุด) อัปเดตทีละรายการแบบ O(1)
+
+    สร้างใหม่จาก feedback ที่บันทึกไว้ครั้งเดียวตอนเริ่ม (rebuild) แล้วนับต่อจาก /feedback — endpoint แค่อ่านตัวนับ
+    """
+
+    def __init__(self, window=200):
+        self.window = max(1, int(window))
+        self._lock = threading.Lock()
+        self._models = {}
+        self.rebuilt_from = 0
+
+    def record(self, key, fb):
+        """เฉพาะ feedback "correct" / "incorrect" — คืน True ถ้านับ"""
+        kind = fb.get("feedback")
+        if kind not in ("correct", "incorrect"):
+            return False
+        predicted = str(fb.get("predicted_label") or "?")
+        true_label = fb.get("true_label")
+        at = fb.get("timestamp") or datetime.utcnow().isoformat()
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._models[key] = ModelFeedback(self.window)
+            model.add(kind == "incorrect", predicted, str(true_label) if true_label else None, at)
+        return True
+
+    def rebuild(self, records, key_fn):
+        """นับใหม่ทั้งหมดจาก records (เก่า → ใหม่) แล้วสลับเข้าไปทีเดียว"""
+        fresh = FeedbackStats(self.window)
+        n = 0
+        for fb in records:
+            n += fresh.record(key_fn(fb), fb)
+        with self._lock:
+            self._models = fresh._models
+            self.rebuilt_from = n
+        return n
+
+    def snapshot(self):
+        with self._lock:
+            return {key: model.snapshot() for key, model in sorted(self._models.items())}
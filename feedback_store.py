@@ -0,0 +1,287 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    model TEXT,
+    model_slot TEXT,
+    model_name TEXT,
+    text TEXT,
+    predicted_label TEXT,
+    true_label TEXT,
+    feedback TEXT,
+    confidence REAL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_model_ts ON feedback (model, ts);
+CREATE INDEX IF NOT EXISTS idx_feedback_type_ts ON feedback (feedback, ts);
+CREATE INDEX IF NOT EXISTS idx_feedback_true_label ON feedback (true_label);
+CREATE INDEX IF NOT EXISTS idx_feedback_predicted_label ON feedback (predicted_label);
+CREATE INDEX IF NOT EXISTS idx_feedback_ts ON feedback (ts);
+
+CREATE TABLE IF NOT EXISTS errors (
+    id INTEGER PRIMARY KEY,
+    model TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    text TEXT,
+    true_label TEXT,
+    pred_label TEXT,
+    source TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_errors_model_uid ON errors (model, uid);
+CREATE INDEX IF NOT EXISTS idx_errors_true_label ON errors (true_label);
+CREATE INDEX IF NOT EXISTS idx_errors_pred_label ON errors (pred_label);
+CREATE INDEX IF NOT EXISTS idx_errors_created_at ON errors (created_at);
+"""
+
+FEEDBACK_COLUMNS = ("id", "ts", "model", "model_slot", "model_name", "text", "predicted_label", "true_label", "feedback", "confidence")
+ERROR_COLUMNS = ("id", "model", "uid", "text", "true_label", "pred_label", "source", "created_at")
+
+
+def _optional_str(value):
+    return None if value is None else str(value)
+
+
+def _optional_float(value):
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def feedback_row(record):
+    """dict ของ /feedback → แถวของตาราง feedback (เก็บ JSON เต็มไว้ใน payload ด้วย)
+
+    model = key ในทะเบียนโมเดล (app แปลงก่อนส่งมา) ส่วน model_slot = ช่องบนหน้าเว็บ (model_a / model_b)
+    """
+    return (
+        str(record.get("timestamp") or datetime.utcnow().isoformat()),
+        _optional_str(record.get("model")),
+        _optional_str(record.get("model_slot")),
+        _optional_str(record.get("model_name")),
+        _optional_str(record.get("text")),
+        _optional_str(record.get("predicted_label")),
+        _optional_str(record.get("true_label")),
+        _optional_str(record.get("feedback")),
+        _optional_float(record.get("confidence")),
+        json.dumps(record, ensure_ascii=False),
+    )
+
+
+@contextmanager
+def immediate(conn):
+    """BEGIN IMMEDIATE … COMMIT (ROLLBACK ถ้า error) — จอง write lock ตั้งแต่ต้น ไม่ต้องอัปเกรดกลางทาง"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class FeedbackStore:
+    """SQLite (WAL) สำหรับ feedback และ misclassification ของชุดเทรน — ค้นตาม model / label / ประเภท / เวลาผ่าน index
+
+    ใช้เป็นปลายทางของ FeedbackWriter ได้ (write_lines / sync / close): ทั้ง batch เป็น transaction เดียว
+    หลาย worker process (และสคริปต์เทรน) เขียนไฟล์เดียวกันได้: WAL ให้คนอ่านไม่ถูกบล็อก ส่วนคนเขียน
+    เข้าคิวกันด้วย BEGIN IMMEDIATE + busy_timeout แทนที่จะได้ "database is locked" ทันที
+    """
+
+    def __init__(self, path, busy_timeout_ms=5000, synchronous="NORMAL"):
+        self.path = Path(path)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.synchronous = synchronous  # NORMAL: WAL ไม่ fsync ทุก commit (ไม่เสียหายแต่อาจหายรายการท้ายๆ ถ้าไฟดับ) / FULL
+        self._local = threading.local()  # connection ต่อ thread (executor ของ FeedbackWriter / threadpool ของ endpoint)
+        self._lock = threading.Lock()
+        self._connections = []
+        self._schema_ready = False
+
+        self.written = 0
+        self.last_write_ms = 0.0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None → จัดการ transaction เอง (BEGIN IMMEDIATE) / check_same_thread=False เพื่อให้ close() ปิดได้จาก thread ไหนก็ได้
+        conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout_ms / 1000,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        conn.execute("PRAGMA journal_mode = WAL")  # ค่าเก็บในไฟล์ db ถาวร — process อื่นก็เป็น WAL ด้วย
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        if not self._schema_ready:
+            with immediate(conn):
+                for statement in SCHEMA.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+                # db ที่สร้างก่อนมีคอลัมน์ model_slot
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(feedback)")}
+                if "model_slot" not in columns:
+                    conn.execute("ALTER TABLE feedback ADD COLUMN model_slot TEXT")
+            self._schema_ready = True
+        self._local.conn = conn
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    # ======================
+    # ปลายทางของ FeedbackWriter
+    # ======================
+    def write_lines(self, lines):
+        rows = []
+        for line in lines:
+            try:
+                rows.append(feedback_row(json.loads(line)))
+            except ValueError:
+                continue
+        self.add_feedback_rows(rows)
+
+    def sync(self):
+        # commit ของแต่ละ batch ถือว่าเสร็จแล้ว ความทนทานกำหนดด้วย synchronous ของ SQLite
+        pass
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    # ======================
+    # เขียน
+    # ======================
+    def add_feedback_rows(self, rows):
+        if not rows:
+            return 0
+        start = time.perf_counter()
+        conn = self._connect()
+        with immediate(conn):
+            conn.executemany(
+                "INSERT INTO feedback (ts, model, model_slot, model_name, text, predicted_label, true_label, feedback, confidence, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        self.written += len(rows)
+        self.last_write_ms = (time.perf_counter() - start) * 1000
+        return len(rows)
+
+    def add_feedback(self, records):
+        return self.add_feedback_rows([feedback_row(r) for r in records])
+
+    def normalize_models(self, key_fn):
+        """แถวเก่าที่ model เป็นช่องบนหน้าเว็บ (model_slot ยังว่าง) → model = key_fn(record) แล้วย้ายช่องไป model_slot
+
+        ทำทีละคู่ (model, model_name) ที่ไม่ซ้ำ → UPDATE ไม่กี่ครั้งแม้มีแถวเก่าเยอะ คืนจำนวนแถวที่แก้
+        """
+        conn = self._connect()
+        pairs = conn.execute("SELECT DISTINCT model, model_name FROM feedback WHERE model_slot IS NULL").fetchall()
+        if not pairs:
+            return 0
+        updated = 0
+        with immediate(conn):
+            for model, model_name in pairs:
+                key = key_fn({"model": model, "model_name": model_name})
+                updated += conn.execute(
+                    "UPDATE feedback SET model_slot = model, model = ?"
+                    " WHERE model_slot IS NULL AND model IS ? AND model_name IS ?",
+                    (key, model, model_name),
+                ).rowcount
+        return updated
+
+    def replace_errors(self, model, uid, texts, true_labels, pred_labels, source="train_misclassified"):
+        """misclassification ทั้งหมดของโมเดล UID หนึ่ง — รันซ้ำ UID เดิมจะแทนของเดิม (ไม่ซ้ำ)"""
+        created_at = datetime.now().isoformat(timespec="seconds")
+        rows = [
+            (model, uid, str(text), str(true_label), str(pred_label), source, created_at)
+            for text, true_label, pred_label in zip(texts, true_labels, pred_labels)
+        ]
+        conn = self._connect()
+        with immediate(conn):
+            conn.execute("DELETE FROM errors WHERE model = ? AND uid = ?", (model, uid))
+            conn.executemany(
+                "INSERT INTO errors (model, uid, text, true_label, pred_label, source, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    # ======================
+    # ค้น
+    # ======================
+    def _select(self, table, columns, filters, order, limit, offset):
+        where, params = [], []
+        for clause, value in filters:
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ? OFFSET ?"
+        params += [max(0, int(limit)), max(0, int(offset))]
+        rows = self._connect().execute(sql, params).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def query_feedback(self, model=None, feedback=None, true_label=None, predicted_label=None,
+                       since=None, until=None, limit=100, offset=0):
+        """feedback ใหม่ → เก่า — since / until เทียบกับ timestamp แบบ ISO (เช่น 2026-02-09 หรือ 2026-02-09T12:00:00)"""
+        return self._select(
+            "feedback", FEEDBACK_COLUMNS,
+            [
+                ("model = ?", model),
+                ("feedback = ?", feedback),
+                ("true_label = ?", true_label),
+                ("predicted_label = ?", predicted_label),
+                ("ts >= ?", since),
+                ("ts < ?", until),
+            ],
+            "ts DESC, id DESC", limit, offset,
+        )
+
+    def query_errors(self, model=None, uid=None, true_label=None, pred_label=None, limit=100, offset=0):
+        """misclassification ของชุดเทรน — ไม่ระบุ uid = ทุก UID (ใหม่ → เก่า)"""
+        return self._select(
+            "errors", ERROR_COLUMNS,
+            [
+                ("model = ?", model),
+                ("uid = ?", uid),
+                ("true_label = ?", true_label),
+                ("pred_label = ?", pred_label),
+            ],
+            "created_at DESC, id", limit, offset,
+        )
+
+    def iter_feedback(self):
+        """JSON เต็มของ feedback ทั้งหมด เก่า → ใหม่ (ใช้ตอนสร้างตัวนับใหม่ตอนเริ่ม app)"""
+        for (payload,) in self._connect().execute("SELECT payload FROM feedback ORDER BY id"):
+            try:
+                yield json.loads(payload)
+            except ValueError:
+                continue
+
+    def stats(self):
+        return {
+            "path": str(self.path),
+            "written": self.written,
+            "last_write_ms": round(self.last_write_ms, 2),
+            "synchronous": self.synchronous,
+        }
+
+
+def record_errors(db_path, model, uid, texts, true_labels, pred_labels):
+    """ให้สคริปต์เทรนเรียกหลังประเมินผล → เก็บ misclassification ทั้งหมดของ UID นี้ลง SQLite"""
+    store = FeedbackStore(db_path)
+    try:
+        return store.replace_errors(model, uid, list(texts), list(true_labels), list(pred_labels))
+    finally:
+        store.close()
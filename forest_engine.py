@@ -0,0 +1,138 @@
+import threading
+
+import numpy as np
+from scipy import sparse
+
+
+class CompiledForest:
+    """Random Forest / Extra Trees ที่ flatten ทุกต้นเป็น node array ชุดเดียว
+
+    ใช้แทน predict / predict_proba ของ sklearn ได้โดยตรง — เดินทุกต้นพร้อมกันทั้ง batch ด้วย NumPy
+    แทนการให้ sklearn เดินทีละต้นทีละแถว
+
+    NumPy จ่ายต้นทุนต่อชั้นของต้นไม้ ส่วน sklearn จ่ายต้นทุนคงที่ต่อต้น → batch เล็กเร็วกว่ามาก แต่ batch ใหญ่
+    (หลายร้อยแถว) Cython ของ sklearn ชนะ — ถ้าตั้ง fallback_loader ไว้ batch ที่มีอย่างน้อย fallback_rows แถว
+    จะส่งให้ estimator เดิมแทน โดยโหลด estimator ครั้งแรกที่มี batch ใหญ่ถึง (ไม่ถือ forest สองชุดตั้งแต่เริ่ม)
+    """
+
+    CHUNK_ROWS = 256
+
+    def __init__(self, left, right, feature, threshold, leaf_proba, roots, classes, feature_importances, n_features):
+        self.left = left                    # (n_nodes,) int64, global index, -1 = leaf
+        self.right = right
+        self.feature = feature              # (n_nodes,) int64
+        self.threshold = threshold          # (n_nodes,) float64
+        self.leaf_proba = leaf_proba        # (n_nodes, n_classes) float64 (normalize แล้ว)
+        self.roots = roots                  # (n_trees,) int64
+        self.classes_ = classes
+        self.n_classes_ = len(classes)
+        self.n_features_in_ = n_features
+        self.feature_importances_ = feature_importances
+        self.fallback_loader = None         # callable → estimator เดิมของ sklearn (app ตั้งให้เมื่อเปิด fallback)
+        self.fallback_rows = None
+        self.fallback = None                # estimator ที่โหลดแล้ว (None = ยังไม่เคยมี batch ใหญ่ถึง)
+        self._fallback_lock = threading.Lock()
+
+    # ---------- build ----------
+    @classmethod
+    def compile(cls, forest):
+        trees = [est.tree_ for est in forest.estimators_]
+        offsets = np.cumsum([0] + [t.node_count for t in trees])
+
+        def remap(children, offset):
+            children = children.astype(np.int64)
+            return np.where(children >= 0, children + offset, -1)
+
+        left = np.concatenate([remap(t.children_left, o) for t, o in zip(trees, offsets)])
+        right = np.concatenate([remap(t.children_right, o) for t, o in zip(trees, offsets)])
+        feature = np.concatenate([t.feature.astype(np.int64) for t in trees])
+        threshold = np.concatenate([t.threshold for t in trees])
+
+        values = np.concatenate([t.value[:, 0, :] for t in trees]).astype(np.float64)
+        totals = values.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+        leaf_proba = values / totals
+
+        return cls(
+            left,
+            right,
+            feature,
+            threshold,
+            leaf_proba,
+            offsets[:-1].astype(np.int64),
+            forest.classes_,
+            forest.feature_importances_,
+            forest.n_features_in_,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.left)
+
+    # ---------- inference ----------
+    def apply(self, X):
+        """index ของ leaf (global) → (n_samples, n_trees)"""
+        X = sparse.csr_matrix(X, dtype=np.float32)
+        chunks = [
+            self._apply_chunk(X[start:start + self.CHUNK_ROWS])
+            for start in range(0, X.shape[0], self.CHUNK_ROWS)
+        ]
+        if not chunks:
+            return np.empty((0, self.n_trees), dtype=np.int64)
+        return np.vstack(chunks)
+
+    def _apply_chunk(self, X):
+        # แปลงทีละ chunk เป็น dense (256 แถว × 10k feature ≈ 10MB) แล้ว gather ค่าที่ทุก node ต้องใช้
+        # feature ที่ไม่มีในข้อความเป็น 0 อยู่แล้ว — ค้นใน CSR ทีละ (แถว, feature) ด้วย searchsorted ช้ากว่า ~3 เท่า
+        n_samples, n_cols = X.shape
+        flat = X.toarray().ravel()
+
+        nodes = np.tile(self.roots, n_samples)
+        row_base = np.repeat(np.arange(n_samples, dtype=np.int64) * n_cols, self.n_trees)
+        active = np.flatnonzero(self.left[nodes] >= 0)
+
+        while len(active):
+            cur = nodes[active]
+            values = flat[row_base[active] + self.feature[cur]]
+            nxt = np.where(values <= self.threshold[cur], self.left[cur], self.right[cur])
+            nodes[active] = nxt
+            active = active[self.left[nxt] >= 0]
+
+        return nodes.reshape(n_samples, self.n_trees)
+
+    def _compiled_proba(self, X):
+        leaves = self.apply(X)
+        return self.leaf_proba[leaves].mean(axis=1, dtype=np.float64)  # leaf_proba อาจเป็น float32 (compaction)
+
+    def _fallback_estimator(self):
+        if self.fallback is None:
+            with self._fallback_lock:
+                if self.fallback is None:
+                    self.fallback = self.fallback_loader()
+        return self.fallback
+
+    def predict_proba(self, X):
+        if self.fallback_loader is not None and X.shape[0] >= self.fallback_rows:
+            return self._fallback_estimator().predict_proba(X)
+        return self._compiled_proba(X)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    # ---------- verification ----------
+    def verify(self, X, forest, atol=1e-9):
+        """assert ว่า predict_proba / predict ตรงกับ estimator เดิม (ตรวจ traversal ของตัวเองเสมอ ไม่ผ่าน fallback)"""
+        expected = forest.predict_proba(X)
+        got = self._compiled_proba(X)
+        max_diff = float(np.max(np.abs(expected - got))) if expected.size else 0.0
+        assert max_diff <= atol, f"predict_proba mismatch: {max_diff:.2e} > {atol}"
+        assert np.array_equal(self.classes_[np.argmax(got, axis=1)], forest.predict(X)), "predict mismatch"
+        return X.shape[0]
+
+
+def is_compilable_forest(model):
+    return type(model).__name__ in ("RandomForestClassifier", "ExtraTreesClassifier") and hasattr(model, "estimators_")
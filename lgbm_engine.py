@@ -0,0 +1,102 @@
+import numpy as np
+from scipy import sparse
+
+
+class LGBMEngine:
+    """เรียก LightGBM booster ครั้งเดียวด้วย pred_contrib บน CSR
+
+    ได้ทั้ง raw score (ผลรวม contribution + bias), probability และ contribution รายคำของแต่ละข้อความ
+    แทนการเรียก predict → predict_proba → feature_importances_ แยกกันสามรอบ
+    """
+
+    def __init__(self, classifier, num_threads=0):
+        self.booster = classifier.booster_
+        self.num_threads = num_threads  # 0 = ค่า default ของ LightGBM (OpenMP ทุก core)
+        self.classes = classifier.classes_
+        self.n_classes = len(self.classes)
+
+    @classmethod
+    def compile(cls, classifier, num_threads=0):
+        """คืน LGBMEngine หรือ None ถ้าไม่ใช่ LGBMClassifier / BoosterClassifier ที่เทรนแล้ว"""
+        if type(classifier).__name__ not in ("LGBMClassifier", "BoosterClassifier"):
+            return None
+        if not hasattr(classifier, "booster_"):
+            return None
+        return cls(classifier, num_threads=num_threads)
+
+    def _contributions(self, X):
+        """คืน list ของ CSR (n_samples, n_features + 1) ต่อ class — คอลัมน์สุดท้ายคือ bias"""
+        params = {"num_threads": self.num_threads} if self.num_threads else {}
+        contrib = self.booster.predict(X, pred_contrib=True, **params)
+        if isinstance(contrib, list):
+            return [sparse.csr_matrix(c) for c in contrib]
+        contrib = np.asarray(contrib)
+        n_outputs = 1 if self.n_classes == 2 else self.n_classes
+        width = contrib.shape[1] // n_outputs
+        return [sparse.csr_matrix(contrib[:, k * width:(k + 1) * width]) for k in range(n_outputs)]
+
+    def predict(self, X, top_k=5):
+        """คืน (class_idx, probs, top_features) — top_features เป็น list ของ feature index ต่อแถว"""
+        X = sparse.csr_matrix(X)
+        per_class = self._contributions(X)
+        raw = np.column_stack([np.asarray(c.sum(axis=1)).ravel() for c in per_class])
+
+        if raw.shape[1] == 1:
+            p = 1 / (1 + np.exp(-raw[:, 0]))
+            probs = np.column_stack([1 - p, p])
+        else:
+            e = np.exp(raw - raw.max(axis=1, keepdims=True))
+            probs = e / e.sum(axis=1, keepdims=True)
+        class_idx = np.argmax(probs, axis=1)
+
+        top_features = []
+        for i in range(X.shape[0]):
+            present = X.indices[X.indptr[i]:X.indptr[i + 1]]
+            if len(present) == 0:
+                top_features.append(np.empty(0, dtype=np.int64))
+                continue
+            contrib = per_class[0 if len(per_class) == 1 else class_idx[i]]
+            values = contrib[i, present].toarray().ravel()
+            if len(per_class) == 1 and class_idx[i] == 0:
+                values = -values  # binary: contribution เป็นของ class 1
+            keep = values > 0
+            present, values = present[keep], values[keep]
+            if len(values) > top_k:
+                part = np.argpartition(-values, top_k - 1)[:top_k]
+            else:
+                part = np.arange(len(values))
+            top_features.append(present[part[np.argsort(-values[part], kind="stable")]])
+
+        return class_idx, probs, top_features
+
+
+class BoosterClassifier:
+    """ใช้แทน LGBMClassifier เมื่อโหลดจาก model text ของ LightGBM (compact artifact ไม่มี pickle)
+
+    มีเฉพาะส่วนที่ app ใช้: booster_, classes_, predict, predict_proba, feature_importances_
+    """
+
+    def __init__(self, booster, classes):
+        self.booster_ = booster
+        self.classes_ = np.asarray(classes)
+        self.n_classes_ = len(self.classes_)
+        self.n_features_in_ = booster.num_feature()
+
+    @classmethod
+    def from_string(cls, model_str, classes):
+        import lightgbm
+
+        return cls(lightgbm.Booster(model_str=model_str), classes)
+
+    @property
+    def feature_importances_(self):
+        return self.booster_.feature_importance(importance_type="split")
+
+    def predict_proba(self, X):
+        raw = np.asarray(self.booster_.predict(X))
+        if raw.ndim == 1:
+            return np.column_stack([1 - raw, raw])
+        return raw
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
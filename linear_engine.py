@@ -0,0 +1,164 @@
+import numpy as np
+
+
+class LinearEngine:
+    """ทำนายโมเดลเชิงเส้น (LogisticRegression / LinearSVC / MultinomialNB) บน TF-IDF
+    โดยไม่ผ่าน sklearn ทุก request
+
+    ดึง vocabulary, idf, coef, intercept ออกมาเป็น float32 array ต่อเนื่องครั้งเดียวตอนโหลด
+    แล้วคำนวณ token lookup → idf → L2 norm → dot กับ weight เฉพาะ feature ที่เจอ
+    """
+
+    def __init__(self, vectorizer, classifier, kind, weights, intercept, explain_coef):
+        self.analyzer = vectorizer.build_analyzer()
+        self.vocabulary = vectorizer.vocabulary_
+        self.idf = np.ascontiguousarray(vectorizer.idf_, dtype=np.float32)
+        self.classes = classifier.classes_
+        self.kind = kind                    # "proba_softmax" / "proba_binary" / "decision"
+        self.weights = weights              # (n_features, n_outputs) float32
+        self.intercept = intercept          # (n_outputs,) float32
+        self.explain_coef = explain_coef    # (n_rows, n_features) float32 หรือ None
+
+    # ---------- build ----------
+    @classmethod
+    def compile(cls, vectorizer, classifier):
+        """คืน LinearEngine หรือ None ถ้าโมเดล/vectorizer ไม่รองรับ"""
+        if not supports_vectorizer(vectorizer):
+            return None
+
+        name = type(classifier).__name__
+        if name == "MultinomialNB":
+            weights = classifier.feature_log_prob_.T
+            intercept = classifier.class_log_prior_
+            kind = "proba_softmax"
+        elif name == "LogisticRegression":
+            weights = classifier.coef_.T
+            intercept = classifier.intercept_
+            kind = "proba_binary" if classifier.coef_.shape[0] == 1 else "proba_softmax"
+        elif name == "LinearSVC":
+            weights = classifier.coef_.T
+            intercept = classifier.intercept_
+            kind = "decision"
+        else:
+            return None
+
+        explain_coef = None
+        if hasattr(classifier, "coef_"):
+            explain_coef = np.ascontiguousarray(classifier.coef_, dtype=np.float32)
+
+        return cls(
+            vectorizer,
+            classifier,
+            kind,
+            np.ascontiguousarray(weights, dtype=np.float32),
+            np.ascontiguousarray(np.ravel(intercept), dtype=np.float32),
+            explain_coef,
+        )
+
+    # ---------- inference ----------
+    def featurize(self, text):
+        """คืน (indices, weights) ของแถว TF-IDF ที่ normalize แล้ว"""
+        vocab = self.vocabulary
+        counts = {}
+        for tok in self.analyzer(text):
+            j = vocab.get(tok)
+            if j is not None:
+                counts[j] = counts.get(j, 0) + 1
+
+        n = len(counts)
+        idx = np.fromiter(counts.keys(), dtype=np.int64, count=n)
+        w = np.fromiter(counts.values(), dtype=np.float32, count=n) * self.idf[idx]
+        norm = np.sqrt(np.dot(w, w))
+        if norm > 0:
+            w /= norm
+        return idx, w
+
+    def scores(self, idx, w):
+        return w @ self.weights[idx] + self.intercept
+
+    def predict_features(self, idx, w):
+        """คืน (class_idx, confidence, raw_scores) — confidence ใช้ logic เดียวกับ app.py"""
+        s = self.scores(idx, w)
+        if self.kind == "proba_softmax":
+            e = np.exp(s - s.max())
+            probs = e / e.sum()
+            class_idx = int(np.argmax(probs))
+            return class_idx, float(probs[class_idx]), probs
+        if self.kind == "proba_binary":
+            p = 1 / (1 + np.exp(-s[0]))
+            probs = np.array([1 - p, p], dtype=np.float32)
+            class_idx = int(p > 0.5)
+            return class_idx, float(probs[class_idx]), probs
+        # decision_function (LinearSVC)
+        if len(s) == 1:
+            class_idx = int(s[0] > 0)
+        else:
+            class_idx = int(np.argmax(s))
+        return class_idx, float(1 / (1 + np.exp(-abs(s[0])))), s
+
+    def predict(self, text):
+        idx, w = self.featurize(text)
+        class_idx, confidence, _ = self.predict_features(idx, w)
+        return self.classes[class_idx], confidence
+
+    def important_indices(self, idx, w, class_idx, top_k=5):
+        """feature index ที่มี |contribution| สูงสุด (เฉพาะโมเดลที่มี coef_)"""
+        if self.explain_coef is None or len(idx) == 0:
+            return np.empty(0, dtype=np.int64)
+        row = 0 if self.explain_coef.shape[0] == 1 else class_idx
+        contributions = w * self.explain_coef[row, idx]
+        keep = contributions != 0
+        return top_k_features(idx[keep], np.abs(contributions[keep]), top_k)
+
+    # ---------- verification ----------
+    def verify(self, texts, vectorizer, classifier, atol=1e-4):
+        """assert ว่าผลลัพธ์ตรงกับ sklearn (label เท่ากัน, คะแนนต่างไม่เกิน atol)"""
+        X = vectorizer.transform(texts)
+        if self.kind == "decision":
+            expected = classifier.decision_function(X)
+        else:
+            expected = classifier.predict_proba(X)
+        expected = np.atleast_2d(expected)
+        if expected.shape[0] != len(texts):
+            expected = expected.T
+        expected_labels = classifier.predict(X)
+
+        for i, text in enumerate(texts):
+            idx, w = self.featurize(text)
+            class_idx, _, got = self.predict_features(idx, w)
+            got = np.atleast_1d(got)
+            if self.kind == "decision" and len(got) == 1:
+                exp_row = np.atleast_1d(expected[i])
+            else:
+                exp_row = expected[i]
+            max_diff = float(np.max(np.abs(got - exp_row)))
+            assert max_diff <= atol, f"score mismatch ({max_diff:.2e} > {atol}) on: {text!r}"
+            assert self.classes[class_idx] == expected_labels[i], f"label mismatch on: {text!r}"
+        return len(texts)
+
+
+def top_k_features(indices, scores, k):
+    """feature index ที่ score สูงสุด k ตัว เรียงมาก → น้อย — score เท่ากันเรียงตาม feature index
+
+    ใช้ทั้ง fast path (index เรียงตามลำดับคำ) และ sklearn (index เรียงจาก CSR) → ได้ลำดับเดียวกันแม้มีค่าเท่ากัน
+    """
+    if len(scores) > k:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= kth)  # รวมทุกตัวที่เท่ากับค่าที่ k ไม่ให้ argpartition เลือกเอง
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((indices[candidates], -scores[candidates]))[:k]
+    return indices[candidates[order]]
+
+
+def supports_vectorizer(vectorizer):
+    """fast path รองรับเฉพาะ TfidfVectorizer ค่ามาตรฐาน (l2, idf, ไม่ sublinear/binary)"""
+    if type(vectorizer).__name__ != "TfidfVectorizer":
+        return False
+    return (
+        vectorizer.norm == "l2"
+        and vectorizer.use_idf
+        and not vectorizer.sublinear_tf
+        and not vectorizer.binary
+        and hasattr(vectorizer, "idf_")
+    )
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+
+class MicroBatcher:
+    """รวม request ที่เข้ามาใกล้กัน (ภายใน window หรือครบ N รายการ) แล้วทำนายทีเดียว
+
+    run_batch: ฟังก์ชัน sync รับ list ของ input → คืน list ของผลลัพธ์ลำดับเดียวกัน
+    (จะถูกรันใน executor ที่กำหนด หรือ threadpool ปกติ เพื่อไม่บล็อก event loop)
+    """
+
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+    def __init__(self, run_batch, max_batch_size=32, max_wait_ms=3.0, name="", executor=None):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.name = name
+
+        self._queue = None
+        self._task = None
+
+        self.total_batches = 0
+        self.total_items = 0
+        self.max_batch_seen = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+        self.batch_size_histogram = {b: 0 for b in self.BATCH_SIZE_BUCKETS}
+        self.batch_size_histogram["inf"] = 0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item):
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut))
+        return await fut
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            start = time.time()
+            try:
+                results = await loop.run_in_executor(self.executor, self.run_batch, items)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for (_, fut), res in zip(batch, results):
+                    if not fut.done():
+                        fut.set_result(res)
+            self._record(len(batch), (time.time() - start) * 1000)
+
+    def _record(self, size, elapsed_ms):
+        self.total_batches += 1
+        self.total_items += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        self.last_batch_size = size
+        self.last_batch_ms = elapsed_ms
+        for b in self.BATCH_SIZE_BUCKETS:
+            if size <= b:
+                self.batch_size_histogram[b] += 1
+                break
+        else:
+            self.batch_size_histogram["inf"] += 1
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "window_ms": round(self.max_wait * 1000, 3),
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "total_batches": self.total_batches,
+            "total_items": self.total_items,
+            "mean_batch_size": round(self.total_items / self.total_batches, 2) if self.total_batches else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "batch_size_histogram": {f"<={k}" if k != "inf" else f">{self.BATCH_SIZE_BUCKETS[-1]}": v
+                                     for k, v in self.batch_size_histogram.items()},
+        }
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,105 @@
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from compact_artifact import MANIFEST_NAME as COMPACT_MANIFEST_NAME, compact_dir
+from word_table import table_path
+
+MANIFEST_NAME = "manifest.json"
+
+
+def artifact_paths(models_dir, uid):
+    """คืน (vectorizer path, model path) ของ UID ในโฟลเดอร์"""
+    models_dir = Path(models_dir)
+    return (
+        models_dir / f"vectorizer_{uid}.joblib",
+        models_dir / f"sentiment_model_{uid}.joblib",
+    )
+
+
+def write_manifest(models_dir, uid, **metrics):
+    """ให้สคริปต์เทรนเรียกหลังบันทึกโมเดล → app จะเลือก UID นี้ตอนโหลด / reload
+
+    เขียนไฟล์ชั่วคราวแล้ว os.replace เพื่อไม่ให้ app อ่านเจอ manifest ที่เขียนไม่ครบ
+    """
+    vec_path, model_path = artifact_paths(models_dir, uid)
+    compact = compact_dir(models_dir, uid)
+    manifest = {
+        "uid": uid,
+        "vectorizer": vec_path.name,
+        "model": model_path.name,
+        "compact": compact.name if (compact / COMPACT_MANIFEST_NAME).is_file() else None,
+        "word_table": table_path(models_dir, uid).name if table_path(models_dir, uid).is_file() else None,
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+        **{k: round(float(v), 4) for k, v in metrics.items()},
+    }
+    path = Path(models_dir) / MANIFEST_NAME
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_manifest(models_dir):
+    path = Path(models_dir) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ อ่าน manifest ไม่ได้: {path} ({e})")
+        return None
+
+
+def find_artifacts(models_dir, uid, source):
+    """{"uid", "vectorizer", "model", "compact", "word_table", "source"} ของ UID — None ถ้าไม่มีทั้ง joblib คู่ และ compact
+
+    ช่องที่ไม่มีไฟล์จะเป็น None (เช่น deploy เฉพาะ compact artifact โดยไม่มี pickle)
+    """
+    vec_path, model_path = artifact_paths(models_dir, uid)
+    compact = compact_dir(models_dir, uid)
+    has_joblib = vec_path.is_file() and model_path.is_file()
+    has_compact = (compact / COMPACT_MANIFEST_NAME).is_file()
+    if not has_joblib and not has_compact:
+        return None
+    words = table_path(models_dir, uid)
+    return {
+        "uid": uid,
+        "vectorizer": vec_path if has_joblib else None,
+        "model": model_path if has_joblib else None,
+        "compact": compact if has_compact else None,
+        "word_table": words if words.is_file() else None,  # โมเดลที่เทรนก่อนมีตารางนี้ → None
+        "source": source,
+    }
+
+
+def discover_latest(models_dir):
+    """หา artifact ล่าสุดในโฟลเดอร์ → ผลของ find_artifacts หรือ None
+
+    ใช้ manifest.json ถ้ามีและไฟล์ครบ ไม่เช่นนั้นเลือก UID ล่าสุด (UID ขึ้นต้นด้วย timestamp
+    จึงเรียงตามตัวอักษรได้) ที่มี sentiment_model_*.joblib คู่กับ vectorizer_*.joblib หรือมี compact_*/
+    """
+    models_dir = Path(models_dir)
+    if not models_dir.is_dir():
+        return None
+
+    manifest = read_manifest(models_dir)
+    if manifest is not None and manifest.get("uid"):
+        found = find_artifacts(models_dir, manifest["uid"], "manifest")
+        if found is not None:
+            return found
+        print(f"⚠️ manifest ใน {models_dir} ชี้ไปยังไฟล์ที่ไม่มีอยู่ — สแกนโฟลเดอร์แทน")
+
+    uids = {p.stem[len("sentiment_model_"):] for p in models_dir.glob("sentiment_model_*.joblib")}
+    uids |= {
+        p.name[len("compact_"):] for p in models_dir.glob("compact_*")
+        if p.is_dir() and not p.name.endswith(".tmp")  # .tmp = export ที่ยังเขียนไม่เสร็จ
+    }
+    for uid in sorted(uids, reverse=True):
+        found = find_artifacts(models_dir, uid, "scan")
+        if found is not None:
+            return found
+    return None
@@ -9,6 +9,10 @@ from sklearn.naive_bayes import MultinomialNB
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, f1_score
 import joblib
+from model_registry import write_manifest
+from compact_artifact import export_artifact
+from word_table import save_word_table
+from feedback_store import record_errors
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -45,10 +49,16 @@ model_uid = f"{timestamp}_{uid}"
 
 joblib.dump(model, f"models_nb/sentiment_model_{model_uid}.joblib")
 joblib.dump(vectorizer, f"models_nb/vectorizer_{model_uid}.joblib")
+export_artifact("models_nb", model_uid, vectorizer, model)  # compact artifact (ไม่มี pickle) สำหรับ app.py
+save_word_table("models_nb", model_uid, model, X_train_vec, y_train)  # sentiment ของแต่ละคำตาม vocabulary ของโมเดลนี้
 
 y_pred = model.predict(X_test_vec)
 acc = accuracy_score(y_test, y_pred)
 f1_macro = f1_score(y_test, y_pred, average="macro")
+
+# manifest ชี้ไปที่โมเดลนี้ → app.py จะโหลด UID นี้ตอนเริ่ม / ตอน /admin/reload
+write_manifest("models_nb", model_uid, accuracy=acc, f1_macro=f1_macro)
+
 cm = confusion_matrix(y_test, y_pred)
 
 print(f"✅ Model saved: models_nb/sentiment_model_{model_uid}.joblib")
@@ -69,4 +79,6 @@ errors_df = df.loc[X_test.index].copy()
 errors_df["true_label"] = y_test.values
 errors_df["pred_label"] = y_pred
 errors_df = errors_df[errors_df["true_label"] != errors_df["pred_label"]]
-errors_df.head(10).to_csv("data/error_examples_nb.csv", index=False, encoding="utf-8")
\ No newline at end of file
+errors_df.head(10).to_csv("data/error_examples_nb.csv", index=False, encoding="utf-8")
+# misclassification ทั้งหมด (ไม่ใช่แค่ 10 ตัวอย่าง) → SQLite ที่ app ค้นได้ผ่าน /errors/query
+record_errors(os.getenv("FEEDBACK_DB_PATH", "data/feedback.db"), "nb", model_uid, errors_df["text"], errors_df["true_label"], errors_df["pred_label"])
\ No newline at end of file
@@ -0,0 +1,165 @@
+import re
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_REPEAT_RE = re.compile(r"(.)\1{2,}")  # "มากกกกก" → "มาก", "5555" → "5"
+
+
+def normalize(text):
+    """รูปที่ใช้เทียบความซ้ำ: ตัด emoji / เครื่องหมาย / ช่องว่าง ตัวพิมพ์เล็ก และย่อตัวอักษรที่ลากยาว
+
+    สระบน/ล่างและวรรณยุกต์ไทยเป็น combining mark (category M) ไม่ใช่ alnum จึงต้องเก็บแยก
+    """
+    text = unicodedata.normalize("NFC", str(text)).lower()
+    text = "".join(ch for ch in text if ch.isalnum() or unicodedata.category(ch).startswith("M"))
+    return _REPEAT_RE.sub(r"\1", text)
+
+
+def shingles(text, n=3):
+    """character n-gram ของข้อความที่ normalize แล้ว (ไม่ต้องตัดคำภาษาไทย)"""
+    text = normalize(text)
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def lsh_params(threshold, num_perm):
+    """(bands, rows) ที่ bands * rows == num_perm และจุดตัด (1/bands)^(1/rows) ใกล้ threshold ที่สุด"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateIndex:
+    """MinHash + LSH: หาข้อความที่เกือบซ้ำ (Jaccard ของ character n-gram ≥ threshold) โดยไม่เทียบทุกคู่
+
+    แต่ละรายการมี scope (เช่นโมเดล / label) — เทียบกันเฉพาะใน scope เดียวกัน
+    เก็บไม่เกิน max_items รายการ (เก่าสุดถูกทิ้ง) → หน่วยความจำคงที่ไม่ว่าจะใส่กี่รายการ
+    """
+
+    def __init__(self, threshold=0.8, num_perm=64, ngram=3, max_items=10000, seed=1):
+        self.threshold = float(threshold)
+        self.num_perm = int(num_perm)
+        self.ngram = int(ngram)
+        self.max_items = max(1, int(max_items))
+        self.bands, self.rows = lsh_params(self.threshold, self.num_perm)
+
+        rng = np.random.RandomState(seed)  # permutation ตายตัว → signature เทียบกันได้ข้าม process / ข้ามการรีสตาร์ท
+        self._a = rng.randint(1, 1 << 32, size=self.num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=self.num_perm, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # key → (scope, signature, band keys) เก่า → ใหม่
+        self._buckets = {}           # band key → set ของ key
+
+        self.checked = 0
+        self.duplicates = 0
+
+    def signature(self, text):
+        grams = shingles(text, self.ngram)
+        if not grams:
+            return None
+        hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+        # (a * x + b) mod p โดย a, x < 2^32 → ผลคูณไม่ล้น uint64
+        permuted = (hashes[:, None] * self._a[None, :] % _MERSENNE_PRIME + self._b) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=0).astype(np.uint32)  # ค่าไม่เกิน 32 bit อยู่แล้ว → ใช้หน่วยความจำครึ่งเดียว
+
+    def _band_keys(self, scope, signature):
+        r = self.rows
+        return [(scope, i, signature[i * r:(i + 1) * r].tobytes()) for i in range(self.bands)]
+
+    def _similarity(self, sig_a, sig_b):
+        return float(np.count_nonzero(sig_a == sig_b)) / self.num_perm
+
+    def _match(self, scope, signature, band_keys):
+        best_key, best_sim = None, 0.0
+        seen = set()
+        for band in band_keys:
+            for key in self._buckets.get(band, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                sim = self._similarity(signature, self._items[key][1])
+                if sim >= self.threshold and sim > best_sim:
+                    best_key, best_sim = key, sim
+        return best_key, best_sim
+
+    def find(self, scope, text):
+        """→ (key ของรายการที่เกือบซ้ำ, similarity โดยประมาณ) หรือ (None, 0.0)"""
+        signature = self.signature(text)
+        if signature is None:
+            return None, 0.0
+        with self._lock:
+            return self._match(scope, signature, self._band_keys(scope, signature))
+
+    def add(self, key, scope, text):
+        """ใส่รายการ (key เดิมถูกแทน) → key ของรายการที่เกือบซ้ำที่มีอยู่ก่อนหน้า หรือ None
+
+        ไม่ลบรายการที่ซ้ำให้เอง — ผู้เรียกตัดสินใจว่าจะเก็บตัวไหน (เช่น remove ตัวเก่าแล้วเก็บตัวใหม่)
+        """
+        signature = self.signature(text)
+        with self._lock:
+            self.checked += 1
+            self._remove(key)
+            if signature is None:
+                return None
+            band_keys = self._band_keys(scope, signature)
+            dup, _ = self._match(scope, signature, band_keys)
+            if dup is not None:
+                self.duplicates += 1
+            self._items[key] = (scope, signature, band_keys)
+            for band in band_keys:
+                self._buckets.setdefault(band, set()).add(key)
+            while len(self._items) > self.max_items:
+                self._remove(next(iter(self._items)))
+            return dup
+
+    def _remove(self, key):
+        item = self._items.pop(key, None)
+        if item is None:
+            return
+        for band in item[2]:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "max_items": self.max_items,
+                "buckets": len(self._buckets),
+                "threshold": self.threshold,
+                "num_perm": self.num_perm,
+                "bands": self.bands,
+                "rows": self.rows,
+                "checked": self.checked,
+                "duplicates": self.duplicates,
+            }
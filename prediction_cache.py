@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """LRU cache ของผลทำนาย คีย์ = (hash ข้อความที่ normalize whitespace แล้ว, model key, artifact UID)
+
+    จำกัดทั้งจำนวนรายการและขนาดโดยประมาณ (bytes), มี TTL แบบ optional
+    ปลอดภัยสำหรับเรียกจากหลาย thread (handler sync ของ FastAPI รันใน threadpool)
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl_seconds=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self._data = OrderedDict()  # key → (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def make_key(text, model_key, artifact_uid):
+        normalized = " ".join(str(text).split())
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return (digest, model_key, artifact_uid)
+
+    @staticmethod
+    def _size_of(key, value):
+        return len(json.dumps(value, ensure_ascii=False).encode("utf-8")) + len(key[0]) + 64
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at and expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        size = self._size_of(key, value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def invalidate_model(self, model_key):
+        """ลบทุกรายการของโมเดลนี้ (เช่นตอน reload โมเดลใหม่)"""
+        with self._lock:
+            stale = [k for k in self._data if k[1] == model_key]
+            for k in stale:
+                self._remove(k)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,364 @@
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl  # กันหลาย worker process ตัด segment / เขียนพร้อมกัน (ไม่มีบน Windows)
+except ImportError:
+    fcntl = None
+
+INDEX_NAME = "index.json"
+LOCK_NAME = ".lock"
+READ_BLOCK = 64 * 1024
+
+
+def segment_name(seq):
+    return f"segment_{seq:08d}.jsonl"
+
+
+class SegmentedLog:
+    """log JSONL ที่แบ่งเป็นไฟล์ย่อย (segment) + index.json — ใช้เป็นปลายทางของ FeedbackWriter ได้
+
+    เขียนต่อท้าย segment ที่เปิดอยู่ (active) เสมอ พอ segment ใหญ่เกิน segment_bytes หรือเปิดมานานเกิน
+    segment_seconds จะปิดแล้วเริ่ม segment ใหม่ (ถ้า compress จะ gzip segment ที่ปิดแล้ว)
+    retention ลบทีละ segment ทั้งไฟล์จากเก่าสุด → ไม่ต้องอ่าน / เขียนไฟล์ใหม่ ต้นทุนคงที่ไม่ว่าจะมี feedback เท่าไร
+
+    index.json: {"next_seq", "active": {"seq", "file", "opened_at"}, "segments": [segment ที่ปิดแล้ว เก่า → ใหม่]}
+    ทุกการเปลี่ยน index / เขียน segment ทำภายใต้ flock ของ .lock → หลาย worker process ใช้โฟลเดอร์เดียวกันได้
+    """
+
+    def __init__(self, directory, segment_bytes=8 * 1024 * 1024, segment_seconds=86400,
+                 max_segments=30, max_age_seconds=0, compress=False):
+        self.dir = Path(directory)
+        self.segment_bytes = max(1, int(segment_bytes))
+        self.segment_seconds = float(segment_seconds)  # 0 = ไม่ตัดตามเวลา
+        self.max_segments = max(1, int(max_segments))   # จำนวน segment ที่ปิดแล้วที่เก็บไว้
+        self.max_age_seconds = float(max_age_seconds)   # 0 = ไม่ลบตามอายุ
+        self.compress = bool(compress)
+
+        self._mutex = threading.Lock()  # flock ไม่กันระหว่าง thread ใน process เดียวกัน
+        self._lock_fd = None
+        self._index = None
+        self._index_stat = None
+        self._fd = None
+        self._fd_seq = None
+
+        self.rolled = 0
+        self.deleted = 0
+
+    # ======================
+    # index + lock
+    # ======================
+    @property
+    def index_path(self):
+        return self.dir / INDEX_NAME
+
+    def _acquire(self):
+        if self._lock_fd is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._lock_fd = os.open(self.dir / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+
+    def _release(self):
+        if fcntl is not None and self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _stat_key(self):
+        try:
+            st = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def read_index(self):
+        """index ล่าสุดบนดิสก์ (อ่านใหม่เฉพาะเมื่อไฟล์เปลี่ยน — index เปลี่ยนแค่ตอนตัด segment)"""
+        key = self._stat_key()
+        if key is None:
+            return None
+        if key != self._index_stat:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+            self._index_stat = key
+        return self._index
+
+    def _write_index(self, index):
+        tmp_path = self.index_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+        self._index = index
+        self._index_stat = self._stat_key()
+
+    def _current_index(self):
+        """ต้องถือ lock อยู่ — ยังไม่มี index → สร้าง segment แรก"""
+        index = self.read_index()
+        if index is None:
+            index = {"next_seq": 1, "active": self._new_active(0), "segments": []}
+            (self.dir / index["active"]["file"]).touch()
+            self._write_index(index)
+        return index
+
+    @staticmethod
+    def _new_active(seq):
+        return {"seq": seq, "file": segment_name(seq), "opened_at": round(time.time(), 3)}
+
+    def _active_fd(self, index):
+        """fd ของ segment ที่ active ตาม index — process อื่นตัด segment ไปแล้ว → เปิดไฟล์ใหม่"""
+        active = index["active"]
+        if self._fd is not None and self._fd_seq != active["seq"]:
+            os.close(self._fd)
+            self._fd = None
+        if self._fd is None:
+            self._fd = os.open(self.dir / active["file"], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._fd_seq = active["seq"]
+        return self._fd
+
+    # ======================
+    # ตัด segment + retention
+    # ======================
+    def _due(self, index, size, now):
+        if size >= self.segment_bytes:
+            return True
+        return self.segment_seconds > 0 and now - index["active"]["opened_at"] >= self.segment_seconds
+
+    def _roll(self, index, now):
+        """ปิด segment ที่ active (gzip ถ้าเลือก) แล้วเปิด segment ใหม่ — ต้องถือ lock อยู่"""
+        active = index["active"]
+        path = self.dir / active["file"]
+        size = path.stat().st_size if path.exists() else 0
+        if size == 0:
+            # ไม่มีอะไรให้ปิด → แค่เริ่มนับเวลาใหม่ (ไม่สร้าง segment ว่าง)
+            index = dict(index, active=dict(active, opened_at=round(now, 3)))
+            self._write_index(index)
+            return index
+
+        records = _count_lines(path)
+        closed = {
+            "seq": active["seq"],
+            "file": active["file"],
+            "opened_at": active["opened_at"],
+            "closed_at": round(now, 3),
+            "records": records,
+            "bytes": size,
+        }
+        if self.compress:
+            closed["file"] = _gzip_file(path)
+            closed["bytes"] = (self.dir / closed["file"]).stat().st_size
+
+        seq = index["next_seq"]
+        segments = index["segments"] + [closed]
+        index = {"next_seq": seq + 1, "active": self._new_active(seq), "segments": segments}
+        (self.dir / index["active"]["file"]).touch()
+        index = self._apply_retention(index, now)
+        self._write_index(index)
+        self.rolled += 1
+        return index
+
+    def _apply_retention(self, index, now):
+        """ลบ segment ที่ปิดแล้วจากเก่าสุดจนเหลือไม่เกิน max_segments และไม่เก่ากว่า max_age_seconds"""
+        segments = list(index["segments"])
+        while segments and (
+            len(segments) > self.max_segments
+            or (self.max_age_seconds > 0 and now - segments[0]["closed_at"] > self.max_age_seconds)
+        ):
+            old = segments.pop(0)
+            try:
+                os.unlink(self.dir / old["file"])
+            except FileNotFoundError:
+                pass
+            self.deleted += 1
+        if len(segments) == len(index["segments"]):
+            return index
+        return dict(index, segments=segments)
+
+    def maintain(self):
+        """ตัด segment ที่เปิดนานเกิน segment_seconds และลบ segment ที่หมดอายุ แม้ไม่มีการเขียนเข้ามา"""
+        with self._mutex:
+            self._acquire()
+            try:
+                index = self._current_index()
+                now = time.time()
+                path = self.dir / index["active"]["file"]
+                size = path.stat().st_size if path.exists() else 0
+                if size > 0 and self._due(index, size, now):
+                    index = self._roll(index, now)
+                pruned = self._apply_retention(index, now)
+                if pruned is not index:
+                    self._write_index(pruned)
+            finally:
+                self._release()
+
+    def adopt(self, path):
+        """ย้ายไฟล์ JSONL เดิม (log ไฟล์เดียวแบบเก่า) เข้ามาเป็น segment ที่ปิดแล้ว — ใช้ rename ไม่ copy"""
+        path = Path(path)
+        if not path.is_file():
+            return False
+        with self._mutex:
+            self._acquire()
+            try:
+                if not path.is_file():  # worker อื่นย้ายไปแล้ว
+                    return False
+                index = self._current_index()
+                seq = index["next_seq"]
+                target = self.dir / segment_name(seq)
+                os.replace(path, target)
+                st = target.stat()
+                closed = {
+                    "seq": seq,
+                    "file": target.name,
+                    "opened_at": round(st.st_mtime, 3),
+                    "closed_at": round(st.st_mtime, 3),
+                    "records": _count_lines(target),
+                    "bytes": st.st_size,
+                }
+                # segment เก่ากว่าทุกอันที่มี → วางไว้หน้าสุด (อ่านจากใหม่ → เก่า จะเจอทีหลัง)
+                index = dict(index, next_seq=seq + 1, segments=[closed] + index["segments"])
+                self._write_index(self._apply_retention(index, time.time()))
+                return True
+            finally:
+                self._release()
+
+    # ======================
+    # ปลายทางของ FeedbackWriter
+    # ======================
+    def write_lines(self, lines):
+        data = "".join(line + "\n" for line in lines).encode("utf-8")
+        with self._mutex:
+            self._acquire()
+            try:
+                index = self._current_index()
+                fd = self._active_fd(index)
+                now = time.time()
+                if self._due(index, os.fstat(fd).st_size, now):
+                    index = self._roll(index, now)
+                    fd = self._active_fd(index)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                self._release()
+
+    def sync(self):
+        with self._mutex:
+            if self._fd is not None:
+                os.fsync(self._fd)
+
+    def close(self):
+        with self._mutex:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+                self._fd_seq = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    # ======================
+    # อ่าน (ใหม่ → เก่า)
+    # ======================
+    def segments(self):
+        """[(ชื่อไฟล์, compressed)] เรียงจากใหม่ → เก่า (segment ที่ active มาก่อน)"""
+        with self._mutex:
+            index = self.read_index()
+        if index is None:
+            return []
+        files = [index["active"]["file"]] + [s["file"] for s in reversed(index["segments"])]
+        return [(name, name.endswith(".gz")) for name in files]
+
+    def iter_lines(self, newest_first=True):
+        """บรรทัดของทุก segment — newest_first อ่าน segment ปกติย้อนจากท้ายไฟล์ทีละ block
+        จึงหยุดอ่านกลางทางได้โดยไม่ต้องโหลดไฟล์ทั้งก้อน
+
+        ไม่ถือ lock: segment ที่ถูกลบ / gzip ระหว่างอ่านจะถูกข้าม
+        """
+        files = self.segments()
+        if not newest_first:
+            files.reverse()
+        for name, compressed in files:
+            path = self.dir / name
+            try:
+                if compressed:
+                    with gzip.open(path, "rt", encoding="utf-8") as f:
+                        lines = f.read().splitlines()
+                    yield from (reversed(lines) if newest_first else lines)
+                elif newest_first:
+                    with open(path, "rb") as f:
+                        for raw in _reverse_lines(f):
+                            yield raw.decode("utf-8", errors="replace")
+                else:
+                    with open(path, "r", encoding="utf-8", errors="replace") as f:
+                        for line in f:
+                            yield line.rstrip("\n")
+            except FileNotFoundError:
+                continue
+
+    def iter_records(self, newest_first=True):
+        """dict ของแต่ละบรรทัด — บรรทัดว่าง / JSON เสีย (เช่นบรรทัดที่กำลังเขียนอยู่) ถูกข้าม"""
+        for line in self.iter_lines(newest_first):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+    def stats(self):
+        with self._mutex:
+            index = self.read_index()
+        if index is None:
+            return {"segments": 0, "closed_records": 0, "bytes": 0}
+        active_path = self.dir / index["active"]["file"]
+        active_bytes = active_path.stat().st_size if active_path.exists() else 0
+        return {
+            "segments": len(index["segments"]) + 1,
+            "active_seq": index["active"]["seq"],
+            "active_bytes": active_bytes,
+            "closed_records": sum(s["records"] for s in index["segments"]),
+            "bytes": active_bytes + sum(s["bytes"] for s in index["segments"]),
+            "rolled": self.rolled,
+            "deleted": self.deleted,
+            "compress": self.compress,
+        }
+
+
+def _count_lines(path):
+    count = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            count += block.count(b"\n")
+    return count
+
+
+def _gzip_file(path):
+    """segment.jsonl → segment.jsonl.gz (เขียน .tmp ก่อนแล้ว rename) → ชื่อไฟล์ใหม่"""
+    gz_path = path.with_name(path.name + ".gz")
+    tmp_path = gz_path.with_name(gz_path.name + ".tmp")
+    with open(path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, gz_path)
+    os.unlink(path)
+    return gz_path.name
+
+
+def _reverse_lines(f):
+    """bytes ของแต่ละบรรทัดจากท้ายไฟล์ขึ้นไป (ไม่รวม \\n)"""
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+    tail = b""
+    while pos > 0:
+        step = min(READ_BLOCK, pos)
+        pos -= step
+        f.seek(pos)
+        block = f.read(step) + tail
+        parts = block.split(b"\n")
+        tail = parts[0]  # อาจเป็นบรรทัดที่ขาดครึ่ง → ต่อกับ block ถัดไป
+        for part in reversed(parts[1:]):
+            if part:
+                yield part
+    if tail:
+        yield tail
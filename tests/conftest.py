@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# โมดูลของ repo อยู่ที่ root (ไม่มี package) → ให้ test import ได้ตรงๆ
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
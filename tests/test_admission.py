@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, ModelSaturated
+
+
+def held_controller():
+    # "a" ว่าง, "b" ถูกจองเต็มแล้ว → admit(["a", "b"]) ได้ a แล้วไปรอ b
+    controller = AdmissionController({"a": 1, "b": 1}, max_queue=4, max_wait_ms=1000)
+    return controller, controller.gates["a"], controller.gates["b"]
+
+
+def test_cancel_while_waiting_releases_acquired_gates():
+    async def scenario():
+        controller, gate_a, gate_b = held_controller()
+        await gate_b.acquire()
+
+        async def request():
+            async with controller.admit(["a", "b"]):
+                pass
+
+        task = asyncio.ensure_future(request())
+        await asyncio.sleep(0.01)
+        assert gate_a.running == 1 and gate_b.waiting == 1
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert gate_a.running == 0 and not gate_a._sem.locked()
+        assert gate_b.waiting == 0 and gate_b.running == 1
+
+    asyncio.run(scenario())
+
+
+def test_saturated_releases_acquired_gates():
+    async def scenario():
+        controller, gate_a, gate_b = held_controller()
+        gate_b.max_wait = 0.01
+        await gate_b.acquire()
+
+        with pytest.raises(ModelSaturated) as exc:
+            async with controller.admit(["a", "b"]):
+                pass
+        assert exc.value.status_code == 503
+        assert gate_a.running == 0 and not gate_a._sem.locked()
+
+    asyncio.run(scenario())
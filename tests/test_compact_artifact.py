@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+
+from compact_artifact import ArtifactError, CompactArtifact, MANIFEST_NAME, export_artifact, verify_export
+
+TEXTS = [
+    "อาหาร อร่อย มาก", "บริการ แย่ มาก", "ร้าน นี้ ก็ งั้น ๆ", "ชอบ มาก อร่อย", "แย่ ไม่ ชอบ เลย",
+    "ราคา ปกติ", "อร่อย คุ้ม ราคา", "ช้า แย่ ไม่ คุ้ม", "ธรรมดา ทั่วไป", "ดี มาก บริการ ดี",
+] * 3
+LABELS = ["positive", "negative", "neutral", "positive", "negative",
+          "neutral", "positive", "negative", "neutral", "positive"] * 3
+
+
+@pytest.fixture(scope="module")
+def vectorizer():
+    return TfidfVectorizer(token_pattern=r"\S+", sublinear_tf=True).fit(TEXTS)
+
+
+@pytest.fixture(params=[
+    lambda: LogisticRegression(C=0.5, class_weight="balanced", max_iter=500, tol=1e-6),
+    lambda: LinearSVC(C=0.3, loss="hinge", fit_intercept=False),
+    lambda: MultinomialNB(alpha=0.1),
+], ids=["lr", "svc", "nb"])
+def model(request, vectorizer):
+    return request.param().fit(vectorizer.transform(TEXTS), LABELS)
+
+
+def test_export_restores_params_and_predictions(tmp_path, vectorizer, model):
+    path = export_artifact(tmp_path, "uid", vectorizer, model)
+    manifest = json.loads((path / MANIFEST_NAME).read_text(encoding="utf-8"))
+    clf = CompactArtifact(path).build_classifier()
+
+    params = manifest["model"]["params"]
+    assert params and all(model.get_params()[name] == value for name, value in params.items())
+    assert clf.get_params() == model.get_params()
+    X = vectorizer.transform(TEXTS)
+    assert np.array_equal(clf.predict(X), model.predict(X))
+    if hasattr(model, "predict_proba"):
+        np.testing.assert_allclose(clf.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+
+
+def test_export_rejects_artifact_that_does_not_match_source(tmp_path, vectorizer, model):
+    path = export_artifact(tmp_path, "uid", vectorizer, model)
+    other = LogisticRegression(C=100).fit(vectorizer.transform(TEXTS[:5]), LABELS[:5])
+    with pytest.raises(ArtifactError):
+        verify_export(path, vectorizer, other)
@@ -0,0 +1,32 @@
+import numpy as np
+from sklearn.tree import DecisionTreeClassifier
+
+from compaction import resident_nbytes
+
+
+class Holder:
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+def test_views_are_counted_once():
+    base = np.zeros(1000, dtype=np.float64)
+    private, mapped = resident_nbytes(Holder(a=base, b=base[:10], c=base.reshape(10, 100)))
+    assert base.nbytes <= private < base.nbytes + 2000
+    assert mapped == 0
+
+
+def test_excluded_objects_are_not_counted():
+    shared = np.zeros(1000, dtype=np.float64)
+    vectorizer = Holder(idf_=shared)
+    engine = Holder(idf=shared, weights=np.zeros(10, dtype=np.float32))
+    private, _ = resident_nbytes(engine, exclude=(vectorizer,))
+    assert private < shared.nbytes
+
+
+def test_sklearn_tree_nodes_are_counted():
+    rng = np.random.RandomState(0)
+    tree = DecisionTreeClassifier(random_state=0).fit(rng.rand(200, 5), rng.randint(0, 2, 200))
+    state = tree.tree_.__getstate__()
+    private, _ = resident_nbytes(tree)
+    assert private >= state["nodes"].nbytes + state["values"].nbytes
@@ -0,0 +1,56 @@
+from error_index import FEEDBACK_SOURCE, ErrorIndex
+from near_duplicates import NearDuplicateIndex
+
+
+def incorrect(text, slot="model_a", name="lgbm • v1"):
+    return {
+        "text": text,
+        "model": slot,
+        "model_name": name,
+        "predicted_label": "POSITIVE",
+        "true_label": "NEGATIVE",
+        "feedback": "incorrect",
+    }
+
+
+def make_index():
+    return ErrorIndex(max_entries=100, near_duplicates=NearDuplicateIndex(threshold=0.8, num_perm=64))
+
+
+def test_same_text_from_two_models_stays_separate():
+    index = make_index()
+    index.add_feedback(incorrect("สินค้าแย่มาก ไม่ประทับใจเลย", slot="model_a", name="rf • v1"), "rf")
+    index.add_feedback(incorrect("สินค้าแย่มาก ไม่ประทับใจเลย", slot="model_a", name="lgbm • v1"), "lgbm")
+
+    items, total = index.page(source=FEEDBACK_SOURCE)
+    assert total == 2
+    assert sorted(e["model"] for e in items) == ["lgbm", "rf"]
+    assert all("duplicates" not in e for e in items)
+
+
+def test_same_slot_different_models_stays_separate():
+    # ช่อง model_b ของหน้าเว็บเป็นโมเดลไหนก็ได้ → ต้องแยกตาม key ในทะเบียน ไม่ใช่ตามช่อง
+    index = make_index()
+    index.add_feedback(incorrect("ส่งช้ามาก แย่สุดๆ", slot="model_b"), "nb")
+    index.add_feedback(incorrect("ส่งช้ามาก แย่สุดๆ", slot="model_b"), "lgbm")
+
+    assert index.page(model="nb")[1] == 1
+    assert index.page(model="lgbm")[1] == 1
+
+
+def test_near_duplicates_of_one_model_merge():
+    index = make_index()
+    index.add_feedback(incorrect("สินค้าแย่มาก ไม่ประทับใจเลย"), "lgbm")
+    index.add_feedback(incorrect("สินค้าแย่มากกกกก ไม่ประทับใจเลย 😡"), "lgbm")
+
+    items, total = index.page(model="lgbm")
+    assert total == 1
+    assert items[0]["duplicates"] == 1
+    assert items[0]["text"] == "สินค้าแย่มากกกกก ไม่ประทับใจเลย 😡"
+
+
+def test_load_feedback_uses_key_fn():
+    index = make_index()
+    records = [incorrect("แย่มาก", slot="model_b", name="nb • v2")]  # record เก่าใน log เก็บแค่ช่อง
+    assert index.load_feedback(records, lambda fb: fb["model_name"].split(" • ")[0]) == 1
+    assert index.models() == ["nb"]
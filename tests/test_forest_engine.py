@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from compaction import compact_classifier
+from forest_engine import CompiledForest
+
+
+def tfidf_like(n_samples, n_features, seed):
+    # sparse ค่าบวกแบบ TF-IDF: แต่ละแถวมีไม่กี่ feature
+    rng = np.random.RandomState(seed)
+    X = sparse.random(n_samples, n_features, density=0.05, format="csr", random_state=rng, dtype=np.float64)
+    X.data = rng.uniform(0.05, 1.0, size=X.nnz)
+    return X
+
+
+@pytest.fixture(scope="module")
+def data():
+    X = tfidf_like(400, 60, seed=0)
+    y = np.array(["negative", "neutral", "positive"])[np.asarray(X[:, :3].argmax(axis=1)).ravel()]
+    return X, y, tfidf_like(300, 60, seed=1)
+
+
+@pytest.fixture(params=[RandomForestClassifier, ExtraTreesClassifier], ids=["rf", "et"])
+def forest(request, data):
+    X, y, _ = data
+    return request.param(n_estimators=15, random_state=0).fit(X, y)
+
+
+def test_compiled_matches_sklearn(forest, data):
+    _, _, X_test = data
+    compiled = CompiledForest.compile(forest)
+
+    np.testing.assert_allclose(compiled.predict_proba(X_test), forest.predict_proba(X_test), rtol=0, atol=1e-12)
+    assert np.array_equal(compiled.predict(X_test), forest.predict(X_test))
+    assert compiled.verify(X_test, forest) == X_test.shape[0]
+
+
+def test_compiled_matches_sklearn_after_compaction(forest, data):
+    _, _, X_test = data
+    compiled = CompiledForest.compile(forest)
+    originals, before, after = compact_classifier(compiled)
+
+    assert compiled.leaf_proba.dtype == np.float32 and compiled.left.dtype == np.int32
+    assert set(originals) == {"left", "right", "feature", "roots", "leaf_proba"}
+    assert after < before
+    # leaf เดียวกันทุกแถว (threshold คง float64) → ต่างกันแค่ความละเอียดของ leaf_proba
+    np.testing.assert_allclose(compiled.predict_proba(X_test), forest.predict_proba(X_test), rtol=0, atol=1e-6)
+    assert np.array_equal(compiled.predict(X_test), forest.predict(X_test))
+
+
+def test_large_batches_use_fallback(forest, data):
+    _, _, X_test = data
+    compiled = CompiledForest.compile(forest)
+    loads = []
+    compiled.fallback_loader = lambda: loads.append(1) or forest
+    compiled.fallback_rows = 100
+
+    # batch เล็กไม่โหลด forest เดิม
+    np.testing.assert_allclose(compiled.predict_proba(X_test[:10]), forest.predict_proba(X_test[:10]), rtol=0, atol=1e-12)
+    assert compiled.fallback is None and not loads
+    # batch ใหญ่โหลดครั้งเดียวแล้วใช้ซ้ำ
+    assert np.array_equal(compiled.predict_proba(X_test), forest.predict_proba(X_test))
+    assert np.array_equal(compiled.predict_proba(X_test), forest.predict_proba(X_test))
+    assert loads == [1] and compiled.fallback is forest
+    assert compiled.verify(X_test, forest) == X_test.shape[0]
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from linear_engine import top_k_features
+
+SAMPLE_CSV = Path(__file__).resolve().parent.parent / "data" / "1.synthetic_wisesight_like_thai_sentiment_5000.csv"
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    import app
+
+    return app
+
+
+@pytest.fixture(scope="module")
+def texts():
+    return pd.read_csv(SAMPLE_CSV)["text"].astype(str).tolist()[:300]
+
+
+def test_top_k_features_breaks_ties_by_feature_index():
+    indices = np.array([40, 7, 19, 3, 25])
+    scores = np.array([0.5, 0.2, 0.5, 0.2, 0.2])
+    assert top_k_features(indices, scores, 3).tolist() == [19, 40, 3]
+    # ลำดับของ input ไม่มีผล (fast path เรียงตามคำในข้อความ sklearn เรียงตาม column)
+    order = np.argsort(indices)
+    assert top_k_features(indices[order], scores[order], 3).tolist() == [19, 40, 3]
+    assert top_k_features(indices, scores, 10).tolist() == [19, 40, 3, 7, 25]
+
+
+@pytest.mark.parametrize("key", ["sentiment_lr", "linear", "nb"])
+def test_fast_path_matches_sklearn(app_module, texts, key):
+    mdl = app_module.model_entry(key)
+    if mdl is None or mdl["fast"] is None:
+        pytest.skip(f"{key}: ไม่มีโมเดลหรือไม่มี fast path")
+
+    expected = app_module.predict_batch_entry(mdl, texts)
+    for text, exp in zip(texts, expected):
+        label, confidence, words, sentiments, _ = app_module.predict_fast(mdl, text)
+        assert label == exp["label"], text
+        assert round(confidence, 2) == exp["confidence"], text
+        assert words == exp["important_words"], text
+        assert sentiments == exp["word_sentiments"], text
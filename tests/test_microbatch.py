@@ -0,0 +1,29 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+SAMPLE_CSV = Path(__file__).resolve().parent.parent / "data" / "1.synthetic_wisesight_like_thai_sentiment_5000.csv"
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    import app
+
+    return app
+
+
+@pytest.fixture(scope="module")
+def texts():
+    return pd.read_csv(SAMPLE_CSV)["text"].astype(str).tolist()[:100]
+
+
+@pytest.mark.parametrize("key", ["sentiment_lr", "linear", "nb", "lgbm"])
+def test_microbatch_matches_single_text_path(app_module, texts, key):
+    # ผลของ micro-batch กับ /predict ทีละข้อความใช้ cache key เดียวกัน → ต้องเหมือนกันทุกช่อง
+    mdl = app_module.model_entry(key)
+    if mdl is None:
+        pytest.skip(f"{key}: ไม่มีโมเดล")
+    batched = app_module.predict_texts_entry(mdl, texts)
+    for text, item in zip(texts, batched):
+        assert item == app_module.predict_entry(mdl, text), text
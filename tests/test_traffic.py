@@ -0,0 +1,32 @@
+import asyncio
+
+from feedback_sink import FeedbackWriter
+from segmented_log import SegmentedLog
+from traffic import ShadowLog
+
+
+def item(label):
+    return {"label": label, "confidence": 0.9}
+
+
+def test_shadow_log_writes_through_segmented_log(tmp_path):
+    async def scenario():
+        log = SegmentedLog(tmp_path, segment_bytes=512, segment_seconds=0, max_segments=2)
+        writer = FeedbackWriter(log, flush_interval_ms=1, max_batch=4, fsync="never")
+        shadow = ShadowLog(writer=writer)
+        writer.start()
+        for i in range(100):
+            shadow.record("sentiment_lr", item("positive"), 1.0, "lgbm", item("positive" if i % 4 else "negative"), 2.0)
+            await asyncio.sleep(0)
+        await writer.stop()
+        return log, shadow
+
+    log, shadow = asyncio.run(scenario())
+    stats = shadow.stats()
+    assert stats["pairs"]["sentiment_lr->lgbm"] == {"compared": 100, "agree": 75, "agreement_rate": 0.75}
+    # segment ถูกตัดตามขนาดและเก็บที่ปิดแล้วไม่เกิน max_segments → ไฟล์ไม่โตไม่จำกัด
+    assert log.rolled > 2 and log.deleted > 0
+    assert len(log.segments()) == 3
+    assert len(list(tmp_path.glob("segment_*"))) == 3
+    newest = next(log.iter_records())
+    assert newest["p"] == "sentiment_lr" and newest["s"] == "lgbm"
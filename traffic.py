@@ -0,0 +1,137 @@
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from feedback_sink import FeedbackQueueFull
+
+
+class TrafficPolicy:
+    """เลือกโมเดลที่ตอบ request ตามน้ำหนัก (เช่น sentiment_lr=90,lgbm=10)
+
+    เลือกจาก hash ของข้อความ → ข้อความเดิมได้โมเดลเดิมเสมอ (ผลคงที่ และ prediction cache ยังใช้ได้)
+    """
+
+    def __init__(self, weights, default_key):
+        self.default_key = default_key
+        self.weights = {k: float(w) for k, w in weights.items() if float(w) > 0}
+        self.total = sum(self.weights.values())
+        self.routed = {k: 0 for k in self.weights}
+
+    def choose(self, text):
+        if not self.weights:
+            return self.default_key
+        digest = hashlib.md5(text.encode("utf-8")).digest()
+        point = int.from_bytes(digest[:8], "big") / 2 ** 64 * self.total
+        for key, weight in self.weights.items():
+            point -= weight
+            if point < 0:
+                break
+        self.routed[key] += 1
+        return key
+
+    def stats(self):
+        return {
+            "weights": self.weights or {self.default_key: 1.0},
+            "routed": self.routed,
+        }
+
+
+class LatencyWindow:
+    """เก็บ latency ล่าสุด N ค่าไว้คำนวณ percentile"""
+
+    def __init__(self, size=1000):
+        self.values = deque(maxlen=size)
+
+    def add(self, ms):
+        self.values.append(ms)
+
+    def summary(self):
+        if not self.values:
+            return {"count": 0}
+        arr = np.fromiter(self.values, dtype=np.float64)
+        p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+        return {
+            "count": len(arr),
+            "mean_ms": round(float(arr.mean()), 2),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+        }
+
+
+class ShadowLog:
+    """สรุปผลเทียบโมเดลหลัก (ที่ตอบผู้ใช้) กับโมเดล shadow (ที่รันหลังตอบแล้ว)
+
+    เก็บ agreement rate ต่อคู่โมเดล และ latency distribution ต่อโมเดลไว้ใน memory
+    ถ้ากำหนด writer (FeedbackWriter ที่เขียนลง SegmentedLog) จะส่งแต่ละการเทียบเป็น JSONL บรรทัดสั้นๆ เข้าคิว
+    → ไม่เปิดไฟล์ต่อ request, เขียนเป็น batch และไฟล์ถูกตัด / ลบตาม retention ของ segment
+    """
+
+    def __init__(self, writer=None, window=1000):
+        self.writer = writer
+        self.window = window
+        self._lock = threading.Lock()
+        self.pairs = {}      # (primary, shadow) → {"compared", "agree"}
+        self.latency = {}    # model key → LatencyWindow
+        self.dropped = {}    # model key → จำนวน shadow ที่ถูกข้าม (เต็ม / error)
+        self.log_dropped = 0  # บรรทัดที่ไม่ได้เขียนเพราะคิวของ writer เต็ม
+
+    def _latency(self, key):
+        if key not in self.latency:
+            self.latency[key] = LatencyWindow(self.window)
+        return self.latency[key]
+
+    def record(self, primary, primary_item, primary_ms, shadow, shadow_item, shadow_ms):
+        """เรียกจาก event loop (writer.submit ใช้ asyncio.Queue)"""
+        agree = primary_item["label"] == shadow_item["label"]
+        with self._lock:
+            pair = self.pairs.setdefault((primary, shadow), {"compared": 0, "agree": 0})
+            pair["compared"] += 1
+            pair["agree"] += int(agree)
+            self._latency(shadow).add(shadow_ms)
+        if self.writer is None:
+            return
+        line = {
+            "ts": round(time.time(), 3),
+            "p": primary,
+            "s": shadow,
+            "pl": primary_item["label"],
+            "sl": shadow_item["label"],
+            "pc": primary_item["confidence"],
+            "sc": shadow_item["confidence"],
+            "pms": round(primary_ms, 2),
+            "sms": round(shadow_ms, 2),
+        }
+        try:
+            self.writer.submit(json.dumps(line, ensure_ascii=False))
+        except FeedbackQueueFull:
+            with self._lock:
+                self.log_dropped += 1
+
+    def observe(self, key, latency_ms):
+        """บันทึก latency ของโมเดลหลัก (ครั้งเดียวต่อ request ไม่ว่าจะมี shadow กี่ตัว)"""
+        with self._lock:
+            self._latency(key).add(latency_ms)
+
+    def drop(self, shadow):
+        with self._lock:
+            self.dropped[shadow] = self.dropped.get(shadow, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pairs": {
+                    f"{p}->{s}": {
+                        **counts,
+                        "agreement_rate": round(counts["agree"] / counts["compared"], 4),
+                    }
+                    for (p, s), counts in self.pairs.items()
+                },
+                "latency": {key: w.summary() for key, w in self.latency.items()},
+                "dropped": dict(self.dropped),
+                "log_dropped": self.log_dropped,
+            }
@@ -0,0 +1,79 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+# ตาราง sentiment ของคำต่อโมเดล: array เรียงตาม column ของ vectorizer ของโมเดลนั้น
+# (ไม่เก็บตัวคำซ้ำ — คำอยู่ใน vocabulary ของ vectorizer อยู่แล้ว)
+SENTIMENTS = np.array(["negative", "neutral", "positive"], dtype=object)
+NEGATIVE, NEUTRAL, POSITIVE = 0, 1, 2
+
+
+def table_path(models_dir, uid):
+    return Path(models_dir) / f"word_sentiment_{uid}.npz"
+
+
+def sentiment_code(label):
+    c = str(label).lower()
+    if c in ("positive", "pos", "ดี"):
+        return POSITIVE
+    if c in ("negative", "neg", "แย่", "ห่วย"):
+        return NEGATIVE
+    return NEUTRAL
+
+
+def class_scores(model, X=None, y=None):
+    """(n_classes, n_features) — คำแต่ละคำเอียงไปทาง class ไหนมากแค่ไหน
+
+    โมเดลเชิงเส้นใช้ coef_ / feature_log_prob_ ของตัวเอง ส่วนโมเดล tree (RF / Extra Trees / LightGBM)
+    ไม่มีทิศทางต่อ class จึงใช้ค่าเฉลี่ย TF-IDF ของคำในแต่ละ class ของชุดเทรน
+    """
+    if hasattr(model, "coef_"):
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        return np.vstack([-coef[0], coef[0]]) if coef.shape[0] == 1 else coef
+    if hasattr(model, "feature_log_prob_"):
+        flp = np.asarray(model.feature_log_prob_, dtype=np.float64)
+        return flp - flp.mean(axis=0)
+    if X is None or y is None:
+        raise ValueError(f"{type(model).__name__} ต้องใช้ข้อมูลเทรน (X, y) เพื่อสร้างตาราง sentiment ของคำ")
+    onehot = (np.asarray(y)[:, None] == np.asarray(model.classes_)[None, :]).astype(np.float64)
+    means = np.asarray((X.T @ onehot).T) / np.maximum(onehot.sum(axis=0), 1)[:, None]
+    return means - means.mean(axis=0)
+
+
+def build_word_table(model, X=None, y=None):
+    """→ (sentiment code int8, weight float32) ต่อ column — คำที่ไม่เอียงไปทางไหนเป็น neutral"""
+    scores = class_scores(model, X, y)
+    best = np.argmax(scores, axis=0)
+    class_codes = np.array([sentiment_code(c) for c in model.classes_], dtype=np.int8)
+    codes = class_codes[best]
+    codes[scores.max(axis=0) == scores.min(axis=0)] = NEUTRAL
+    weights = scores[best, np.arange(scores.shape[1])].astype(np.float32)
+    return codes, weights
+
+
+def save_word_table(models_dir, uid, model, X=None, y=None):
+    """ให้สคริปต์เทรนเรียกหลังบันทึกโมเดล → word_sentiment_{uid}.npz (ไม่มี pickle)"""
+    codes, weights = build_word_table(model, X, y)
+    path = table_path(models_dir, uid)
+    tmp_path = path.with_suffix(".npz.tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, sentiment=codes, weight=weights)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_word_table(path, n_features):
+    """→ (sentiment ต่อ column เป็น object array, weight) — ขนาดไม่ตรงกับ vectorizer → ValueError"""
+    path = Path(path)
+    with np.load(path, allow_pickle=False) as data:
+        codes, weights = data["sentiment"], data["weight"]
+    if len(codes) != n_features or len(weights) != n_features:
+        raise ValueError(f"{path.name}: มี {len(codes)} คำ แต่ vectorizer มี {n_features} คำ")
+    if len(codes) and (codes.min() < 0 or codes.max() >= len(SENTIMENTS)):
+        raise ValueError(f"{path.name}: sentiment code ไม่ถูกต้อง")
+    return SENTIMENTS[codes], weights
+
+
+def word_sentiments(codes):
+    return SENTIMENTS[codes]